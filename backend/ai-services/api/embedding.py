@@ -1,19 +1,34 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import Dict, Any, List
+from uuid import uuid4
+import asyncio
 import time
 import logging
 
 from models.embedding_models import (
     EmbedRequest, EmbedResponse,
     SearchRequest, SearchResponse, SearchResult,
-    DeleteRequest
+    DeleteRequest, BatchDeleteRequest, BatchDeleteResponse, DeleteTaskStatusResponse
 )
 from services.embedding import QwenEmbedding, milvus_client
 from services.embedding.es_client import es_client
+from services.embedding.delete_task_store import delete_task_store
 from config.dependencies import get_milvus_connection
+from config.settings import settings
+from services.cache.search_cache import search_cache
+from services.cache.answer_cache import answer_cache
+from services.kg.graph.chunk_entity_index import chunk_entity_index
 
 router = APIRouter(prefix="/api/v1", tags=["embedding"])
 logger = logging.getLogger(__name__)
 
+def _chunk_metadata(request: EmbedRequest, index: int) -> Dict[str, Any]:
+    """文档级元数据加上该块的原文偏移"""
+    metadata = dict(request.metadata or {})
+    if request.chunk_offsets and index < len(request.chunk_offsets):
+        metadata["start_offset"], metadata["end_offset"] = request.chunk_offsets[index][:2]
+    return metadata
+
 
 @router.post("/embed", response_model=EmbedResponse)
 async def embed_texts(request: EmbedRequest):
@@ -29,12 +44,13 @@ async def embed_texts(request: EmbedRequest):
             "doc_id": request.doc_id,
             "chunk_id": chunk_ids[i],
             "content": request.texts[i],
+            "metadata": request.metadata,
             "embedding": embeddings[i]
         }
         for i in range(len(request.texts))
     ]
 
-    vector_ids = milvus_client.insert(vectors)
+    vector_ids = await milvus_client.insert_async(vectors)
 
     es_documents = [
         {
@@ -43,17 +59,20 @@ async def embed_texts(request: EmbedRequest):
             "content": request.texts[i],
             "title": request.title,
             "keywords": request.keywords,
-            "metadata": request.metadata,
+            "metadata": _chunk_metadata(request, i),
             "milvus_id": vector_ids[i] if i < len(vector_ids) else ""
         }
         for i in range(len(request.texts))
     ]
     
     try:
-        es_client.bulk_index(es_documents)
+        await es_client.bulk_index_async(es_documents)
         logger.info(f"Indexed {len(es_documents)} documents in Elasticsearch")
     except Exception as e:
         logger.warning(f"Failed to index in Elasticsearch: {e}")
+    
+    await search_cache.invalidate()
+    await answer_cache.invalidate_documents([request.doc_id])
 
     embed_time = (time.time() - start_time) * 1000
 
@@ -79,11 +98,12 @@ async def embed_dual_storage(request: EmbedRequest):
             "doc_id": request.doc_id,
             "chunk_id": chunk_ids[i],
             "content": request.texts[i],
+            "metadata": request.metadata,
             "embedding": embeddings[i]
         }
         for i in range(len(request.texts))
     ]
-    vector_ids = milvus_client.insert(vectors)
+    vector_ids = await milvus_client.insert_async(vectors)
     milvus_time = (time.time() - milvus_start) * 1000
 
     es_start = time.time()
@@ -94,7 +114,7 @@ async def embed_dual_storage(request: EmbedRequest):
             "content": request.texts[i],
             "title": request.title,
             "keywords": request.keywords,
-            "metadata": request.metadata,
+            "metadata": _chunk_metadata(request, i),
             "milvus_id": vector_ids[i] if i < len(vector_ids) else ""
         }
         for i in range(len(request.texts))
@@ -102,10 +122,13 @@ async def embed_dual_storage(request: EmbedRequest):
     
     es_success = 0
     try:
-        es_success = es_client.bulk_index(es_documents)
+        es_success = await es_client.bulk_index_async(es_documents)
     except Exception as e:
         logger.error(f"Failed to index in Elasticsearch: {e}")
     es_time = (time.time() - es_start) * 1000
+    
+    await search_cache.invalidate()
+    await answer_cache.invalidate_documents([request.doc_id])
 
     total_time = (time.time() - start_time) * 1000
 
@@ -133,10 +156,11 @@ async def search_vectors(request: SearchRequest):
     embedding_service = QwenEmbedding()
     query_vector = await embedding_service.embed(request.query)
 
-    results = milvus_client.search(
+    results = await milvus_client.search_async(
         query_vector=query_vector,
         top_k=request.top_k,
-        doc_ids=request.doc_ids
+        doc_ids=request.doc_ids,
+        filters=request.filters
     )
 
     search_time = (time.time() - start_time) * 1000
@@ -147,16 +171,28 @@ async def search_vectors(request: SearchRequest):
     )
 
 
+async def _remove_chunk_entities(doc_ids: List[str]):
+    # 映射保存在Neo4j中，图库不可用时不影响向量和关键词的删除
+    try:
+        await chunk_entity_index.remove_documents(doc_ids)
+    except Exception as e:
+        logger.warning(f"Failed to remove chunk entities for {len(doc_ids)} documents: {e}")
+
+
 @router.delete("/vectors")
 async def delete_vectors(request: DeleteRequest):
-    milvus_client.delete_by_doc_id(request.doc_id)
+    await milvus_client.delete_by_doc_id_async(request.doc_id)
     
     try:
-        es_client.delete_document(request.doc_id)
+        await es_client.delete_document_async(request.doc_id)
         logger.info(f"Deleted document from both storages: {request.doc_id}")
     except Exception as e:
         logger.warning(f"Failed to delete from Elasticsearch: {e}")
     
+    await search_cache.invalidate()
+    await answer_cache.invalidate_documents([request.doc_id])
+    await _remove_chunk_entities([request.doc_id])
+    
     return {"message": f"Deleted vectors for doc_id: {request.doc_id}"}
 
 
@@ -164,19 +200,25 @@ async def delete_vectors(request: DeleteRequest):
 async def delete_dual_storage(request: DeleteRequest):
     start_time = time.time()
     
-    milvus_deleted = False
-    es_deleted = False
+    milvus_result, es_result = await asyncio.gather(
+        milvus_client.delete_by_doc_id_async(request.doc_id),
+        es_client.delete_document_async(request.doc_id),
+        return_exceptions=True
+    )
     
-    try:
-        milvus_client.delete_by_doc_id(request.doc_id)
-        milvus_deleted = True
-    except Exception as e:
-        logger.error(f"Failed to delete from Milvus: {e}")
+    await search_cache.invalidate()
+    await answer_cache.invalidate_documents([request.doc_id])
+    await _remove_chunk_entities([request.doc_id])
     
-    try:
-        es_deleted = es_client.delete_document(request.doc_id)
-    except Exception as e:
-        logger.error(f"Failed to delete from Elasticsearch: {e}")
+    milvus_deleted = not isinstance(milvus_result, Exception)
+    if not milvus_deleted:
+        logger.error(f"Failed to delete from Milvus: {milvus_result}")
+    
+    es_deleted = False
+    if isinstance(es_result, Exception):
+        logger.error(f"Failed to delete from Elasticsearch: {es_result}")
+    else:
+        es_deleted = es_result
     
     total_time = (time.time() - start_time) * 1000
     
@@ -186,3 +228,107 @@ async def delete_dual_storage(request: DeleteRequest):
         "es_deleted": es_deleted,
         "time_ms": total_time
     }
+
+
+async def run_batch_delete(task: Dict[str, Any], doc_ids: List[str]):
+    task_id = task["task_id"]
+    task["status"] = "running"
+    await delete_task_store.save(task)
+    batch_size = settings.DELETE_BATCH_SIZE
+    
+    try:
+        for start in range(0, len(doc_ids), batch_size):
+            es_task_id = await es_client.delete_documents_async(doc_ids[start:start + batch_size])
+            task["es_task_ids"].append(es_task_id)
+    except Exception as e:
+        logger.error(f"Failed to submit Elasticsearch delete for task {task_id}: {e}")
+        task["errors"].append(f"elasticsearch: {e}")
+    
+    try:
+        task["milvus_deleted"] = await milvus_client.delete_by_doc_ids_async(doc_ids, batch_size=batch_size)
+    except Exception as e:
+        logger.error(f"Failed to delete from Milvus for task {task_id}: {e}")
+        task["errors"].append(f"milvus: {e}")
+    
+    await search_cache.invalidate()
+    await answer_cache.invalidate_documents(doc_ids)
+    await _remove_chunk_entities(doc_ids)
+    task["status"] = "failed" if task["errors"] else "submitted"
+    await delete_task_store.save(task)
+    logger.info(f"Batch delete task {task_id}: {len(doc_ids)} documents, {len(task['es_task_ids'])} ES tasks")
+    
+    if task["es_task_ids"]:
+        await _watch_es_tasks(task, doc_ids)
+
+
+async def _watch_es_tasks(task: Dict[str, Any], doc_ids: List[str]):
+    """轮询ES删除任务直到全部完成，完成后再失效一次缓存，清掉删除期间写入的旧结果"""
+    deadline = time.time() + settings.DELETE_TASK_WATCH_TIMEOUT
+    while True:
+        es_tasks = []
+        for es_task_id in task["es_task_ids"]:
+            try:
+                es_tasks.append(await es_client.get_task_async(es_task_id))
+            except Exception as e:
+                logger.warning(f"Failed to query Elasticsearch task {es_task_id}: {e}")
+                es_tasks.append({"task_id": es_task_id, "completed": False, "error": str(e)})
+        task["es_tasks"] = es_tasks
+        
+        if all(t.get("completed") for t in es_tasks):
+            break
+        if time.time() >= deadline:
+            task["errors"].append("elasticsearch: delete tasks did not complete before the watch timeout")
+            break
+        await delete_task_store.save(task)
+        await asyncio.sleep(settings.DELETE_TASK_POLL_INTERVAL)
+    
+    await search_cache.invalidate()
+    await answer_cache.invalidate_documents(doc_ids)
+    
+    failed = task["errors"] or any(t.get("error") or t.get("failures") for t in es_tasks)
+    if task["status"] == "submitted":
+        task["status"] = "failed" if failed else "completed"
+    await delete_task_store.save(task)
+    logger.info(f"Batch delete task {task['task_id']} finished: {task['status']}")
+
+
+@router.post("/vectors/delete-batch", response_model=BatchDeleteResponse)
+async def delete_vectors_batch(request: BatchDeleteRequest, background_tasks: BackgroundTasks):
+    task_id = str(uuid4())
+    doc_ids = list(dict.fromkeys(request.doc_ids))
+    
+    task = {
+        "task_id": task_id,
+        "status": "pending",
+        "doc_count": len(doc_ids),
+        "milvus_deleted": 0,
+        "es_task_ids": [],
+        "es_tasks": [],
+        "errors": []
+    }
+    await delete_task_store.save(task)
+    
+    background_tasks.add_task(run_batch_delete, task, doc_ids)
+    
+    return BatchDeleteResponse(
+        task_id=task_id,
+        doc_count=len(doc_ids),
+        status="pending",
+        message="批量删除任务已创建，正在后台执行"
+    )
+
+
+@router.get("/tasks/{task_id}", response_model=DeleteTaskStatusResponse)
+async def get_delete_task_status(task_id: str):
+    task = await delete_task_store.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    return DeleteTaskStatusResponse(
+        task_id=task_id,
+        status=task["status"],
+        doc_count=task["doc_count"],
+        milvus_deleted=task["milvus_deleted"],
+        es_tasks=task["es_tasks"],
+        errors=task["errors"]
+    )
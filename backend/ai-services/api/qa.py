@@ -1,24 +1,26 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import Dict, Optional, AsyncIterator, Callable
 import time
 import uuid
 import logging
-import asyncio
 
-from models.qa_models import (
-    ChatRequest, ChatResponse, ChatMessage, SourceReference, GraphContext
-)
+from models.qa_models import ChatRequest, ChatResponse
 from services.qa import context_builder, sse_stream_handler, reference_annotator, qa_prompt_template
-from services.search.rrf_fusion import rrf_fusion
-from services.search.reranker import reranker_service
+from services.qa.sse_encoder import sse_encoder
+from services.qa.context_compressor import context_compressor
+from services.qa.conversation_store import ConversationState, conversation_store
+from services.qa.retrieval_pipeline import retrieval_pipeline, StageTimer, RetrievalOutput
+from services.cache.search_cache import search_cache
+from services.cache.semantic_cache import semantic_cache
+from services.cache.answer_cache import answer_cache
 from services.embedding.milvus_client import milvus_client
 from services.embedding.es_client import es_client
-from services.embedding.qwen_embedding import qwen_embedding
 from services.kg.graph.traversal_engine import traversal_engine
 from services.kg.evidence.chain_builder import evidence_chain_builder
 from config.settings import settings
+from utils.concurrency import cancel_on_disconnect
 
 logger = logging.getLogger(__name__)
 
@@ -39,48 +41,35 @@ async def chat(request: ChatRequest):
     logger.info(f"Chat request: query='{request.query[:50]}...', conv_id={conversation_id}")
     
     try:
-        query_vector = await qwen_embedding.embed_single(request.query)
-        
-        keyword_results = es_client.search(
+        timer = StageTimer()
+        retrieval = await retrieval_pipeline.run(
             query=request.query,
-            top_k=request.keyword_top_k if hasattr(request, 'keyword_top_k') else 50,
-            filters=request.filters
-        )
-        
-        vector_results = milvus_client.search(
-            query_vector=query_vector,
-            top_k=request.vector_top_k if hasattr(request, 'vector_top_k') else 50
+            top_k=request.top_k,
+            filters=request.filters,
+            use_rerank=request.use_rerank,
+            rerank_mode=request.rerank_mode,
+            use_graph=request.use_graph,
+            compress=request.compress_context,
+            timer=timer
         )
         
-        fused_results = rrf_fusion.fuse(keyword_results, vector_results)
-        
-        if request.use_rerank and len(fused_results) > 0:
-            fused_results = await reranker_service.rerank(
+        conversation = await _load_conversation(conversation_id, request)
+        with timer.measure("context"):
+            context_result = context_builder.build_context(
                 query=request.query,
-                documents=fused_results,
-                top_n=request.top_k
+                search_results=retrieval.results,
+                graph_context=retrieval.graph_context,
+                conversation=conversation
             )
-        else:
-            fused_results = fused_results[:request.top_k]
         
-        graph_context = None
-        if request.use_graph:
-            try:
-                graph_context = await _build_graph_context(request.query, fused_results)
-            except Exception as e:
-                logger.warning(f"Graph context build failed: {e}")
-        
-        context_result = context_builder.build_context(
+        answer = await timer.run("generation", sse_stream_handler.generate(
             query=request.query,
-            search_results=fused_results,
-            graph_context=graph_context,
-            history=[msg.model_dump() for msg in request.history] if request.history else None
-        )
+            context=context_result.context_text,
+            sources=context_result.sources,
+            on_generated=_generation_recorder(retrieval)
+        ))
         
-        answer = await sse_stream_handler.generate(
-            query=request.query,
-            context=context_result.context_text
-        )
+        await conversation_store.append(conversation_id, request.query, answer)
         
         annotated = reference_annotator.annotate_response(
             response=answer,
@@ -91,15 +80,17 @@ async def chat(request: ChatRequest):
         
         latency_ms = (time.time() - start_time) * 1000
         
-        logger.info(f"Chat completed: {latency_ms:.1f}ms, {len(sources)} sources")
+        logger.info(f"Chat completed: {latency_ms:.1f}ms, {len(sources)} sources, stages={timer.timings}")
         
         return ChatResponse(
             answer=annotated.text,
             sources=sources,
-            graph_context=graph_context,
+            graph_context=retrieval.graph_context,
             conversation_id=conversation_id,
             query=request.query,
-            latency_ms=latency_ms
+            latency_ms=latency_ms,
+            timings=timer.timings,
+            compression_ratio=retrieval.compression_ratio
         )
         
     except Exception as e:
@@ -108,66 +99,53 @@ async def chat(request: ChatRequest):
 
 
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     conversation_id = request.conversation_id or str(uuid.uuid4())
     
     logger.info(f"Stream chat request: query='{request.query[:50]}...'")
     
     async def generate():
         try:
-            yield f"data: {{'type': 'start', 'conversation_id': '{conversation_id}'}}\n\n"
-            
-            query_vector = await qwen_embedding.embed_single(request.query)
+            yield sse_encoder.event("start", conversation_id=conversation_id)
             
-            keyword_results = es_client.search(
+            timer = StageTimer()
+            retrieval = await retrieval_pipeline.run(
                 query=request.query,
-                top_k=50,
-                filters=request.filters
+                top_k=request.top_k,
+                filters=request.filters,
+                use_rerank=request.use_rerank,
+                rerank_mode=request.rerank_mode,
+                use_graph=request.use_graph,
+                compress=request.compress_context,
+                timer=timer
             )
             
-            vector_results = milvus_client.search(
-                query_vector=query_vector,
-                top_k=50
-            )
-            
-            fused_results = rrf_fusion.fuse(keyword_results, vector_results)
-            
-            if request.use_rerank and len(fused_results) > 0:
-                fused_results = await reranker_service.rerank(
+            conversation = await _load_conversation(conversation_id, request)
+            with timer.measure("context"):
+                context_result = context_builder.build_context(
                     query=request.query,
-                    documents=fused_results,
-                    top_n=request.top_k
+                    search_results=retrieval.results,
+                    graph_context=retrieval.graph_context,
+                    conversation=conversation
                 )
-            else:
-                fused_results = fused_results[:request.top_k]
-            
-            graph_context = None
-            if request.use_graph:
-                try:
-                    graph_context = await _build_graph_context(request.query, fused_results)
-                except Exception as e:
-                    logger.warning(f"Graph context build failed: {e}")
             
-            context_result = context_builder.build_context(
-                query=request.query,
-                search_results=fused_results,
-                graph_context=graph_context,
-                history=[msg.model_dump() for msg in request.history] if request.history else None
-            )
+            yield _timings_event(timer.timings, retrieval.compression_ratio)
             
             async for chunk in sse_stream_handler.stream_generate(
                 query=request.query,
                 context=context_result.context_text,
-                sources=context_result.sources
+                sources=context_result.sources,
+                on_generated=_generation_recorder(retrieval),
+                on_answer=lambda answer: conversation_store.append(conversation_id, request.query, answer)
             ):
                 yield chunk
             
         except Exception as e:
             logger.error(f"Stream error: {e}")
-            yield f"data: {{'type': 'error', 'error': '{str(e)}'}}\n\n"
+            yield sse_encoder.error(str(e))
     
     return StreamingResponse(
-        generate(),
+        _guard_stream(generate(), http_request),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -178,47 +156,55 @@ async def chat_stream(request: ChatRequest):
 
 
 @router.post("/simple")
-async def simple_chat(request: SimpleChatRequest):
+async def simple_chat(request: SimpleChatRequest, http_request: Request):
     start_time = time.time()
     
     try:
-        query_vector = await qwen_embedding.embed_single(request.query)
-        
-        keyword_results = es_client.search(query=request.query, top_k=30)
-        vector_results = milvus_client.search(query_vector=query_vector, top_k=30)
-        
-        fused_results = rrf_fusion.fuse(keyword_results, vector_results)[:request.top_k]
-        
-        context_result = context_builder.build_context(
+        timer = StageTimer()
+        retrieval = await retrieval_pipeline.run(
             query=request.query,
-            search_results=fused_results
+            top_k=request.top_k,
+            keyword_top_k=30,
+            vector_top_k=30,
+            timer=timer
         )
         
+        with timer.measure("context"):
+            context_result = context_builder.build_context(
+                query=request.query,
+                search_results=retrieval.results
+            )
+        
         if request.stream:
             async def generate():
+                yield _timings_event(timer.timings, retrieval.compression_ratio)
                 async for chunk in sse_stream_handler.stream_generate(
                     query=request.query,
                     context=context_result.context_text,
-                    sources=context_result.sources
+                    sources=context_result.sources,
+                    on_generated=_generation_recorder(retrieval)
                 ):
                     yield chunk
             
             return StreamingResponse(
-                generate(),
+                _guard_stream(generate(), http_request),
                 media_type="text/event-stream"
             )
         else:
-            answer = await sse_stream_handler.generate(
+            answer = await timer.run("generation", sse_stream_handler.generate(
                 query=request.query,
-                context=context_result.context_text
-            )
+                context=context_result.context_text,
+                sources=context_result.sources,
+                on_generated=_generation_recorder(retrieval)
+            ))
             
             latency_ms = (time.time() - start_time) * 1000
             
             return {
                 "answer": answer,
                 "sources": [s.model_dump() for s in context_result.sources],
-                "latency_ms": latency_ms
+                "latency_ms": latency_ms,
+                "timings": timer.timings
             }
             
     except Exception as e:
@@ -226,6 +212,12 @@ async def simple_chat(request: SimpleChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.delete("/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    await conversation_store.delete(conversation_id)
+    return {"conversation_id": conversation_id, "deleted": True}
+
+
 @router.get("/health")
 async def qa_health():
     return {
@@ -234,44 +226,49 @@ async def qa_health():
             "embedding": "configured" if settings.QWEN_API_KEY else "not_configured",
             "milvus": "connected" if milvus_client._collection else "not_connected",
             "elasticsearch": "connected" if es_client.client else "not_connected"
-        }
+        },
+        "cache": {
+            "search": search_cache.get_stats(),
+            "semantic": semantic_cache.get_stats(),
+            "answer": answer_cache.get_stats(),
+            "conversations": conversation_store.get_stats()
+        },
+        "streams": sse_stream_handler.stats.to_dict(),
+        "compression": context_compressor.get_stats()
     }
 
 
-async def _build_graph_context(
-    query: str,
-    search_results: List[Dict[str, Any]]
-) -> Optional[GraphContext]:
-    entities = []
-    relations = []
-    paths = []
-    
-    entity_keywords = _extract_keywords(query)
-    
-    for result in search_results[:5]:
-        content = result.get("content", "")
-        
-        try:
-            from services.kg.entity.llm_extractor import llm_entity_extractor
-            extracted_entities = await llm_entity_extractor.extract(content[:500])
-            
-            for entity in extracted_entities[:3]:
-                entities.append({
-                    "name": entity.name,
-                    "type": entity.type,
-                    "description": entity.description
-                })
-        except Exception as e:
-            logger.debug(f"Entity extraction skipped: {e}")
-    
-    return GraphContext(
-        entities=entities[:10],
-        relations=relations[:10],
-        paths=paths[:3]
-    )
+def _timings_event(timings: Dict[str, float], compression_ratio: Optional[float] = None) -> str:
+    if compression_ratio is None:
+        return sse_encoder.event("timings", timings=timings)
+    return sse_encoder.event("timings", timings=timings, compression_ratio=compression_ratio)
+
+
+async def _load_conversation(conversation_id: str, request: ChatRequest) -> Optional[ConversationState]:
+    """客户端传了history时以它为准重建会话状态，否则读取服务端保存的会话"""
+    if request.history:
+        return await conversation_store.replace(
+            conversation_id, [msg.model_dump() for msg in request.history]
+        )
+    return await conversation_store.get(conversation_id)
 
 
-def _extract_keywords(text: str) -> List[str]:
-    import re
-    words = re.findall(r'[\u4e00-\u9fa5]+|[a-zA-Z]+', text)
-    return [w for w in words if len(w) >= 2][:5]
+def _generation_recorder(retrieval: RetrievalOutput) -> Callable[[float], None]:
+    compressed = retrieval.compression_ratio is not None
+    return lambda latency_ms: context_compressor.record_generation(compressed, latency_ms)
+
+
+async def _wait_disconnect(http_request: Request):
+    # 请求体已被解析，之后receive只会在客户端断开时返回http.disconnect
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+def _guard_stream(stream: AsyncIterator[str], http_request: Request) -> AsyncIterator[str]:
+    return cancel_on_disconnect(
+        stream,
+        lambda: _wait_disconnect(http_request),
+        on_disconnect=sse_stream_handler.stats.record_disconnect
+    )
@@ -8,6 +8,7 @@ import logging
 from services.embedding.es_client import es_client
 from services.embedding.milvus_client import milvus_client
 from services.search.rrf_fusion import rrf_fusion
+from services.cache.search_cache import search_cache
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,7 @@ class HybridSearchRequest(BaseModel):
     keyword_top_k: int = Field(default=100, description="关键词检索返回数量")
     vector_top_k: int = Field(default=100, description="向量检索返回数量")
     rrf_k: int = Field(default=60, description="RRF融合参数k")
+    lean: bool = Field(default=False, description="关键词检索结果只返回doc_id、chunk_id、content、title和过滤用元数据")
 
 
 class SearchResult(BaseModel):
@@ -45,46 +47,121 @@ class HybridSearchResponse(BaseModel):
     keyword_result_count: int
     vector_result_count: int
     final_result_count: int
+    cached: bool = False
+
+
+class BatchVectorSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=256, description="查询文本列表")
+    top_k: int = Field(default=20, ge=1, le=1000, description="每个查询返回结果数量")
+    doc_ids: Optional[List[str]] = Field(default=None, description="限定检索的文档ID")
+    filters: Optional[Dict[str, Any]] = Field(default=None, description="元数据过滤条件")
+
+
+class BatchKeywordSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=256, description="查询文本列表")
+    top_k: int = Field(default=20, ge=1, le=1000, description="每个查询返回结果数量")
+    filters: Optional[Dict[str, Any]] = Field(default=None, description="过滤条件")
+
+
+class BatchKeywordSearchResponse(BaseModel):
+    results: List[List[Dict[str, Any]]]
+    search_time_ms: float
+    query_count: int
+
+
+class BatchVectorSearchResponse(BaseModel):
+    results: List[List[Dict[str, Any]]]
+    embed_time_ms: float
+    search_time_ms: float
+    total_time_ms: float
+    query_count: int
 
 
 @router.post("/hybrid", response_model=HybridSearchResponse)
 async def hybrid_search(request: HybridSearchRequest):
     start_time = time.time()
     
+    outcome, cached = await search_cache.get_or_compute(
+        "hybrid",
+        request.query,
+        lambda: _execute_hybrid_search(request),
+        filters=request.filters,
+        should_cache=lambda o: not o["degraded"],
+        top_k=request.top_k,
+        keyword_enabled=request.keyword_enabled,
+        vector_enabled=request.vector_enabled,
+        keyword_top_k=request.keyword_top_k,
+        vector_top_k=request.vector_top_k,
+        rrf_k=request.rrf_k,
+        lean=request.lean
+    )
+    
+    total_time_ms = (time.time() - start_time) * 1000
+    fused_results = outcome["results"]
+    
+    if cached:
+        logger.info(f"Hybrid search served from cache: {len(fused_results)} results, {total_time_ms:.1f}ms")
+    else:
+        logger.info(
+            f"Hybrid search completed: keyword={outcome['keyword_result_count']} ({outcome['keyword_time_ms']:.1f}ms), "
+            f"vector={outcome['vector_result_count']} ({outcome['vector_time_ms']:.1f}ms), "
+            f"fusion={len(fused_results)} ({outcome['fusion_time_ms']:.1f}ms), "
+            f"total={total_time_ms:.1f}ms"
+        )
+
+    return HybridSearchResponse(
+        results=fused_results,
+        keyword_time_ms=0 if cached else outcome["keyword_time_ms"],
+        vector_time_ms=0 if cached else outcome["vector_time_ms"],
+        fusion_time_ms=0 if cached else outcome["fusion_time_ms"],
+        total_time_ms=total_time_ms,
+        keyword_result_count=outcome["keyword_result_count"],
+        vector_result_count=outcome["vector_result_count"],
+        final_result_count=len(fused_results),
+        cached=cached
+    )
+
+
+async def _execute_hybrid_search(request: HybridSearchRequest) -> Dict[str, Any]:
     keyword_results = []
     vector_results = []
     keyword_time_ms = 0
     vector_time_ms = 0
+    degraded = False
 
     async def run_keyword_search():
-        nonlocal keyword_results, keyword_time_ms
+        nonlocal keyword_results, keyword_time_ms, degraded
         if not request.keyword_enabled:
             return
         try:
             kw_start = time.time()
-            keyword_results = es_client.search(
+            keyword_results = await es_client.search_async(
                 query=request.query,
                 top_k=request.keyword_top_k,
-                filters=request.filters
+                filters=request.filters,
+                lean=request.lean
             )
             keyword_time_ms = (time.time() - kw_start) * 1000
         except Exception as e:
+            degraded = True
             logger.error(f"Keyword search failed: {e}")
 
     async def run_vector_search():
-        nonlocal vector_results, vector_time_ms
+        nonlocal vector_results, vector_time_ms, degraded
         if not request.vector_enabled:
             return
         try:
             vec_start = time.time()
             from services.embedding.qwen_embedding import qwen_embedding
             query_vector = await qwen_embedding.embed_single(request.query)
-            vector_results = milvus_client.search(
+            vector_results = await milvus_client.search_async(
                 query_vector=query_vector,
-                top_k=request.vector_top_k
+                top_k=request.vector_top_k,
+                filters=request.filters
             )
             vector_time_ms = (time.time() - vec_start) * 1000
         except Exception as e:
+            degraded = True
             logger.error(f"Vector search failed: {e}")
 
     await asyncio.gather(run_keyword_search(), run_vector_search())
@@ -93,32 +170,20 @@ async def hybrid_search(request: HybridSearchRequest):
     fused_results = rrf_fusion.fuse(
         keyword_results=keyword_results,
         vector_results=vector_results,
-        k=request.rrf_k
+        k=request.rrf_k,
+        top_k=request.top_k
     )
     fusion_time_ms = (time.time() - fusion_start) * 1000
 
-    if len(fused_results) > request.top_k:
-        fused_results = fused_results[:request.top_k]
-
-    total_time_ms = (time.time() - start_time) * 1000
-
-    logger.info(
-        f"Hybrid search completed: keyword={len(keyword_results)} ({keyword_time_ms:.1f}ms), "
-        f"vector={len(vector_results)} ({vector_time_ms:.1f}ms), "
-        f"fusion={len(fused_results)} ({fusion_time_ms:.1f}ms), "
-        f"total={total_time_ms:.1f}ms"
-    )
-
-    return HybridSearchResponse(
-        results=fused_results,
-        keyword_time_ms=keyword_time_ms,
-        vector_time_ms=vector_time_ms,
-        fusion_time_ms=fusion_time_ms,
-        total_time_ms=total_time_ms,
-        keyword_result_count=len(keyword_results),
-        vector_result_count=len(vector_results),
-        final_result_count=len(fused_results)
-    )
+    return {
+        "results": fused_results,
+        "keyword_time_ms": keyword_time_ms,
+        "vector_time_ms": vector_time_ms,
+        "fusion_time_ms": fusion_time_ms,
+        "keyword_result_count": len(keyword_results),
+        "vector_result_count": len(vector_results),
+        "degraded": degraded
+    }
 
 
 @router.get("/keyword")
@@ -129,7 +194,7 @@ async def keyword_search(
     start_time = time.time()
     
     try:
-        results = es_client.search(query=query, top_k=top_k)
+        results = await es_client.search_async(query=query, top_k=top_k)
         time_ms = (time.time() - start_time) * 1000
         
         logger.info(f"Keyword search: query='{query[:50]}...', {len(results)} results in {time_ms:.1f}ms")
@@ -155,7 +220,7 @@ async def vector_search(
         from services.embedding.qwen_embedding import qwen_embedding
         query_vector = await qwen_embedding.embed_single(query)
         
-        results = milvus_client.search(query_vector=query_vector, top_k=top_k)
+        results = await milvus_client.search_async(query_vector=query_vector, top_k=top_k)
         time_ms = (time.time() - start_time) * 1000
         
         logger.info(f"Vector search: {len(results)} results in {time_ms:.1f}ms")
@@ -170,6 +235,66 @@ async def vector_search(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/keyword/batch", response_model=BatchKeywordSearchResponse)
+async def batch_keyword_search(request: BatchKeywordSearchRequest):
+    start_time = time.time()
+    
+    try:
+        results = await es_client.msearch_async(
+            queries=request.queries,
+            top_k=request.top_k,
+            filters=request.filters
+        )
+        search_time_ms = (time.time() - start_time) * 1000
+        
+        logger.info(f"Batch keyword search: {len(request.queries)} queries in {search_time_ms:.1f}ms")
+        
+        return BatchKeywordSearchResponse(
+            results=results,
+            search_time_ms=search_time_ms,
+            query_count=len(request.queries)
+        )
+    except Exception as e:
+        logger.error(f"Batch keyword search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/vector/batch", response_model=BatchVectorSearchResponse)
+async def batch_vector_search(request: BatchVectorSearchRequest):
+    start_time = time.time()
+    
+    try:
+        from services.embedding.qwen_embedding import qwen_embedding
+        query_vectors = await qwen_embedding.embed_batch(request.queries)
+        embed_time_ms = (time.time() - start_time) * 1000
+        
+        search_start = time.time()
+        results = await milvus_client.search_many_async(
+            query_vectors=query_vectors,
+            top_k=request.top_k,
+            doc_ids=request.doc_ids,
+            filters=request.filters
+        )
+        search_time_ms = (time.time() - search_start) * 1000
+        total_time_ms = (time.time() - start_time) * 1000
+        
+        logger.info(
+            f"Batch vector search: {len(request.queries)} queries, "
+            f"embed={embed_time_ms:.1f}ms, search={search_time_ms:.1f}ms"
+        )
+        
+        return BatchVectorSearchResponse(
+            results=results,
+            embed_time_ms=embed_time_ms,
+            search_time_ms=search_time_ms,
+            total_time_ms=total_time_ms,
+            query_count=len(request.queries)
+        )
+    except Exception as e:
+        logger.error(f"Batch vector search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/health")
 async def health_check():
     es_health = es_client.health_check()
@@ -182,5 +307,6 @@ async def health_check():
         },
         "milvus": {
             "status": "healthy" if milvus_health else "unhealthy"
-        }
+        },
+        "cache": search_cache.get_stats()
     }
@@ -6,6 +6,7 @@ import logging
 from config.kg_settings import kg_settings
 from config.logging import setup_logging
 from services.kg.graph.neo4j_client import neo4j_client
+from services.kg.graph.entity_linker import entity_linker
 from api.entity import router as entity_router
 from api.relation import router as relation_router
 from api.graph import router as graph_router
@@ -24,6 +25,7 @@ async def lifespan(app: FastAPI):
         connected = await neo4j_client.connect()
         if connected:
             logger.info(f"Neo4j connection established at {kg_settings.NEO4J_URI}")
+            await entity_linker.load()
         else:
             logger.warning("Failed to connect to Neo4j on startup")
     except Exception as e:
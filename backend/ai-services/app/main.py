@@ -24,6 +24,11 @@ from api.error_handlers import (
 )
 from exceptions import AIServiceException
 from services.embedding.es_client import es_client
+from services.cache.redis_cache import redis_cache
+from services.search.reranker import reranker_service
+from services.kg.graph.neo4j_client import neo4j_client
+from services.kg.graph.entity_linker import entity_linker
+from utils.concurrency import io_executor
 
 logger = setup_logging()
 
@@ -44,10 +49,23 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Failed to connect to Elasticsearch: {e}")
 
+    await redis_cache.connect()
+
+    if await neo4j_client.connect():
+        try:
+            await entity_linker.load()
+        except Exception as e:
+            logger.warning(f"Failed to load entity linker: {e}")
+
     yield
 
     logger.info("Shutting down AI Services...")
     milvus_connection.disconnect()
+    es_client.close()
+    await redis_cache.disconnect()
+    await reranker_service.close()
+    await neo4j_client.close()
+    io_executor.shutdown(wait=False)
 
 
 app = FastAPI(
@@ -30,6 +30,10 @@ class KGSettings(BaseSettings):
     DEFAULT_LIMIT: int = Field(default=100, ge=1, le=1000)
     
     SIMILARITY_THRESHOLD: float = Field(default=0.85, ge=0.0, le=1.0)
+    ENTITY_LINKER_MIN_LENGTH: int = Field(default=2, ge=1)
+    ENTITY_LINKER_DELTA_LIMIT: int = Field(default=256, ge=1)
+    ENTITY_LINKER_REFRESH_INTERVAL: float = 300.0
+    ENTITY_LINKER_RETRY_INTERVAL: float = 30.0
     ENTITY_CONFIDENCE_THRESHOLD: float = Field(default=0.5, ge=0.0, le=1.0)
 
     class Config:
@@ -15,6 +15,19 @@ class Settings(BaseSettings):
     MILVUS_HOST: str = "localhost"
     MILVUS_PORT: int = 19530
     MILVUS_COLLECTION: str = "document_vectors"
+    MILVUS_INDEX_TYPE: str = "IVF_FLAT"
+    MILVUS_INDEX_NLIST: int = 1024
+    MILVUS_SEARCH_NPROBE: int = 10
+    MILVUS_HNSW_M: int = 16
+    MILVUS_HNSW_EF_CONSTRUCTION: int = 200
+    MILVUS_SEARCH_EF: int = 64
+    MILVUS_PQ_M: int = 16
+    MILVUS_PQ_NBITS: int = 8
+    MILVUS_PARTITION_KEY: str = ""
+    MILVUS_NUM_PARTITIONS: int = 16
+
+    VECTOR_STORE_BACKEND: str = "milvus"
+    VECTOR_STORE_DIR: str = "./data/vector_store"
 
     ES_HOST: str = "localhost"
     ES_PORT: int = 9200
@@ -22,6 +35,35 @@ class Settings(BaseSettings):
     ES_USERNAME: Optional[str] = None
     ES_PASSWORD: Optional[str] = None
     ES_SCHEME: str = "http"
+    ES_BULK_CHUNK_SIZE: int = 500
+    ES_BULK_THREAD_COUNT: int = 1
+    ES_DELETE_SLICES: str = "auto"
+    DELETE_BATCH_SIZE: int = 1000
+    DELETE_TASK_TTL: int = 86400
+    DELETE_TASK_CACHE_SIZE: int = 1000
+    DELETE_TASK_POLL_INTERVAL: float = 2.0
+    DELETE_TASK_WATCH_TIMEOUT: float = 3600.0
+
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL: int = 300
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_SIZE: int = 2048
+    SEMANTIC_CACHE_TTL: int = 600
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL: int = 600
+    ANSWER_CACHE_SIZE: int = 500
+
+    CONVERSATION_TTL: int = 86400
+    CONVERSATION_CACHE_SIZE: int = 1000
+    CONVERSATION_RECENT_MESSAGES: int = 6
+    CONVERSATION_SUMMARY_MAX_CHARS: int = 800
+    CONVERSATION_MESSAGE_MAX_CHARS: int = 500
+    CONVERSATION_HISTORY_MAX_TOKENS: int = 1000
+
+    KEYWORD_STORE_BACKEND: str = "elasticsearch"
+    KEYWORD_STORE_DIR: str = "./data/keyword_store"
+    KEYWORD_SNAPSHOT_INTERVAL: float = 30.0
 
     QWEN_API_KEY: str = ""
     QWEN_API_URL: str = "https://dashscope.aliyuncs.com/api/v1/services/embeddings/text-embedding/text-embedding"
@@ -37,6 +79,34 @@ class Settings(BaseSettings):
     RRF_K: int = 60
     DEFAULT_TOP_K: int = 100
 
+    RERANK_DEPTH: int = 30
+    RERANK_BATCH_SIZE: int = 10
+    RERANK_MAX_CONCURRENCY: int = 4
+    RERANK_BUDGET_MS: int = 1500
+    RERANK_CACHE_SIZE: int = 20000
+    RERANK_CACHE_TTL: int = 1800
+    # 重排序接口失败或超出预算时的兜底：local为本地词法重排序，fused为保持融合顺序
+    RERANK_FALLBACK: str = "local"
+
+    PASSAGE_MERGE_ENABLED: bool = True
+    PASSAGE_MERGE_MIN_OVERLAP: int = 20
+    PASSAGE_MERGE_MAX_CHARS: int = 2000
+    MMR_LAMBDA: float = 0.7
+    MMR_CANDIDATE_FACTOR: int = 2
+
+    CONTEXT_PACKING: str = "knapsack"
+    CONTEXT_TOKEN_COST: float = 0.001
+    CONTEXT_COMPRESSION_ENABLED: bool = False
+    CONTEXT_COMPRESSION_MAX_SENTENCES: int = 3
+    CONTEXT_COMPRESSION_MIN_CHARS: int = 200
+
+    SSE_COALESCE_ENABLED: bool = True
+    SSE_COALESCE_WINDOW_MS: float = 50.0
+    SSE_COALESCE_MAX_CHARS: int = 64
+    SSE_ANNOTATE_REFERENCES: bool = True
+
+    IO_THREAD_POOL_SIZE: int = 16
+
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
@@ -1,11 +1,19 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Dict, Any, Optional
 
 
 class EmbedRequest(BaseModel):
     texts: List[str]
     doc_id: str = ""
     chunk_ids: Optional[List[str]] = None
+    title: Optional[str] = None
+    keywords: Optional[List[str]] = None
+    metadata: Optional[Dict[str, Any]] = Field(
+        default=None, description="元数据，category/tenant/doc_type会写入向量库用于过滤"
+    )
+    chunk_offsets: Optional[List[List[int]]] = Field(
+        default=None, description="每个文本块在原文中的[start_offset, end_offset]，用于检索后合并相邻块"
+    )
 
 
 class EmbedResponse(BaseModel):
@@ -18,6 +26,7 @@ class SearchRequest(BaseModel):
     query: str
     top_k: int = Field(default=10, ge=1, le=100)
     doc_ids: Optional[List[str]] = None
+    filters: Optional[Dict[str, Any]] = None
 
 
 class SearchResult(BaseModel):
@@ -26,6 +35,7 @@ class SearchResult(BaseModel):
     doc_id: str
     chunk_id: str
     content: str
+    metadata: Optional[Dict[str, Any]] = None
 
 
 class SearchResponse(BaseModel):
@@ -35,3 +45,23 @@ class SearchResponse(BaseModel):
 
 class DeleteRequest(BaseModel):
     doc_id: str
+
+
+class BatchDeleteRequest(BaseModel):
+    doc_ids: List[str] = Field(..., min_length=1, max_length=100000, description="待删除的文档ID列表")
+
+
+class BatchDeleteResponse(BaseModel):
+    task_id: str
+    doc_count: int
+    status: str
+    message: str
+
+
+class DeleteTaskStatusResponse(BaseModel):
+    task_id: str
+    status: str
+    doc_count: int
+    milvus_deleted: int = 0
+    es_tasks: List[Dict[str, Any]] = []
+    errors: List[str] = []
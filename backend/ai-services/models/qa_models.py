@@ -33,12 +33,20 @@ class GraphContext(BaseModel):
 class ChatRequest(BaseModel):
     query: str = Field(..., description="用户问题", min_length=1, max_length=2000)
     conversation_id: Optional[str] = Field(None, description="会话ID")
-    history: Optional[List[ChatMessage]] = Field(default=None, description="对话历史")
+    history: Optional[List[ChatMessage]] = Field(
+        default=None, description="对话历史，传入时覆盖服务端保存的会话；省略时按conversation_id读取服务端会话"
+    )
     top_k: int = Field(default=10, description="检索结果数量")
     use_graph: bool = Field(default=True, description="是否使用图谱检索")
     use_rerank: bool = Field(default=True, description="是否使用重排序")
+    rerank_mode: Optional[str] = Field(
+        default=None, pattern="^(api|local)$", description="重排序方式: api远程模型/local本地词法特征"
+    )
     stream: bool = Field(default=True, description="是否流式输出")
     filters: Optional[Dict[str, Any]] = Field(default=None, description="过滤条件")
+    compress_context: Optional[bool] = Field(
+        default=None, description="是否按查询抽取式压缩检索段落，默认取服务配置"
+    )
 
 
 class AnnotatedContent(BaseModel):
@@ -53,6 +61,8 @@ class ChatResponse(BaseModel):
     conversation_id: str = Field(..., description="会话ID")
     query: str = Field(..., description="原始问题")
     latency_ms: float = Field(..., description="响应延迟(ms)")
+    timings: Dict[str, float] = Field(default_factory=dict, description="各阶段耗时(ms)")
+    compression_ratio: Optional[float] = Field(None, description="上下文压缩后与压缩前的字符数之比，未压缩时为空")
 
 
 class StreamChunk(BaseModel):
@@ -1,9 +1,18 @@
 from services.cache.redis_cache import RedisCache, redis_cache
 from services.cache.memory_cache import MemoryCache, memory_cache
+from services.cache.search_cache import SearchResultCache, search_cache
+from services.cache.semantic_cache import SemanticCache, semantic_cache
+from services.cache.answer_cache import AnswerCache, answer_cache
 
 __all__ = [
     "RedisCache",
     "redis_cache",
     "MemoryCache",
     "memory_cache",
+    "SearchResultCache",
+    "search_cache",
+    "SemanticCache",
+    "semantic_cache",
+    "AnswerCache",
+    "answer_cache",
 ]
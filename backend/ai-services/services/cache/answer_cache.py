@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+from threading import Lock
+from typing import Optional, Any, Dict, Iterable, Tuple
+
+from config.settings import settings
+from services.cache.memory_cache import MemoryCache
+from services.cache.redis_cache import RedisCache, redis_cache
+from services.cache.search_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+ChunkKey = Tuple[str, Optional[str]]
+
+
+def context_fingerprint(chunks: Iterable[ChunkKey]) -> str:
+    """按顺序拼接上下文chunk的(doc_id, chunk_id)取哈希，顺序不同视为不同上下文"""
+    joined = "\n".join(f"{doc_id}:{chunk_id or ''}" for doc_id, chunk_id in chunks)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """LLM回答缓存：进程内LRU + Redis两级
+
+    键由规范化查询、上下文chunk顺序指纹和模型配置组成。每个文档维护一个版本号，
+    写入缓存时记录贡献文档的版本，读取时逐一比对，文档重新索引或删除后版本递增，
+    引用了它的回答随即失效。Redis可用时版本号保存在Redis中，多个worker共享。
+    """
+
+    VERSION_PREFIX = "answer:docver:"
+
+    def __init__(
+        self,
+        memory: Optional[MemoryCache] = None,
+        redis: Optional[RedisCache] = None,
+        ttl: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL
+        self.memory = memory or MemoryCache(max_size=settings.ANSWER_CACHE_SIZE, default_ttl=self.ttl)
+        self.redis = redis or redis_cache
+        self.enabled = settings.ANSWER_CACHE_ENABLED if enabled is None else enabled
+        self._versions: Dict[str, int] = {}
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+
+    def make_key(self, query: str, chunks: Iterable[ChunkKey], **config: Any) -> str:
+        config_str = json.dumps(config, sort_keys=True, ensure_ascii=False)
+        raw = f"{context_fingerprint(chunks)}|{config_str}|{normalize_query(query)}"
+        return f"answer:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        entry = self.memory.get(key)
+        if entry is None and self.redis.is_connected:
+            entry = await self.redis.get(key)
+            if entry is not None:
+                self.memory.set(key, entry, ttl=self.ttl)
+
+        if entry is not None and await self.versions(entry["doc_versions"]) != entry["doc_versions"]:
+            self.memory.delete(key)
+            with self._lock:
+                self._stale += 1
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return entry["answer"] if entry else None
+
+    async def versions(self, doc_ids: Iterable[str]) -> Dict[str, int]:
+        """生成前读取贡献文档的版本，生成期间发生的失效不会让旧回答以新版本写入"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if self.redis.is_connected and doc_ids:
+            shared = await self.redis.get_many([f"{self.VERSION_PREFIX}{d}" for d in doc_ids])
+            if shared is not None:
+                return {d: int(v or 0) for d, v in zip(doc_ids, shared)}
+        with self._lock:
+            return {d: self._versions.get(d, 0) for d in doc_ids}
+
+    async def set(self, key: str, answer: str, doc_versions: Dict[str, int]):
+        if not self.enabled or not answer:
+            return
+
+        entry = {"answer": answer, "doc_versions": doc_versions}
+        self.memory.set(key, entry, ttl=self.ttl)
+        if self.redis.is_connected:
+            await self.redis.set(key, entry, ttl=self.ttl)
+
+    async def invalidate_documents(self, doc_ids: Iterable[str]):
+        """文档重新索引或删除后调用，递增其版本号，引用它的已缓存回答在下次读取时失效"""
+        doc_ids = list(dict.fromkeys(doc_ids))
+        with self._lock:
+            for doc_id in doc_ids:
+                self._versions[doc_id] = self._versions.get(doc_id, 0) + 1
+
+        if self.redis.is_connected:
+            for doc_id in doc_ids:
+                await self.redis.incr(f"{self.VERSION_PREFIX}{doc_id}")
+
+        logger.debug(f"Answer cache invalidated for {len(doc_ids)} documents")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": self.memory.get_stats()["size"],
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "hit_rate": round(self._hits / total, 4) if total else 0
+            }
+
+
+answer_cache = AnswerCache()
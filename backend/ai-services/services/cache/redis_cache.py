@@ -75,6 +75,17 @@ class RedisCache:
             logger.warning(f"Redis get failed: {e}")
             return None
     
+    async def get_many(self, keys: List[str]) -> Optional[List[Any]]:
+        if not self._connected or not self._client:
+            return None
+        
+        try:
+            values = await self._client.mget([self._make_key(key) for key in keys])
+            return [json.loads(v) if v else None for v in values]
+        except Exception as e:
+            logger.warning(f"Redis mget failed: {e}")
+            return None
+    
     async def set(
         self,
         key: str,
@@ -119,6 +130,16 @@ class RedisCache:
             logger.warning(f"Redis exists failed: {e}")
             return False
     
+    async def incr(self, key: str) -> Optional[int]:
+        if not self._connected or not self._client:
+            return None
+        
+        try:
+            return await self._client.incr(self._make_key(key))
+        except Exception as e:
+            logger.warning(f"Redis incr failed: {e}")
+            return None
+    
     async def get_embedding(self, text: str) -> Optional[List[float]]:
         key = f"embedding:{self._hash_text(text)}"
         return await self.get(key)
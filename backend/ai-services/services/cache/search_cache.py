@@ -0,0 +1,131 @@
+import json
+import logging
+import unicodedata
+from threading import Lock
+from typing import Optional, Any, Dict, List, Tuple, Callable, Awaitable
+
+from config.settings import settings
+from services.cache.memory_cache import MemoryCache, memory_cache
+from services.cache.redis_cache import RedisCache, redis_cache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """全角转半角、折叠空白并转小写，使等价查询命中同一缓存项"""
+    return " ".join(unicodedata.normalize("NFKC", query).split()).lower()
+
+
+class SearchResultCache:
+    """混合检索结果缓存：进程内LRU + Redis两级
+
+    缓存键包含索引代数，文档写入或删除时代数递增，旧条目自然失效并随TTL过期。
+    Redis可用时代数保存在Redis中，多个worker共享同一失效信号。
+    """
+
+    GENERATION_KEY = "search:generation"
+
+    def __init__(
+        self,
+        memory: Optional[MemoryCache] = None,
+        redis: Optional[RedisCache] = None,
+        ttl: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.memory = memory or memory_cache
+        self.redis = redis or redis_cache
+        self.ttl = ttl or settings.SEARCH_CACHE_TTL
+        self.enabled = settings.SEARCH_CACHE_ENABLED if enabled is None else enabled
+        self._generation = 0
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    async def generation(self) -> int:
+        if self.redis.is_connected:
+            value = await self.redis.get(self.GENERATION_KEY)
+            if value is not None:
+                return int(value)
+        return self._generation
+
+    async def invalidate(self):
+        """文档写入或删除后调用，使所有已缓存的检索结果失效"""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+
+        shared = await self.redis.incr(self.GENERATION_KEY)
+        if shared is not None:
+            generation = shared
+
+        logger.debug(f"Search cache invalidated, generation={generation}")
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        query: str,
+        compute: Callable[[], Awaitable[Any]],
+        filters: Optional[Dict[str, Any]] = None,
+        should_cache: Optional[Callable[[Any], bool]] = None,
+        **params: Any
+    ) -> Tuple[Any, bool]:
+        """命中则返回缓存值，否则执行compute并写入缓存，返回(结果, 是否命中)
+
+        缓存键在compute之前确定，检索期间发生的失效不会让旧结果写入新代数。
+        should_cache返回False的结果（如部分检索失败的降级结果）不写入缓存。
+        """
+        if not self.enabled:
+            return await compute(), False
+
+        cache_query = await self._cache_query(namespace, query, params)
+        value = await self._lookup(cache_query, filters)
+
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+
+        if value is not None:
+            return value, True
+
+        value = await compute()
+        if should_cache is not None and not should_cache(value):
+            return value, False
+
+        self.memory.set_search_result(cache_query, value, filters, ttl=self.ttl)
+        if self.redis.is_connected:
+            await self.redis.set_search_result(cache_query, value, filters)
+        return value, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "generation": self._generation,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0
+            }
+
+    async def _lookup(self, cache_query: str, filters: Optional[Dict[str, Any]]) -> Optional[Any]:
+        value = self.memory.get_search_result(cache_query, filters)
+        if value is None and self.redis.is_connected:
+            value = await self.redis.get_search_result(cache_query, filters)
+            if value is not None:
+                self.memory.set_search_result(cache_query, value, filters, ttl=self.ttl)
+        return value
+
+    async def _cache_query(self, namespace: str, query: str, params: Dict[str, Any]) -> str:
+        generation = await self.generation()
+        param_str = json.dumps(params, sort_keys=True)
+        return f"{namespace}|g{generation}|{param_str}|{normalize_query(query)}"
+
+
+def copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """缓存命中的结果列表与缓存共享对象，下游修改前先浅拷贝"""
+    return [dict(r) for r in results]
+
+
+search_cache = SearchResultCache()
@@ -0,0 +1,162 @@
+import json
+import time
+import logging
+from dataclasses import dataclass
+from threading import Lock
+from typing import Optional, Any, Dict, List
+
+import numpy as np
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SemanticCacheEntry:
+    namespace: str
+    params_key: str
+    generation: int
+    value: Any
+    cost_ms: float
+    expires_at: float
+
+
+class SemanticCache:
+    """按查询向量余弦相似度命中的语义缓存
+
+    最近的查询向量保存在固定容量的归一化矩阵中，一次矩阵乘即可找到最相似的历史查询。
+    只有命名空间、检索参数和索引代数都一致且相似度达到阈值时才返回缓存值，
+    容量满时淘汰最久未使用的条目。
+    """
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        threshold: Optional[float] = None,
+        ttl: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.capacity = capacity or settings.SEMANTIC_CACHE_SIZE
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl = ttl or settings.SEMANTIC_CACHE_TTL
+        self.enabled = settings.SEMANTIC_CACHE_ENABLED if enabled is None else enabled
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[SemanticCacheEntry]] = [None] * self.capacity
+        self._last_used = np.zeros(self.capacity, dtype=np.float64)
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._saved_ms = 0.0
+
+    def lookup(
+        self,
+        namespace: str,
+        embedding: List[float],
+        generation: int,
+        **params: Any
+    ) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        query = _normalize(embedding)
+        params_key = _params_key(params)
+        now = time.time()
+
+        with self._lock:
+            match = None
+            if self._vectors is not None and query.shape[0] == self._vectors.shape[1]:
+                similarities = self._vectors @ query
+                candidates = np.flatnonzero(similarities >= self.threshold)
+                for slot in candidates[np.argsort(-similarities[candidates])]:
+                    entry = self._entries[slot]
+                    if (
+                        entry is not None
+                        and entry.namespace == namespace
+                        and entry.params_key == params_key
+                        and entry.generation == generation
+                        and entry.expires_at > now
+                    ):
+                        match = (int(slot), entry, float(similarities[slot]))
+                        break
+
+            if match is None:
+                self._misses += 1
+                return None
+
+            slot, entry, similarity = match
+            self._last_used[slot] = now
+            self._hits += 1
+            self._saved_ms += entry.cost_ms
+
+        logger.debug(f"Semantic cache hit in {namespace}: similarity={similarity:.4f}")
+        return entry.value
+
+    def store(
+        self,
+        namespace: str,
+        embedding: List[float],
+        value: Any,
+        generation: int,
+        cost_ms: float = 0.0,
+        **params: Any
+    ):
+        if not self.enabled:
+            return
+
+        vector = _normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.capacity
+                self._last_used[:] = 0
+
+            slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._entries[slot] = SemanticCacheEntry(
+                namespace=namespace,
+                params_key=_params_key(params),
+                generation=generation,
+                value=value,
+                cost_ms=cost_ms,
+                expires_at=now + self.ttl
+            )
+            self._last_used[slot] = now
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._entries = [None] * self.capacity
+            self._last_used[:] = 0
+            self._hits = 0
+            self._misses = 0
+            self._saved_ms = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "size": sum(1 for e in self._entries if e is not None),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0,
+                "latency_saved_ms": round(self._saved_ms, 1)
+            }
+
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _params_key(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+semantic_cache = SemanticCache()
@@ -1,4 +1,8 @@
-from .qwen_embedding import QwenEmbedding
+from .qwen_embedding import QwenEmbedding, qwen_embedding
+from .index_config import VectorIndexConfig, VectorIndexType
 from .milvus_client import MilvusClient, milvus_client
 
-__all__ = ['QwenEmbedding', 'MilvusClient', 'milvus_client']
+__all__ = [
+    'QwenEmbedding', 'qwen_embedding', 'VectorIndexConfig', 'VectorIndexType',
+    'MilvusClient', 'milvus_client'
+]
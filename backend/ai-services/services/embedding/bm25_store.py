@@ -0,0 +1,579 @@
+import math
+import os
+import pickle
+import re
+import time
+import logging
+from collections import Counter
+from pathlib import Path
+from threading import RLock, Timer
+from typing import List, Dict, Optional, Any, Iterable, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from services.embedding.es_client import BulkLoadReport
+from services.embedding.vector_filters import METADATA_FIELDS, OFFSET_FIELDS
+from utils.concurrency import io_executor
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[一-鿿㐀-䶿]+|[a-zA-Z0-9]+')
+CJK_PATTERN = re.compile(r'[一-鿿㐀-䶿]')
+
+
+def tokenize(text: str) -> List[str]:
+    """中日韩文本切分为二元组，拉丁文按单词切分并转小写"""
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text or ""):
+        if CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+def _narrow_uint(values: np.ndarray) -> np.ndarray:
+    peak = int(values.max()) if values.size else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if peak <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values.astype(np.uint64)
+
+
+class PostingList:
+    """差分编码并按最小整数类型存储的倒排列表，新文档先进入追加缓冲区"""
+
+    __slots__ = ("_deltas", "_tfs", "_last", "_pending_docs", "_pending_tfs")
+
+    def __init__(self):
+        self._deltas = np.zeros(0, dtype=np.uint8)
+        self._tfs = np.zeros(0, dtype=np.uint8)
+        self._last = -1
+        self._pending_docs: List[int] = []
+        self._pending_tfs: List[int] = []
+
+    def __len__(self) -> int:
+        return self._deltas.size + len(self._pending_docs)
+
+    def add(self, doc_num: int, tf: int):
+        self._pending_docs.append(doc_num)
+        self._pending_tfs.append(tf)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        self._freeze()
+        return np.cumsum(self._deltas, dtype=np.int64), self._tfs
+
+    def _freeze(self):
+        if not self._pending_docs:
+            return
+
+        docs = np.asarray(self._pending_docs, dtype=np.int64)
+        deltas = np.diff(docs, prepend=self._last if self._last >= 0 else 0)
+        if self._last < 0:
+            deltas[0] = docs[0]
+
+        self._deltas = _narrow_uint(np.concatenate([self._deltas.astype(np.int64), deltas]))
+        self._tfs = _narrow_uint(np.concatenate([self._tfs.astype(np.int64), self._pending_tfs]))
+        self._last = int(docs[-1])
+        self._pending_docs = []
+        self._pending_tfs = []
+
+    def __getstate__(self):
+        self._freeze()
+        return self._deltas, self._tfs, self._last
+
+    def __setstate__(self, state):
+        self._deltas, self._tfs, self._last = state
+        self._pending_docs = []
+        self._pending_tfs = []
+
+
+class InvertedIndex:
+    """单个索引的倒排结构与BM25打分
+
+    删除和重新索引只打删除标记，已删除的文档超过COMPACT_RATIO时按存活文档重建倒排列表。
+    """
+
+    COMPACT_RATIO = 0.3
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, PostingList] = {}
+        self.sources: List[Optional[Dict[str, Any]]] = []
+        self.ids: List[str] = []
+        self.id_to_num: Dict[str, int] = {}
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+
+    @property
+    def doc_count(self) -> int:
+        return int(self.alive.sum())
+
+    def add(self, id_: str, source: Dict[str, Any]):
+        self.add_many([(id_, source)])
+
+    def add_many(self, documents: List[Tuple[str, Dict[str, Any]]]):
+        # 先整体扩容，批内重复的_id也能正确标记删除
+        base = len(self.ids)
+        self.doc_len = np.concatenate([self.doc_len, np.zeros(len(documents), dtype=np.int32)])
+        self.alive = np.concatenate([self.alive, np.zeros(len(documents), dtype=bool)])
+
+        for offset, (id_, source) in enumerate(documents):
+            if id_ in self.id_to_num:
+                self.remove(self.id_to_num[id_])
+
+            doc_num = base + offset
+            tokens = tokenize(self._indexed_text(source))
+            for term, tf in Counter(tokens).items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = PostingList()
+                posting.add(doc_num, tf)
+
+            self.ids.append(id_)
+            self.sources.append(source)
+            self.id_to_num[id_] = doc_num
+            self.doc_len[doc_num] = len(tokens)
+            self.alive[doc_num] = True
+
+        self.maybe_compact()
+
+    def remove(self, doc_num: int):
+        self.alive[doc_num] = False
+        self.sources[doc_num] = None
+        self.id_to_num.pop(self.ids[doc_num], None)
+
+    def maybe_compact(self) -> bool:
+        if not self.ids or 1 - self.doc_count / len(self.ids) <= self.COMPACT_RATIO:
+            return False
+        self.compact()
+        return True
+
+    def compact(self):
+        """丢弃已删除文档，按存活文档重新编号并重建倒排列表"""
+        live = [(self.ids[num], self.sources[num]) for num in np.flatnonzero(self.alive)]
+        self.postings = {}
+        self.sources = []
+        self.ids = []
+        self.id_to_num = {}
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.add_many(live)
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, float]]:
+        terms = Counter(tokenize(query))
+        total = self.doc_count
+        if not terms or total == 0:
+            return []
+
+        avgdl = float(self.doc_len[self.alive].mean()) or 1.0
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+
+            docs, tfs = posting.arrays()
+            live = self.alive[docs]
+            docs, tfs = docs[live], tfs[live].astype(np.float32)
+            df = docs.size
+            if df == 0:
+                continue
+
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / avgdl)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        candidates = np.flatnonzero(scores > 0)
+        if filters:
+            candidates = np.asarray(
+                [c for c in candidates if self._matches(self.sources[c], filters)],
+                dtype=np.int64
+            )
+        if candidates.size == 0:
+            return []
+
+        k = min(top_k, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(doc_num), float(scores[doc_num])) for doc_num in top]
+
+    @staticmethod
+    def _indexed_text(source: Dict[str, Any]) -> str:
+        keywords = source.get("keywords") or []
+        return " ".join([source.get("title") or "", source.get("content") or "", *keywords])
+
+    @staticmethod
+    def _matches(source: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        # 与ElasticsearchClient.search一致：列表为terms过滤，标量为term过滤
+        for key, expected in filters.items():
+            actual: Any = source
+            for part in key.split("."):
+                actual = actual.get(part) if isinstance(actual, dict) else None
+
+            allowed = set(expected) if isinstance(expected, list) else {expected}
+            values = actual if isinstance(actual, list) else [actual]
+            if not allowed.intersection(values):
+                return False
+        return True
+
+
+class BM25KeywordStore:
+    """进程内关键词检索引擎，接口与ElasticsearchClient一致
+
+    不依赖Elasticsearch和IK分词插件，供本地开发、CI和单机小规模部署使用。
+    定期将索引快照写入磁盘，重启时直接加载；写入后没有新的写入时由后台定时器补写快照。
+    """
+
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        snapshot_interval: Optional[float] = None
+    ):
+        self.index = settings.ES_INDEX
+        self.data_dir = Path(data_dir or settings.KEYWORD_STORE_DIR)
+        self.snapshot_interval = (
+            settings.KEYWORD_SNAPSHOT_INTERVAL if snapshot_interval is None else snapshot_interval
+        )
+        self._indexes: Dict[str, InvertedIndex] = {}
+        self._dirty: set = set()
+        self._last_snapshot = time.time()
+        self._flush_timer: Optional[Timer] = None
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = RLock()
+        logger.info(f"BM25 keyword store initialized: {self.data_dir}")
+
+    @property
+    def client(self) -> "BM25KeywordStore":
+        # 兼容直接访问es_client.client的健康检查代码
+        return self
+
+    def info(self) -> Dict[str, Any]:
+        return {"version": {"number": "embedded-bm25"}}
+
+    def create_index(self, index_name: Optional[str] = None) -> bool:
+        self._get_index(index_name or self.index)
+        return True
+
+    def index_document(
+        self,
+        doc_id: str,
+        chunk_id: str,
+        content: str,
+        title: Optional[str] = None,
+        keywords: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        milvus_id: Optional[str] = None,
+        index_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        index = index_name or self.index
+        document = {
+            "doc_id": doc_id,
+            "chunk_id": chunk_id,
+            "content": content,
+            "title": title or "",
+            "keywords": keywords or [],
+            "metadata": metadata or {},
+            "milvus_id": milvus_id or ""
+        }
+
+        id_ = f"{doc_id}_{chunk_id}"
+        with self._lock:
+            self._get_index(index).add(id_, document)
+            self._mark_dirty(index)
+
+        return {"result": "created", "_id": id_, "_index": index}
+
+    def bulk_index(
+        self,
+        documents: List[Dict[str, Any]],
+        index_name: Optional[str] = None
+    ) -> int:
+        index = index_name or self.index
+        items = [
+            (f"{doc.get('doc_id', '')}_{doc.get('chunk_id', '')}", dict(doc))
+            for doc in documents
+        ]
+
+        with self._lock:
+            self._get_index(index).add_many(items)
+            self._mark_dirty(index)
+
+        logger.info(f"Bulk indexed {len(items)} documents, 0 failed")
+        return len(items)
+
+    def bulk_load(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        index_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        **kwargs: Any
+    ) -> BulkLoadReport:
+        chunk_size = chunk_size or settings.ES_BULK_CHUNK_SIZE
+        report = BulkLoadReport()
+        start_time = time.time()
+
+        batch: List[Dict[str, Any]] = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= chunk_size:
+                report.indexed += self.bulk_index(batch, index_name=index_name)
+                batch = []
+        if batch:
+            report.indexed += self.bulk_index(batch, index_name=index_name)
+        if self.snapshot_interval >= 0:
+            self.save_snapshot(index_name or self.index)
+
+        report.elapsed_seconds = round(time.time() - start_time, 3)
+        if report.elapsed_seconds > 0:
+            report.docs_per_second = round(report.indexed / report.elapsed_seconds, 1)
+        return report
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = False
+    ) -> List[Dict[str, Any]]:
+        index = index_name or self.index
+
+        with self._lock:
+            inverted = self._get_index(index)
+            hits = inverted.search(query, top_k, filters)
+            results = []
+            for doc_num, score in hits:
+                source = inverted.sources[doc_num]
+                result = _lean_source(source) if lean else dict(source)
+                result["_id"] = inverted.ids[doc_num]
+                result["_score"] = score
+                results.append(result)
+
+        logger.debug(f"Search returned {len(results)} results for query: {query[:50]}...")
+        return results
+
+    def msearch(
+        self,
+        queries: List[str],
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        return [
+            self.search(query, top_k=top_k, filters=filters, index_name=index_name, lean=lean)
+            for query in queries
+        ]
+
+    def delete_document(self, doc_id: str, index_name: Optional[str] = None) -> bool:
+        deleted = self._delete(index_name or self.index, {doc_id})
+        logger.info(f"Deleted {deleted} documents with doc_id: {doc_id}")
+        return deleted > 0
+
+    def delete_documents(
+        self,
+        doc_ids: List[str],
+        index_name: Optional[str] = None,
+        slices: Optional[str] = None
+    ) -> str:
+        """同步删除，返回已完成的本地任务ID以兼容ES任务查询接口"""
+        deleted = self._delete(index_name or self.index, set(doc_ids))
+        task_id = f"local:{len(self._tasks) + 1}"
+        self._tasks[task_id] = {
+            "task_id": task_id,
+            "completed": True,
+            "total": deleted,
+            "deleted": deleted,
+            "failures": 0,
+            "error": None
+        }
+        return task_id
+
+    def get_task(self, task_id: str) -> Dict[str, Any]:
+        if task_id not in self._tasks:
+            raise KeyError(f"Task {task_id} not found")
+        return self._tasks[task_id]
+
+    def get_document(self, doc_id: str, chunk_id: str, index_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        index = index_name or self.index
+        id_ = f"{doc_id}_{chunk_id}"
+
+        with self._lock:
+            inverted = self._get_index(index)
+            doc_num = inverted.id_to_num.get(id_)
+            if doc_num is None:
+                logger.warning(f"Document {id_} not found")
+                return None
+            result = dict(inverted.sources[doc_num])
+            result["_id"] = id_
+            return result
+
+    def count(self, index_name: Optional[str] = None) -> int:
+        with self._lock:
+            return self._get_index(index_name or self.index).doc_count
+
+    def health_check(self) -> Dict[str, Any]:
+        return {"status": "green", "cluster_name": "embedded-bm25"}
+
+    def save_snapshot(self, index_name: Optional[str] = None):
+        """把索引快照写入磁盘"""
+        with self._lock:
+            names = [index_name] if index_name else list(self._dirty)
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+
+            for name in names:
+                if name not in self._indexes:
+                    continue
+                path = self._snapshot_path(name)
+                tmp_path = path.with_suffix(".tmp")
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(self._indexes[name], f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+                self._dirty.discard(name)
+                logger.info(f"Saved BM25 snapshot {path}")
+
+            self._last_snapshot = time.time()
+            if not self._dirty and self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+    def close(self):
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        self.save_snapshot()
+
+    async def search_async(
+        self,
+        query: str,
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = False
+    ) -> List[Dict[str, Any]]:
+        return await io_executor.run(
+            self.search, query, top_k=top_k, filters=filters, index_name=index_name, lean=lean
+        )
+
+    async def msearch_async(
+        self,
+        queries: List[str],
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        return await io_executor.run(
+            self.msearch, queries, top_k=top_k, filters=filters, index_name=index_name, lean=lean
+        )
+
+    async def bulk_index_async(
+        self,
+        documents: List[Dict[str, Any]],
+        index_name: Optional[str] = None
+    ) -> int:
+        return await io_executor.run(self.bulk_index, documents, index_name=index_name)
+
+    async def bulk_load_async(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        index_name: Optional[str] = None,
+        **kwargs: Any
+    ) -> BulkLoadReport:
+        return await io_executor.run(self.bulk_load, documents, index_name=index_name, **kwargs)
+
+    async def delete_document_async(self, doc_id: str, index_name: Optional[str] = None) -> bool:
+        return await io_executor.run(self.delete_document, doc_id, index_name=index_name)
+
+    async def delete_documents_async(
+        self,
+        doc_ids: List[str],
+        index_name: Optional[str] = None,
+        slices: Optional[str] = None
+    ) -> str:
+        return await io_executor.run(self.delete_documents, doc_ids, index_name=index_name)
+
+    async def get_task_async(self, task_id: str) -> Dict[str, Any]:
+        return self.get_task(task_id)
+
+    def _delete(self, index: str, doc_ids: set) -> int:
+        with self._lock:
+            inverted = self._get_index(index)
+            doc_nums = [
+                num for num, source in enumerate(inverted.sources)
+                if source is not None and source.get("doc_id") in doc_ids
+            ]
+            for num in doc_nums:
+                inverted.remove(num)
+            if doc_nums:
+                inverted.maybe_compact()
+                self._mark_dirty(index)
+        return len(doc_nums)
+
+    def _get_index(self, name: str) -> InvertedIndex:
+        inverted = self._indexes.get(name)
+        if inverted is None:
+            inverted = self._load_snapshot(name) or InvertedIndex()
+            self._indexes[name] = inverted
+        return inverted
+
+    def _mark_dirty(self, name: str):
+        self._dirty.add(name)
+        if self.snapshot_interval < 0:
+            return
+        remaining = self.snapshot_interval - (time.time() - self._last_snapshot)
+        if remaining <= 0:
+            self.save_snapshot()
+        elif self._flush_timer is None:
+            # 之后没有写入也要在间隔到期时落盘，否则最后几次写入只留在内存里直到close
+            self._flush_timer = Timer(remaining, self._flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush(self):
+        with self._lock:
+            self._flush_timer = None
+            if not self._dirty:
+                return
+            try:
+                self.save_snapshot()
+            except Exception as e:
+                logger.warning(f"Failed to save BM25 snapshot: {e}")
+
+    def _snapshot_path(self, name: str) -> Path:
+        return self.data_dir / f"{name}.bm25.pkl"
+
+    def _load_snapshot(self, name: str) -> Optional[InvertedIndex]:
+        path = self._snapshot_path(name)
+        if not path.exists():
+            return None
+
+        with open(path, "rb") as f:
+            inverted = pickle.load(f)
+        logger.info(f"Loaded BM25 snapshot {path}: {inverted.doc_count} documents")
+        return inverted
+
+
+def _lean_source(source: Dict[str, Any]) -> Dict[str, Any]:
+    # 与ElasticsearchClient.LEAN_SOURCE_FIELDS保持一致
+    metadata = source.get("metadata") or {}
+    return {
+        "doc_id": source.get("doc_id"),
+        "chunk_id": source.get("chunk_id"),
+        "content": source.get("content"),
+        "title": source.get("title"),
+        "metadata": {f: metadata[f] for f in METADATA_FIELDS + OFFSET_FIELDS if f in metadata}
+    }
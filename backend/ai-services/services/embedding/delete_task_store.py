@@ -0,0 +1,46 @@
+import copy
+import logging
+from typing import Dict, Any, Optional
+
+from config.settings import settings
+from services.cache.memory_cache import MemoryCache
+from services.cache.redis_cache import RedisCache, redis_cache
+
+logger = logging.getLogger(__name__)
+
+
+class DeleteTaskStore:
+    """批量删除任务状态：进程内LRU + Redis两级，带TTL
+
+    多worker部署时任务可能在一个进程执行、在另一个进程查询，状态写入Redis后任意worker都能读到。
+    记录只保存状态和计数，不保存doc_ids列表。
+    """
+
+    KEY_PREFIX = "delete_task:"
+
+    def __init__(
+        self,
+        memory: Optional[MemoryCache] = None,
+        redis: Optional[RedisCache] = None,
+        ttl: Optional[int] = None
+    ):
+        self.ttl = ttl or settings.DELETE_TASK_TTL
+        self.memory = memory or MemoryCache(max_size=settings.DELETE_TASK_CACHE_SIZE, default_ttl=self.ttl)
+        self.redis = redis or redis_cache
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        key = f"{self.KEY_PREFIX}{task_id}"
+        task = self.memory.get(key)
+        if task is None and self.redis.is_connected:
+            task = await self.redis.get(key)
+        return copy.deepcopy(task) if task is not None else None
+
+    async def save(self, task: Dict[str, Any]):
+        key = f"{self.KEY_PREFIX}{task['task_id']}"
+        data = copy.deepcopy(task)
+        self.memory.set(key, data, ttl=self.ttl)
+        if self.redis.is_connected:
+            await self.redis.set(key, data, ttl=self.ttl)
+
+
+delete_task_store = DeleteTaskStore()
@@ -1,13 +1,39 @@
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
-from typing import List, Dict, Optional, Any
+from elasticsearch.helpers import bulk, streaming_bulk
+from typing import List, Dict, Optional, Any, Iterable, Iterator
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 import logging
+import time
 from config.settings import settings
+from services.embedding.vector_filters import METADATA_FIELDS, OFFSET_FIELDS
+from utils.concurrency import io_executor
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class BulkLoadReport:
+    indexed: int = 0
+    failed: int = 0
+    elapsed_seconds: float = 0.0
+    docs_per_second: float = 0.0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
 class ElasticsearchClient:
+    BULK_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+    MAX_REPORTED_ERRORS = 20
+    # 精简检索只返回融合与上下文构建需要的字段，metadata与向量检索结果保持一致
+    LEAN_SOURCE_FIELDS = [
+        "doc_id", "chunk_id", "content", "title",
+        *(f"metadata.{f}" for f in METADATA_FIELDS + OFFSET_FIELDS)
+    ]
+
     def __init__(self):
         hosts = [f"{settings.ES_SCHEME}://{settings.ES_HOST}:{settings.ES_PORT}"]
         
@@ -133,15 +159,194 @@ class ElasticsearchClient:
         logger.info(f"Bulk indexed {success} documents, {len(failed)} failed")
         return success
 
+    def bulk_load(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        index_name: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        max_chunk_bytes: int = 10 * 1024 * 1024,
+        thread_count: Optional[int] = None,
+        max_retries: int = 3,
+        initial_backoff: float = 2.0
+    ) -> BulkLoadReport:
+        """大批量导入：流式提交，导入期间关闭刷新与副本，结束后恢复"""
+        index = index_name or self.index
+        chunk_size = chunk_size or settings.ES_BULK_CHUNK_SIZE
+        thread_count = thread_count or settings.ES_BULK_THREAD_COUNT
+        report = BulkLoadReport()
+
+        original_settings = self._get_load_settings(index)
+        self.client.indices.put_settings(index=index, settings={"index": self.BULK_LOAD_SETTINGS})
+        logger.info(f"Bulk load started on {index}: chunk_size={chunk_size}, threads={thread_count}")
+
+        start_time = time.time()
+        try:
+            actions = self._iter_actions(documents, index)
+
+            if thread_count > 1:
+                self._parallel_stream(
+                    actions, report, thread_count, chunk_size, max_chunk_bytes, max_retries, initial_backoff
+                )
+            else:
+                self._merge_report(report, self._stream_actions(
+                    actions, chunk_size, max_chunk_bytes, max_retries, initial_backoff
+                ))
+        finally:
+            self.client.indices.put_settings(index=index, settings={"index": original_settings})
+            self.client.indices.refresh(index=index)
+
+        report.elapsed_seconds = round(time.time() - start_time, 3)
+        if report.elapsed_seconds > 0:
+            report.docs_per_second = round(report.indexed / report.elapsed_seconds, 1)
+
+        logger.info(
+            f"Bulk load finished on {index}: {report.indexed} indexed, {report.failed} failed, "
+            f"{report.docs_per_second} docs/sec"
+        )
+        return report
+
+    def _parallel_stream(
+        self,
+        actions: Iterator[Dict[str, Any]],
+        report: BulkLoadReport,
+        thread_count: int,
+        chunk_size: int,
+        max_chunk_bytes: int,
+        max_retries: int,
+        initial_backoff: float
+    ):
+        # 每个线程对一个批次执行streaming_bulk，在途批次数有上限，内存占用不随文档总量增长
+        pending = set()
+        with ThreadPoolExecutor(max_workers=thread_count, thread_name_prefix="es-bulk") as pool:
+            while True:
+                batch = list(islice(actions, chunk_size))
+                if not batch:
+                    break
+
+                if len(pending) >= thread_count * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._merge_report(report, future.result())
+
+                pending.add(pool.submit(
+                    self._stream_actions, batch, chunk_size, max_chunk_bytes, max_retries, initial_backoff
+                ))
+
+            for future in wait(pending).done:
+                self._merge_report(report, future.result())
+
+    def _stream_actions(
+        self,
+        actions: Iterable[Dict[str, Any]],
+        chunk_size: int,
+        max_chunk_bytes: int,
+        max_retries: int,
+        initial_backoff: float
+    ) -> BulkLoadReport:
+        # streaming_bulk只对429拒绝的条目做退避重试
+        report = BulkLoadReport()
+        for ok, item in streaming_bulk(
+            self.client,
+            actions,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            max_retries=max_retries,
+            initial_backoff=initial_backoff,
+            raise_on_error=False,
+            raise_on_exception=False,
+            yield_ok=True
+        ):
+            if ok:
+                report.indexed += 1
+            else:
+                report.failed += 1
+                if len(report.errors) < self.MAX_REPORTED_ERRORS:
+                    report.errors.append(item)
+        return report
+
+    def _merge_report(self, report: BulkLoadReport, partial: BulkLoadReport):
+        report.indexed += partial.indexed
+        report.failed += partial.failed
+        room = self.MAX_REPORTED_ERRORS - len(report.errors)
+        if room > 0:
+            report.errors.extend(partial.errors[:room])
+
+    def _iter_actions(self, documents: Iterable[Dict[str, Any]], index: str) -> Iterator[Dict[str, Any]]:
+        for doc in documents:
+            yield {
+                "_index": index,
+                "_id": f"{doc.get('doc_id', '')}_{doc.get('chunk_id', '')}",
+                "_source": doc
+            }
+
+    def _get_load_settings(self, index: str) -> Dict[str, Any]:
+        response = self.client.indices.get_settings(
+            index=index,
+            name=["index.refresh_interval", "index.number_of_replicas"],
+            flat_settings=True
+        )
+        current = response.get(index, {}).get("settings", {})
+        # 未显式设置的refresh_interval恢复为None，即重置为集群默认值
+        return {
+            "refresh_interval": current.get("index.refresh_interval"),
+            "number_of_replicas": current.get("index.number_of_replicas", 1)
+        }
+
     def search(
         self,
         query: str,
         top_k: int = 100,
         filters: Optional[Dict[str, Any]] = None,
-        index_name: Optional[str] = None
+        index_name: Optional[str] = None,
+        lean: bool = False
     ) -> List[Dict[str, Any]]:
         index = index_name or self.index
+        search_body = self._build_search_body(query, top_k, filters, lean)
+        
+        response = self.client.search(index=index, body=search_body)
+        results = self._to_results(response)
+        
+        logger.debug(f"Search returned {len(results)} results for query: {query[:50]}...")
+        return results
+
+    def msearch(
+        self,
+        queries: List[str],
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        """一次请求执行多条查询，单条失败时该查询返回空列表"""
+        if not queries:
+            return []
+        
+        index = index_name or self.index
+        searches: List[Dict[str, Any]] = []
+        for query in queries:
+            searches.append({"index": index})
+            searches.append(self._build_search_body(query, top_k, filters, lean))
+        
+        response = self.client.msearch(body=searches)
+        
+        results = []
+        for query, item in zip(queries, response["responses"]):
+            if "error" in item:
+                logger.warning(f"msearch failed for query '{query[:50]}': {item['error']}")
+                results.append([])
+            else:
+                results.append(self._to_results(item))
         
+        logger.debug(f"msearch returned results for {len(queries)} queries")
+        return results
+
+    def _build_search_body(
+        self,
+        query: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]],
+        lean: bool
+    ) -> Dict[str, Any]:
         search_body = {
             "query": {
                 "bool": {
@@ -166,18 +371,23 @@ class ElasticsearchClient:
                 else:
                     filter_clauses.append({"term": {key: value}})
             
+            # filter上下文不参与打分，结果可被节点的query cache复用
             search_body["query"]["bool"]["filter"] = filter_clauses
         
-        response = self.client.search(index=index, body=search_body)
+        if lean:
+            search_body["_source"] = {"includes": self.LEAN_SOURCE_FIELDS}
+            search_body["track_total_hits"] = False
         
+        return search_body
+
+    @staticmethod
+    def _to_results(response: Dict[str, Any]) -> List[Dict[str, Any]]:
         results = []
         for hit in response["hits"]["hits"]:
             result = hit["_source"]
             result["_id"] = hit["_id"]
             result["_score"] = hit["_score"]
             results.append(result)
-        
-        logger.debug(f"Search returned {len(results)} results for query: {query[:50]}...")
         return results
 
     def delete_document(self, doc_id: str, index_name: Optional[str] = None) -> bool:
@@ -195,6 +405,42 @@ class ElasticsearchClient:
         logger.info(f"Deleted {deleted} documents with doc_id: {doc_id}")
         return deleted > 0
 
+    def delete_documents(
+        self,
+        doc_ids: List[str],
+        index_name: Optional[str] = None,
+        slices: Optional[str] = None
+    ) -> str:
+        """提交分片的异步delete_by_query任务，返回ES任务ID"""
+        index = index_name or self.index
+        
+        response = self.client.delete_by_query(
+            index=index,
+            body={"query": {"terms": {"doc_id": doc_ids}}},
+            slices=slices or settings.ES_DELETE_SLICES,
+            conflicts="proceed",
+            wait_for_completion=False
+        )
+        task_id = response["task"]
+        
+        logger.info(f"Submitted delete task {task_id} for {len(doc_ids)} documents")
+        return task_id
+
+    def get_task(self, task_id: str) -> Dict[str, Any]:
+        """查询ES后台任务进度"""
+        response = self.client.tasks.get(task_id=task_id)
+        status = response.get("task", {}).get("status", {})
+        result = response.get("response") or {}
+        
+        return {
+            "task_id": task_id,
+            "completed": response.get("completed", False),
+            "total": status.get("total", 0),
+            "deleted": status.get("deleted", 0),
+            "failures": len(result.get("failures", [])),
+            "error": response.get("error")
+        }
+
     def get_document(self, doc_id: str, chunk_id: str, index_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
         index = index_name or self.index
         id_ = f"{doc_id}_{chunk_id}"
@@ -216,5 +462,71 @@ class ElasticsearchClient:
     def health_check(self) -> Dict[str, Any]:
         return self.client.cluster.health()
 
+    async def search_async(
+        self,
+        query: str,
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = False
+    ) -> List[Dict[str, Any]]:
+        return await io_executor.run(
+            self.search, query, top_k=top_k, filters=filters, index_name=index_name, lean=lean
+        )
+
+    async def msearch_async(
+        self,
+        queries: List[str],
+        top_k: int = 100,
+        filters: Optional[Dict[str, Any]] = None,
+        index_name: Optional[str] = None,
+        lean: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        return await io_executor.run(
+            self.msearch, queries, top_k=top_k, filters=filters, index_name=index_name, lean=lean
+        )
+
+    async def bulk_index_async(
+        self,
+        documents: List[Dict[str, Any]],
+        index_name: Optional[str] = None
+    ) -> int:
+        return await io_executor.run(self.bulk_index, documents, index_name=index_name)
+
+    async def bulk_load_async(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        index_name: Optional[str] = None,
+        **kwargs: Any
+    ) -> BulkLoadReport:
+        return await io_executor.run(self.bulk_load, documents, index_name=index_name, **kwargs)
+
+    async def delete_document_async(self, doc_id: str, index_name: Optional[str] = None) -> bool:
+        return await io_executor.run(self.delete_document, doc_id, index_name=index_name)
+
+    async def delete_documents_async(
+        self,
+        doc_ids: List[str],
+        index_name: Optional[str] = None,
+        slices: Optional[str] = None
+    ) -> str:
+        return await io_executor.run(
+            self.delete_documents, doc_ids, index_name=index_name, slices=slices
+        )
+
+    async def get_task_async(self, task_id: str) -> Dict[str, Any]:
+        return await io_executor.run(self.get_task, task_id)
+
+    def close(self):
+        self.client.close()
+
+
+def create_keyword_store():
+    """按KEYWORD_STORE_BACKEND选择Elasticsearch或进程内BM25引擎"""
+    if settings.KEYWORD_STORE_BACKEND == "bm25":
+        from services.embedding.bm25_store import BM25KeywordStore
+        return BM25KeywordStore()
+    return ElasticsearchClient()
+
 
-es_client = ElasticsearchClient()
+es_client = create_keyword_store()
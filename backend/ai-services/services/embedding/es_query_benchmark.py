@@ -0,0 +1,121 @@
+import argparse
+import json
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryShapeResult:
+    mode: str
+    query_count: int
+    avg_payload_bytes: float
+    p50_latency_ms: float
+    p95_latency_ms: float
+    total_ms: float
+
+
+@dataclass
+class QueryShapeReport:
+    top_k: int
+    results: List[QueryShapeResult] = field(default_factory=list)
+    payload_reduction: float = 0.0
+    msearch_speedup: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _payload_size(response: Any) -> int:
+    body = getattr(response, "body", response)
+    return len(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+
+def _summarize(mode: str, latencies: List[float], sizes: List[int], total_ms: float) -> QueryShapeResult:
+    return QueryShapeResult(
+        mode=mode,
+        query_count=len(sizes),
+        avg_payload_bytes=round(float(np.mean(sizes)), 1) if sizes else 0.0,
+        p50_latency_ms=round(float(np.percentile(latencies, 50)), 3) if latencies else 0.0,
+        p95_latency_ms=round(float(np.percentile(latencies, 95)), 3) if latencies else 0.0,
+        total_ms=round(total_ms, 3)
+    )
+
+
+def compare_query_shapes(es_client, queries: List[str], top_k: int = 100) -> QueryShapeReport:
+    """对比完整检索、精简检索与msearch的响应体积和延迟"""
+    report = QueryShapeReport(top_k=top_k)
+
+    for mode, lean in (("full", False), ("lean", True)):
+        latencies, sizes = [], []
+        start_all = time.perf_counter()
+        for query in queries:
+            body = es_client._build_search_body(query, top_k, None, lean)
+            start = time.perf_counter()
+            response = es_client.client.search(index=es_client.index, body=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(_payload_size(response))
+        report.results.append(
+            _summarize(mode, latencies, sizes, (time.perf_counter() - start_all) * 1000)
+        )
+
+    searches: List[Dict[str, Any]] = []
+    for query in queries:
+        searches.append({"index": es_client.index})
+        searches.append(es_client._build_search_body(query, top_k, None, True))
+
+    start = time.perf_counter()
+    response = es_client.client.msearch(body=searches)
+    msearch_ms = (time.perf_counter() - start) * 1000
+    per_query = _payload_size(response) / max(len(queries), 1)
+    report.results.append(QueryShapeResult(
+        mode="msearch",
+        query_count=len(queries),
+        avg_payload_bytes=round(per_query, 1),
+        p50_latency_ms=0.0,
+        p95_latency_ms=0.0,
+        total_ms=round(msearch_ms, 3)
+    ))
+
+    full, lean = report.results[0], report.results[1]
+    if full.avg_payload_bytes:
+        report.payload_reduction = round(1 - lean.avg_payload_bytes / full.avg_payload_bytes, 4)
+    if msearch_ms:
+        report.msearch_speedup = round(lean.total_ms / msearch_ms, 2)
+
+    logger.info(
+        f"Query shape benchmark: payload -{report.payload_reduction:.1%}, "
+        f"msearch {report.msearch_speedup}x faster than sequential lean search"
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Elasticsearch检索响应体积与延迟对比")
+    parser.add_argument("queries", nargs="*", help="查询文本，未提供时从--file读取")
+    parser.add_argument("--file", default=None, help="每行一条查询的文本文件")
+    parser.add_argument("--top-k", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    queries = list(args.queries)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            queries.extend(line.strip() for line in f if line.strip())
+    if not queries:
+        parser.error("at least one query is required")
+
+    from services.embedding.es_client import ElasticsearchClient
+
+    report = compare_query_shapes(ElasticsearchClient(), queries, top_k=args.top_k)
+
+    print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    return report.to_dict()
+
+
+if __name__ == "__main__":
+    main()
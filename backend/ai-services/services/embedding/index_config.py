@@ -0,0 +1,82 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Any
+from enum import Enum
+import math
+
+from config.settings import settings
+
+
+class VectorIndexType(str, Enum):
+    HNSW = "HNSW"
+    IVF_FLAT = "IVF_FLAT"
+    IVF_SQ8 = "IVF_SQ8"
+    IVF_PQ = "IVF_PQ"
+
+
+class VectorIndexConfig(BaseModel):
+    index_type: VectorIndexType = VectorIndexType.IVF_FLAT
+    metric_type: str = "COSINE"
+    nlist: int = Field(default=1024, ge=1, le=65536)
+    nprobe: int = Field(default=10, ge=1, le=65536)
+    hnsw_m: int = Field(default=16, ge=2, le=2048)
+    ef_construction: int = Field(default=200, ge=1)
+    ef: int = Field(default=64, ge=1)
+    pq_m: int = Field(default=16, ge=1)
+    pq_nbits: int = Field(default=8, ge=1, le=16)
+
+    @classmethod
+    def from_settings(cls) -> "VectorIndexConfig":
+        return cls(
+            index_type=VectorIndexType(settings.MILVUS_INDEX_TYPE),
+            nlist=settings.MILVUS_INDEX_NLIST,
+            nprobe=settings.MILVUS_SEARCH_NPROBE,
+            hnsw_m=settings.MILVUS_HNSW_M,
+            ef_construction=settings.MILVUS_HNSW_EF_CONSTRUCTION,
+            ef=settings.MILVUS_SEARCH_EF,
+            pq_m=settings.MILVUS_PQ_M,
+            pq_nbits=settings.MILVUS_PQ_NBITS
+        )
+
+    @property
+    def is_ivf(self) -> bool:
+        return self.index_type != VectorIndexType.HNSW
+
+    def index_params(self) -> Dict[str, Any]:
+        """建索引参数"""
+        if self.index_type == VectorIndexType.HNSW:
+            params = {"M": self.hnsw_m, "efConstruction": self.ef_construction}
+        elif self.index_type == VectorIndexType.IVF_PQ:
+            params = {"nlist": self.nlist, "m": self.pq_m, "nbits": self.pq_nbits}
+        else:
+            params = {"nlist": self.nlist}
+
+        return {
+            "metric_type": self.metric_type,
+            "index_type": self.index_type.value,
+            "params": params
+        }
+
+    def search_params(self, top_k: int = 10) -> Dict[str, Any]:
+        """检索参数，HNSW的ef不能小于top_k"""
+        if self.index_type == VectorIndexType.HNSW:
+            params = {"ef": max(self.ef, top_k)}
+        else:
+            params = {"nprobe": min(self.nprobe, self.nlist)}
+
+        return {"metric_type": self.metric_type, "params": params}
+
+    def with_search_params(self, params: Dict[str, Any]) -> "VectorIndexConfig":
+        """返回替换了nprobe/ef的新配置"""
+        update = {}
+        if "nprobe" in params:
+            update["nprobe"] = params["nprobe"]
+        if "ef" in params:
+            update["ef"] = params["ef"]
+        return self.model_copy(update=update)
+
+    @staticmethod
+    def recommended_nlist(num_entities: int) -> int:
+        """按集合规模估算nlist，经验值为4*sqrt(N)"""
+        if num_entities <= 0:
+            return 1
+        return max(1, min(65536, int(4 * math.sqrt(num_entities))))
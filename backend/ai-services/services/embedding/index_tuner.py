@@ -0,0 +1,195 @@
+import argparse
+import json
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from services.embedding.index_config import VectorIndexConfig, VectorIndexType
+
+logger = logging.getLogger(__name__)
+
+
+NPROBE_CANDIDATES = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+EF_CANDIDATES = [16, 32, 64, 128, 256, 512]
+
+
+@dataclass
+class TuningResult:
+    search_params: Dict[str, Any]
+    recall: float
+    p50_latency_ms: float
+    p95_latency_ms: float
+
+
+@dataclass
+class TuningReport:
+    index_type: str
+    top_k: int
+    target_recall: float
+    query_count: int
+    results: List[TuningResult] = field(default_factory=list)
+    recommended: Optional[TuningResult] = None
+    target_met: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class IndexTuner:
+    """离线扫描nprobe/ef，以暴力检索结果为基准评估召回率与p95延迟"""
+
+    def __init__(self, milvus_client, top_k: int = 10):
+        self.milvus_client = milvus_client
+        self.top_k = top_k
+
+    @staticmethod
+    def exact_top_k(
+        base_vectors: np.ndarray,
+        base_ids: Sequence[str],
+        query_vectors: np.ndarray,
+        top_k: int
+    ) -> List[List[str]]:
+        """暴力计算余弦相似度的精确top-k"""
+        base = _normalize(np.asarray(base_vectors, dtype=np.float32))
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        k = min(top_k, len(base_ids))
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ base.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(queries))[:, None]
+        order = np.argsort(-scores[rows, top], axis=1)
+        top = top[rows, order]
+
+        return [[base_ids[i] for i in row] for row in top]
+
+    @staticmethod
+    def candidate_params(index_config: VectorIndexConfig, top_k: int) -> List[Dict[str, Any]]:
+        if index_config.index_type == VectorIndexType.HNSW:
+            values = sorted({max(ef, top_k) for ef in EF_CANDIDATES})
+            return [{"ef": ef} for ef in values]
+
+        values = [n for n in NPROBE_CANDIDATES if n < index_config.nlist] + [index_config.nlist]
+        return [{"nprobe": n} for n in sorted(set(values))]
+
+    def sweep(
+        self,
+        query_vectors: Sequence[Sequence[float]],
+        ground_truth: List[List[str]],
+        param_grid: List[Dict[str, Any]]
+    ) -> List[TuningResult]:
+        results = []
+        metric_type = self.milvus_client.index_config.metric_type
+
+        for params in param_grid:
+            search_params = {"metric_type": metric_type, "params": params}
+            latencies = []
+            recalls = []
+
+            for query_vector, truth in zip(query_vectors, ground_truth):
+                start = time.perf_counter()
+                hits = self.milvus_client.search(
+                    query_vector=list(query_vector),
+                    top_k=self.top_k,
+                    search_params=search_params
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+
+                if truth:
+                    retrieved = {str(hit["id"]) for hit in hits}
+                    recalls.append(len(retrieved & set(truth)) / len(truth))
+
+            result = TuningResult(
+                search_params=params,
+                recall=round(float(np.mean(recalls)) if recalls else 0.0, 4),
+                p50_latency_ms=round(float(np.percentile(latencies, 50)), 3),
+                p95_latency_ms=round(float(np.percentile(latencies, 95)), 3)
+            )
+            logger.info(
+                f"Sweep {params}: recall@{self.top_k}={result.recall}, "
+                f"p95={result.p95_latency_ms}ms"
+            )
+            results.append(result)
+
+        return results
+
+    @staticmethod
+    def recommend(results: List[TuningResult], target_recall: float) -> tuple[Optional[TuningResult], bool]:
+        """满足目标召回率的配置中选p95最低者；都不满足时返回召回率最高者"""
+        if not results:
+            return None, False
+
+        qualified = [r for r in results if r.recall >= target_recall]
+        if qualified:
+            return min(qualified, key=lambda r: (r.p95_latency_ms, -r.recall)), True
+
+        return max(results, key=lambda r: (r.recall, -r.p95_latency_ms)), False
+
+    def tune(
+        self,
+        base_vectors: np.ndarray,
+        base_ids: Sequence[str],
+        query_vectors: np.ndarray,
+        target_recall: float = 0.95,
+        param_grid: Optional[List[Dict[str, Any]]] = None
+    ) -> TuningReport:
+        index_config = self.milvus_client.index_config
+        ground_truth = self.exact_top_k(base_vectors, base_ids, query_vectors, self.top_k)
+        param_grid = param_grid or self.candidate_params(index_config, self.top_k)
+
+        results = self.sweep(query_vectors, ground_truth, param_grid)
+        recommended, target_met = self.recommend(results, target_recall)
+
+        return TuningReport(
+            index_type=index_config.index_type.value,
+            top_k=self.top_k,
+            target_recall=target_recall,
+            query_count=len(query_vectors),
+            results=results,
+            recommended=recommended,
+            target_met=target_met
+        )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Milvus索引检索参数离线调优")
+    parser.add_argument("--collection", default=None, help="集合名称，默认使用配置")
+    parser.add_argument("--sample", type=int, default=10000, help="读取的基准向量数量，应不小于集合规模，否则召回率会被低估")
+    parser.add_argument("--queries", type=int, default=100, help="抽样查询数量")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from services.embedding.milvus_client import MilvusClient
+
+    client = MilvusClient(collection_name=args.collection)
+    client.connect()
+
+    data = client.fetch_vectors(limit=args.sample)
+    base_ids = [str(i) for i in data["ids"]]
+    base_vectors = np.asarray(data["embeddings"], dtype=np.float32)
+
+    rng = np.random.default_rng(args.seed)
+    query_count = min(args.queries, len(base_ids))
+    query_vectors = base_vectors[rng.choice(len(base_ids), size=query_count, replace=False)]
+
+    tuner = IndexTuner(client, top_k=args.top_k)
+    report = tuner.tune(base_vectors, base_ids, query_vectors, target_recall=args.target_recall)
+
+    print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    return report.to_dict()
+
+
+if __name__ == "__main__":
+    main()
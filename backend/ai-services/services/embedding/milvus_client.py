@@ -3,18 +3,29 @@ from pymilvus import (
     DataType, utility
 )
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
 
 from config.settings import settings
+from services.embedding.index_config import VectorIndexConfig
+from services.embedding.vector_filters import (
+    METADATA_FIELDS, normalize_filters, build_milvus_expr, matches_nothing, metadata_value
+)
+from utils.concurrency import io_executor
 
 logger = logging.getLogger(__name__)
 
 
 class MilvusClient:
-    def __init__(self):
-        self.collection_name = settings.MILVUS_COLLECTION
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        index_config: Optional[VectorIndexConfig] = None
+    ):
+        self.collection_name = collection_name or settings.MILVUS_COLLECTION
         self.dimension = settings.EMBEDDING_DIMENSION
+        self.index_config = index_config or VectorIndexConfig.from_settings()
+        self.partition_key = settings.MILVUS_PARTITION_KEY or None
         self._collection: Optional[Collection] = None
 
     def connect(self):
@@ -36,19 +47,48 @@ class MilvusClient:
             FieldSchema(name="doc_id", dtype=DataType.VARCHAR, max_length=64),
             FieldSchema(name="chunk_id", dtype=DataType.VARCHAR, max_length=64),
             FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimension)
         ]
+        for field in METADATA_FIELDS:
+            fields.append(FieldSchema(
+                name=field,
+                dtype=DataType.VARCHAR,
+                max_length=128,
+                is_partition_key=(field == self.partition_key)
+            ))
+        fields.append(
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.dimension)
+        )
 
         schema = CollectionSchema(fields=fields, description="Document vectors")
-        collection = Collection(name=self.collection_name, schema=schema)
+        if self.partition_key:
+            collection = Collection(
+                name=self.collection_name,
+                schema=schema,
+                num_partitions=settings.MILVUS_NUM_PARTITIONS
+            )
+        else:
+            collection = Collection(name=self.collection_name, schema=schema)
 
-        index_params = {
-            "metric_type": "COSINE",
-            "index_type": "IVF_FLAT",
-            "params": {"nlist": 1024}
-        }
-        collection.create_index(field_name="embedding", index_params=index_params)
-        logger.info(f"Created collection {self.collection_name} with index")
+        collection.create_index(field_name="embedding", index_params=self.index_config.index_params())
+        for field in ("doc_id",) + METADATA_FIELDS:
+            collection.create_index(field_name=field, index_params={"index_type": "INVERTED"})
+        logger.info(
+            f"Created collection {self.collection_name} with "
+            f"{self.index_config.index_type.value} index"
+        )
+
+    def rebuild_index(self, index_config: VectorIndexConfig):
+        """按新配置重建向量索引"""
+        collection = self.get_collection()
+        collection.release()
+        for index in collection.indexes:
+            if index.field_name == "embedding":
+                index.drop()
+        collection.create_index(field_name="embedding", index_params=index_config.index_params())
+        self.index_config = index_config
+        logger.info(
+            f"Rebuilt index of {self.collection_name}: {index_config.index_params()}"
+        )
 
     def get_collection(self) -> Collection:
         if self._collection is None:
@@ -65,8 +105,10 @@ class MilvusClient:
             [v["doc_id"] for v in vectors],
             [v["chunk_id"] for v in vectors],
             [v["content"] for v in vectors],
-            [v["embedding"] for v in vectors]
         ]
+        for field in METADATA_FIELDS:
+            data.append([metadata_value(v, field) for v in vectors])
+        data.append([v["embedding"] for v in vectors])
 
         collection.insert(data)
         collection.flush()
@@ -76,39 +118,105 @@ class MilvusClient:
         self,
         query_vector: List[float],
         top_k: int = 10,
-        doc_ids: Optional[List[str]] = None
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """搜索相似向量"""
+        return self.search_many(
+            [query_vector], top_k=top_k, doc_ids=doc_ids,
+            search_params=search_params, filters=filters
+        )[0]
+
+    def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """在一次Milvus调用中批量搜索多个查询向量，按查询顺序返回各自的命中列表"""
+        if not query_vectors:
+            return []
+
+        conditions = normalize_filters(filters, doc_ids)
+        if matches_nothing(conditions):
+            return [[] for _ in query_vectors]
+
         collection = self.get_collection()
         collection.load()
 
-        search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
+        search_params = search_params or self.index_config.search_params(top_k)
 
-        expr = None
-        if doc_ids:
-            expr = f'doc_id in {doc_ids}'
+        expr, expr_params = build_milvus_expr(conditions, partition_key=self.partition_key)
 
         results = collection.search(
-            data=[query_vector],
+            data=query_vectors,
             anns_field="embedding",
             param=search_params,
             limit=top_k,
             expr=expr,
-            output_fields=["doc_id", "chunk_id", "content"]
+            expr_params=expr_params or None,
+            output_fields=["doc_id", "chunk_id", "content", *METADATA_FIELDS]
         )
 
+        return [self._to_hits(query_hits) for query_hits in results]
+
+    def _to_hits(self, query_hits) -> List[Dict[str, Any]]:
         hits = []
-        for hit in results[0]:
+        for hit in query_hits:
             hits.append({
                 "id": hit.id,
                 "score": hit.score,
                 "doc_id": hit.entity.get("doc_id"),
                 "chunk_id": hit.entity.get("chunk_id"),
-                "content": hit.entity.get("content")
+                "content": hit.entity.get("content"),
+                "metadata": {field: hit.entity.get(field) for field in METADATA_FIELDS}
             })
 
         return hits
 
+    def fetch_vectors(self, limit: int = 10000) -> Dict[str, List[Any]]:
+        """读取集合中的向量，用于离线调参的精确基准"""
+        collection = self.get_collection()
+        collection.load()
+
+        rows = collection.query(
+            expr='id != ""',
+            output_fields=["id", "embedding"],
+            limit=limit
+        )
+
+        return {
+            "ids": [row["id"] for row in rows],
+            "embeddings": [row["embedding"] for row in rows]
+        }
+
+    def fetch_embeddings(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[float]]:
+        """按(doc_id, chunk_id)取回已存储的向量，用于检索后的多样性重排"""
+        if not keys:
+            return {}
+
+        collection = self.get_collection()
+        collection.load()
+
+        wanted = set(keys)
+        rows = collection.query(
+            expr="doc_id in {doc_ids} and chunk_id in {chunk_ids}",
+            expr_params={
+                "doc_ids": list({doc_id for doc_id, _ in wanted}),
+                "chunk_ids": list({chunk_id for _, chunk_id in wanted})
+            },
+            output_fields=["doc_id", "chunk_id", "embedding"]
+        )
+
+        return {
+            (row["doc_id"], row["chunk_id"]): row["embedding"]
+            for row in rows
+            if (row["doc_id"], row["chunk_id"]) in wanted
+        }
+
     def delete_by_doc_id(self, doc_id: str):
         """删除文档的所有向量"""
         collection = self.get_collection()
@@ -116,5 +224,75 @@ class MilvusClient:
         collection.delete(expr)
         collection.flush()
 
+    def delete_by_doc_ids(self, doc_ids: List[str], batch_size: Optional[int] = None) -> int:
+        """按批合并删除表达式，所有批次完成后统一flush一次"""
+        if not doc_ids:
+            return 0
+
+        collection = self.get_collection()
+        batch_size = batch_size or settings.DELETE_BATCH_SIZE
+        deleted = 0
+
+        for start in range(0, len(doc_ids), batch_size):
+            batch = doc_ids[start:start + batch_size]
+            result = collection.delete("doc_id in {doc_ids}", expr_params={"doc_ids": batch})
+            deleted += getattr(result, "delete_count", 0)
+
+        collection.flush()
+        logger.info(f"Deleted {deleted} vectors for {len(doc_ids)} documents")
+        return deleted
+
+    async def insert_async(self, vectors: List[Dict[str, Any]]) -> List[str]:
+        """在IO线程池中插入向量"""
+        return await io_executor.run(self.insert, vectors)
+
+    async def search_async(
+        self,
+        query_vector: List[float],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """在IO线程池中搜索相似向量"""
+        return await io_executor.run(
+            self.search, query_vector, top_k=top_k, doc_ids=doc_ids,
+            search_params=search_params, filters=filters
+        )
+
+    async def search_many_async(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """在IO线程池中批量搜索多个查询向量"""
+        return await io_executor.run(
+            self.search_many, query_vectors, top_k=top_k, doc_ids=doc_ids,
+            search_params=search_params, filters=filters
+        )
+
+    async def fetch_embeddings_async(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[float]]:
+        """在IO线程池中取回已存储的向量"""
+        return await io_executor.run(self.fetch_embeddings, keys)
+
+    async def delete_by_doc_id_async(self, doc_id: str):
+        """在IO线程池中删除文档的所有向量"""
+        return await io_executor.run(self.delete_by_doc_id, doc_id)
+
+    async def delete_by_doc_ids_async(self, doc_ids: List[str], batch_size: Optional[int] = None) -> int:
+        """在IO线程池中批量删除文档向量"""
+        return await io_executor.run(self.delete_by_doc_ids, doc_ids, batch_size=batch_size)
+
+
+def create_vector_store():
+    """按VECTOR_STORE_BACKEND选择Milvus或进程内NumPy向量库"""
+    if settings.VECTOR_STORE_BACKEND == "numpy":
+        from services.embedding.numpy_store import NumpyVectorStore
+        return NumpyVectorStore()
+    return MilvusClient()
+
 
-milvus_client = MilvusClient()
+milvus_client = create_vector_store()
@@ -0,0 +1,425 @@
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from threading import RLock
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from services.embedding.vector_filters import METADATA_FIELDS, normalize_filters, metadata_value
+from utils.concurrency import io_executor
+
+logger = logging.getLogger(__name__)
+
+
+class NumpyVectorStore:
+    """进程内向量库，接口与MilvusClient一致
+
+    向量以归一化float32保存在内存映射的.npy文件中，doc_id/chunk_id等字段保存在
+    旁路表中，重启后直接加载，无需重新向量化。适用于小规模部署、CI以及作为
+    Milvus延迟对比的精确检索基线。
+
+    旁路表由快照和追加日志组成：insert/delete只向日志追加本批变更，日志超过快照大小
+    （且不小于LOG_COMPACT_BYTES）时重写快照并清空日志，小批量写入N条的总写入量为O(N)。
+    快照带代数，日志条目只在代数一致时重放，重写快照后残留的旧日志不会被重复应用。
+    """
+
+    INITIAL_CAPACITY = 1024
+    COMPACT_RATIO = 0.3
+    LOG_COMPACT_BYTES = 1 << 20
+
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        collection_name: Optional[str] = None,
+        dimension: Optional[int] = None
+    ):
+        self.collection_name = collection_name or settings.MILVUS_COLLECTION
+        self.dimension = dimension or settings.EMBEDDING_DIMENSION
+        self.data_dir = Path(data_dir or settings.VECTOR_STORE_DIR)
+        self._lock = RLock()
+        self._vectors: Optional[np.memmap] = None
+        self._count = 0
+        self._generation = 0
+        self._snapshot_bytes = 0
+        self._log_bytes = 0
+        self._reset_tables()
+        self._load()
+
+    @property
+    def vectors_path(self) -> Path:
+        return self.data_dir / f"{self.collection_name}.vectors.npy"
+
+    @property
+    def tables_path(self) -> Path:
+        return self.data_dir / f"{self.collection_name}.tables.json"
+
+    @property
+    def log_path(self) -> Path:
+        return self.data_dir / f"{self.collection_name}.tables.log"
+
+    @property
+    def num_entities(self) -> int:
+        with self._lock:
+            return int(self._alive[:self._count].sum())
+
+    def connect(self):
+        self.create_collection()
+
+    def create_collection(self):
+        """创建存储目录"""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+    def insert(self, vectors: List[Dict[str, Any]]) -> List[str]:
+        """插入向量"""
+        if not vectors:
+            return []
+
+        embeddings = _normalize(np.asarray([v["embedding"] for v in vectors], dtype=np.float32))
+        if embeddings.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {embeddings.shape[1]} does not match store dimension {self.dimension}"
+            )
+
+        ids = [str(uuid.uuid4()) for _ in vectors]
+        rows = {
+            "ids": ids,
+            "doc_ids": [str(v["doc_id"]) for v in vectors],
+            "chunk_ids": [str(v["chunk_id"]) for v in vectors],
+            "contents": [v.get("content", "") for v in vectors],
+            "metadata": {field: [metadata_value(v, field) for v in vectors] for field in METADATA_FIELDS}
+        }
+
+        with self._lock:
+            start = self._count
+            end = start + len(vectors)
+            self._ensure_capacity(end)
+            self._vectors[start:end] = embeddings
+            self._vectors.flush()
+
+            self._apply_insert(rows)
+            self._append_log({"op": "insert", "start": start, **rows})
+
+        logger.debug(f"Inserted {len(ids)} vectors into {self.vectors_path}")
+        return ids
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """搜索相似向量"""
+        return self.search_many([query_vector], top_k=top_k, doc_ids=doc_ids, filters=filters)[0]
+
+    def search_many(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """向量化余弦top-k，search_params仅为兼容MilvusClient接口"""
+        if not query_vectors:
+            return []
+
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+
+        with self._lock:
+            count = self._count
+            vectors = self._vectors
+            mask = self._alive[:count] & self._filter_mask(normalize_filters(filters, doc_ids), count)
+            tables = self._snapshot_tables()
+
+        candidates = np.flatnonzero(mask)
+        k = min(top_k, candidates.size)
+        if k == 0:
+            return [[] for _ in range(len(queries))]
+
+        if candidates.size == count:
+            scores = queries @ vectors[:count].T
+        else:
+            scores = queries @ vectors[candidates].T
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(queries))[:, None]
+        top = top[rows, np.argsort(-scores[rows, top], axis=1)]
+
+        return [
+            [_to_hit(tables, int(candidates[col]), float(scores[qi, col])) for col in top[qi]]
+            for qi in range(len(queries))
+        ]
+
+    def fetch_vectors(self, limit: int = 10000) -> Dict[str, List[Any]]:
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._count])[:limit]
+            return {
+                "ids": [self._ids[i] for i in rows],
+                "embeddings": np.asarray(self._vectors[rows]).tolist()
+            }
+
+    def fetch_embeddings(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[float]]:
+        """按(doc_id, chunk_id)取回已存储的向量"""
+        wanted = set(keys)
+        if not wanted:
+            return {}
+
+        with self._lock:
+            rows = [
+                i for i in range(self._count)
+                if self._alive[i] and (self._doc_ids[i], self._chunk_ids[i]) in wanted
+            ]
+            return {
+                (self._doc_ids[i], self._chunk_ids[i]): np.asarray(self._vectors[i]).tolist()
+                for i in rows
+            }
+
+    def delete_by_doc_id(self, doc_id: str):
+        """删除文档的所有向量（标记删除，比例过高时压缩）"""
+        self.delete_by_doc_ids([doc_id])
+
+    def delete_by_doc_ids(self, doc_ids: List[str], batch_size: Optional[int] = None) -> int:
+        """批量删除文档向量，batch_size仅为兼容MilvusClient接口"""
+        targets = set(doc_ids)
+        with self._lock:
+            rows = [i for i, d in enumerate(self._doc_ids) if d in targets and self._alive[i]]
+            if not rows:
+                return 0
+            self._alive[rows] = False
+            self._append_log({"op": "delete", "rows": rows})
+
+            if self._count and (1 - self._alive.sum() / self._count) > self.COMPACT_RATIO:
+                self.compact()
+
+        return len(rows)
+
+    def compact(self):
+        """移除已删除的行并重写向量文件"""
+        with self._lock:
+            keep = np.flatnonzero(self._alive[:self._count])
+            vectors = np.asarray(self._vectors[keep]) if self._count else np.zeros((0, self.dimension), dtype=np.float32)
+
+            self._ids = [self._ids[i] for i in keep]
+            self._doc_ids = [self._doc_ids[i] for i in keep]
+            self._chunk_ids = [self._chunk_ids[i] for i in keep]
+            self._contents = [self._contents[i] for i in keep]
+            for field in METADATA_FIELDS:
+                self._metadata[field] = [self._metadata[field][i] for i in keep]
+            self._alive = np.ones(len(keep), dtype=bool)
+            self._count = len(keep)
+
+            self._write_vectors(vectors, max(self.INITIAL_CAPACITY, self._count))
+            self._save_tables()
+            logger.info(f"Compacted vector store {self.collection_name}: {self._count} rows")
+
+    async def insert_async(self, vectors: List[Dict[str, Any]]) -> List[str]:
+        return await io_executor.run(self.insert, vectors)
+
+    async def search_async(
+        self,
+        query_vector: List[float],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        return await io_executor.run(
+            self.search, query_vector, top_k=top_k, doc_ids=doc_ids, filters=filters
+        )
+
+    async def search_many_async(
+        self,
+        query_vectors: List[List[float]],
+        top_k: int = 10,
+        doc_ids: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, Any]] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        return await io_executor.run(
+            self.search_many, query_vectors, top_k=top_k, doc_ids=doc_ids, filters=filters
+        )
+
+    async def fetch_embeddings_async(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], List[float]]:
+        return await io_executor.run(self.fetch_embeddings, keys)
+
+    async def delete_by_doc_id_async(self, doc_id: str):
+        return await io_executor.run(self.delete_by_doc_id, doc_id)
+
+    async def delete_by_doc_ids_async(self, doc_ids: List[str], batch_size: Optional[int] = None) -> int:
+        return await io_executor.run(self.delete_by_doc_ids, doc_ids)
+
+    def _filter_mask(self, conditions: Dict[str, List[str]], count: int) -> np.ndarray:
+        mask = np.ones(count, dtype=bool)
+        columns = {"doc_id": self._doc_ids, "chunk_id": self._chunk_ids, **self._metadata}
+
+        for field, values in conditions.items():
+            column = np.asarray(columns[field][:count], dtype=object)
+            mask &= np.isin(column, values)
+
+        return mask
+
+    def _snapshot_tables(self) -> Dict[str, Any]:
+        # insert只追加、compact整体替换列表，持有引用即可得到一致的快照
+        return {
+            "ids": self._ids,
+            "doc_ids": self._doc_ids,
+            "chunk_ids": self._chunk_ids,
+            "contents": self._contents,
+            "metadata": dict(self._metadata)
+        }
+
+    def _ensure_capacity(self, required: int):
+        capacity = self._vectors.shape[0] if self._vectors is not None else 0
+        if required <= capacity:
+            return
+
+        new_capacity = max(self.INITIAL_CAPACITY, capacity * 2, required)
+        existing = np.asarray(self._vectors[:self._count]) if self._count else None
+        self._write_vectors(existing, new_capacity)
+
+    def _write_vectors(self, vectors: Optional[np.ndarray], capacity: int):
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.vectors_path.with_suffix(".tmp.npy")
+
+        array = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.dimension)
+        )
+        if vectors is not None and len(vectors):
+            array[:len(vectors)] = vectors
+        array.flush()
+        del array
+
+        os.replace(tmp_path, self.vectors_path)
+        self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+
+    def _apply_insert(self, rows: Dict[str, Any]):
+        self._ids.extend(rows["ids"])
+        self._doc_ids.extend(rows["doc_ids"])
+        self._chunk_ids.extend(rows["chunk_ids"])
+        self._contents.extend(rows["contents"])
+        for field in METADATA_FIELDS:
+            self._metadata[field].extend(rows["metadata"].get(field) or [""] * len(rows["ids"]))
+        self._alive = np.concatenate([self._alive, np.ones(len(rows["ids"]), dtype=bool)])
+        self._count += len(rows["ids"])
+
+    def _append_log(self, op: Dict[str, Any]):
+        """追加一条旁路表变更；还没有快照或日志已大于快照时改为重写快照"""
+        if not self.tables_path.exists():
+            self._save_tables()
+            return
+
+        line = json.dumps({"generation": self._generation, **op}, ensure_ascii=False) + "\n"
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+        self._log_bytes += len(line.encode("utf-8"))
+
+        if self._log_bytes > max(self._snapshot_bytes, self.LOG_COMPACT_BYTES):
+            self._save_tables()
+
+    def _replay_log(self):
+        if not self.log_path.exists():
+            return
+
+        replayed = 0
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    # 写入中途崩溃留下的不完整末行
+                    logger.warning(f"Ignoring truncated entry in {self.log_path}")
+                    break
+                self._log_bytes += len(line.encode("utf-8"))
+                if op.get("generation") != self._generation:
+                    continue
+                if op["op"] == "insert" and op["start"] == self._count:
+                    self._apply_insert(op)
+                elif op["op"] == "delete":
+                    self._alive[op["rows"]] = False
+                else:
+                    continue
+                replayed += 1
+
+        if replayed:
+            logger.info(f"Replayed {replayed} table log entries from {self.log_path}")
+
+    def _save_tables(self):
+        self._generation += 1
+        tables = {
+            "generation": self._generation,
+            "dimension": self.dimension,
+            "count": self._count,
+            "ids": self._ids,
+            "doc_ids": self._doc_ids,
+            "chunk_ids": self._chunk_ids,
+            "contents": self._contents,
+            "metadata": self._metadata,
+            "alive": self._alive[:self._count].astype(np.uint8).tolist()
+        }
+
+        tmp_path = self.tables_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(tables, f, ensure_ascii=False)
+        os.replace(tmp_path, self.tables_path)
+        self._snapshot_bytes = self.tables_path.stat().st_size
+
+        # 快照已包含日志中的全部变更，新代数下旧日志条目即使残留也会被忽略
+        self.log_path.unlink(missing_ok=True)
+        self._log_bytes = 0
+
+    def _reset_tables(self):
+        self._ids: List[str] = []
+        self._doc_ids: List[str] = []
+        self._chunk_ids: List[str] = []
+        self._contents: List[str] = []
+        self._metadata: Dict[str, List[str]] = {field: [] for field in METADATA_FIELDS}
+        self._alive = np.zeros(0, dtype=bool)
+
+    def _load(self):
+        if not self.tables_path.exists() or not self.vectors_path.exists():
+            return
+
+        with open(self.tables_path, "r", encoding="utf-8") as f:
+            tables = json.load(f)
+
+        if tables["dimension"] != self.dimension:
+            raise ValueError(
+                f"Stored dimension {tables['dimension']} does not match configured {self.dimension}"
+            )
+
+        self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+        self._generation = tables.get("generation", 0)
+        self._snapshot_bytes = self.tables_path.stat().st_size
+        self._count = tables["count"]
+        self._ids = tables["ids"]
+        self._doc_ids = tables["doc_ids"]
+        self._chunk_ids = tables["chunk_ids"]
+        self._contents = tables["contents"]
+        self._metadata = {field: tables["metadata"].get(field, [""] * self._count) for field in METADATA_FIELDS}
+        self._alive = np.asarray(tables["alive"], dtype=bool)
+        self._replay_log()
+
+        logger.info(f"Loaded vector store {self.vectors_path}: {self._count} rows")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _to_hit(tables: Dict[str, Any], row: int, score: float) -> Dict[str, Any]:
+    return {
+        "id": tables["ids"][row],
+        "score": score,
+        "doc_id": tables["doc_ids"][row],
+        "chunk_id": tables["chunk_ids"][row],
+        "content": tables["contents"][row],
+        "metadata": {field: tables["metadata"][field][row] for field in METADATA_FIELDS}
+    }
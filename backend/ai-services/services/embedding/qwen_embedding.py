@@ -36,6 +36,10 @@ class QwenEmbedding:
             data = response.json()
             return data["output"]["embeddings"][0]["embedding"]
 
+    async def embed_single(self, text: str) -> List[float]:
+        """生成查询文本的向量"""
+        return await self.embed(text)
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
     async def embed_batch(self, texts: List[str], batch_size: int = 10) -> List[List[float]]:
         """批量生成向量"""
@@ -63,3 +67,6 @@ class QwenEmbedding:
                 all_embeddings.extend(embeddings)
 
         return all_embeddings
+
+
+qwen_embedding = QwenEmbedding()
@@ -0,0 +1,88 @@
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METADATA_FIELDS = ("category", "tenant", "doc_type")
+FILTERABLE_FIELDS = ("doc_id", "chunk_id") + METADATA_FIELDS
+OFFSET_FIELDS = ("start_offset", "end_offset")
+
+
+def metadata_value(vector: Dict[str, Any], field: str) -> str:
+    """读取待写入向量的元数据字段，兼容顶层字段与metadata字典"""
+    value = vector.get(field)
+    if value is None:
+        value = (vector.get("metadata") or {}).get(field)
+    return str(value) if value is not None else ""
+
+
+def normalize_filters(
+    filters: Optional[Dict[str, Any]] = None,
+    doc_ids: Optional[List[str]] = None
+) -> Dict[str, List[str]]:
+    """把ES风格的过滤条件归一化为 字段 -> 允许取值列表，忽略向量库不支持的字段"""
+    conditions: Dict[str, List[str]] = {}
+
+    for key, value in (filters or {}).items():
+        field = key[len("metadata."):] if key.startswith("metadata.") else key
+        if field not in FILTERABLE_FIELDS:
+            logger.debug(f"Filter {key} is not pushed down to vector search")
+            continue
+
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        conditions[field] = [str(v) for v in values]
+
+    if doc_ids:
+        allowed = [str(d) for d in doc_ids]
+        if "doc_id" in conditions:
+            allowed_set = set(allowed)
+            allowed = [d for d in conditions["doc_id"] if d in allowed_set]
+        conditions["doc_id"] = allowed
+
+    return conditions
+
+
+def build_milvus_expr(
+    conditions: Dict[str, List[str]],
+    partition_key: Optional[str] = None
+) -> Tuple[Optional[str], Dict[str, Any]]:
+    """生成Milvus过滤表达式与模板参数
+
+    取值通过expr_params传入，避免拼接超长的字符串表达式；
+    分区键使用字面量，保证Milvus能据此裁剪分区；空取值列表生成恒不匹配的子句。
+    """
+    clauses = []
+    params: Dict[str, Any] = {}
+
+    for field, values in conditions.items():
+        if not values:
+            # 空取值列表（如{"tenant": []}或doc_ids与过滤条件无交集）不匹配任何向量
+            clauses.append(f"{field} in []")
+            continue
+
+        if field == partition_key:
+            literal = json.dumps(values[0], ensure_ascii=False)
+            if len(values) == 1:
+                clauses.append(f"{field} == {literal}")
+            else:
+                clauses.append(f"{field} in {json.dumps(values, ensure_ascii=False)}")
+            continue
+
+        param_name = f"{field}_values"
+        if len(values) == 1:
+            clauses.append(f"{field} == {{{param_name}}}")
+            params[param_name] = values[0]
+        else:
+            clauses.append(f"{field} in {{{param_name}}}")
+            params[param_name] = values
+
+    if not clauses:
+        return None, {}
+
+    return " and ".join(clauses), params
+
+
+def matches_nothing(conditions: Dict[str, List[str]]) -> bool:
+    """存在空取值列表的过滤条件，结果必为空，可以跳过检索"""
+    return any(not values for values in conditions.values())
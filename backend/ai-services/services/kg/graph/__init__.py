@@ -1,6 +1,8 @@
 from .neo4j_client import Neo4jClient, neo4j_client
+from .entity_linker import EntityLinker, EntityMention, entity_linker
 from .entity_repository import EntityRepository, entity_repository
 from .relation_repository import RelationRepository, relation_repository
+from .chunk_entity_index import ChunkEntityIndex, chunk_entity_index
 from .index_manager import IndexManager
 from .traversal_engine import TraversalEngine, traversal_engine
 from .multi_hop_query import MultiHopQueryService, multi_hop_query_service
@@ -26,10 +28,15 @@ from .quality_evaluator import (
 __all__ = [
     "Neo4jClient",
     "neo4j_client",
+    "EntityLinker",
+    "EntityMention",
+    "entity_linker",
     "EntityRepository",
     "entity_repository",
     "RelationRepository",
     "relation_repository",
+    "ChunkEntityIndex",
+    "chunk_entity_index",
     "IndexManager",
     "TraversalEngine",
     "traversal_engine",
@@ -0,0 +1,89 @@
+import logging
+from typing import List, Dict, Any, Iterable, Tuple
+
+from services.kg.graph.neo4j_client import neo4j_client
+
+logger = logging.getLogger(__name__)
+
+ChunkKey = Tuple[str, str]
+
+
+class ChunkEntityIndex:
+    """chunk -> 实体 的映射，以 (:Entity)-[:MENTIONED_IN]->(:Chunk) 保存在Neo4j中
+
+    问答构建图谱上下文时按检索命中的chunk一次查询即可得到相关实体，
+    不再对检索结果逐条调用LLM抽取。映射存放在共享的图库里，图谱服务写入、
+    问答服务删除和查询都直接作用于同一份数据；实体删除时关联边随之删除。
+    """
+
+    def __init__(self):
+        self.client = neo4j_client
+
+    async def add_document(self, doc_id: str, chunk_entities: Dict[str, List[str]]) -> int:
+        """写入一个文档的chunk->实体映射，覆盖该文档之前的条目"""
+        await self.remove_documents([doc_id])
+
+        chunks = [
+            {"chunk_id": chunk_id, "entity_ids": list(dict.fromkeys(entity_ids))}
+            for chunk_id, entity_ids in chunk_entities.items()
+            if entity_ids
+        ]
+        if not chunks:
+            return 0
+
+        query = """
+        UNWIND $chunks AS chunk
+        CREATE (c:Chunk {doc_id: $doc_id, chunk_id: chunk.chunk_id})
+        WITH c, chunk
+        UNWIND chunk.entity_ids AS entity_id
+        MATCH (e:Entity {id: entity_id})
+        MERGE (e)-[:MENTIONED_IN]->(c)
+        """
+
+        await self.client.execute_write(query, {"doc_id": doc_id, "chunks": chunks})
+        logger.info(f"Indexed {len(chunks)} chunks with entities for document {doc_id}")
+        return len(chunks)
+
+    async def remove_documents(self, doc_ids: Iterable[str]) -> int:
+        """文档删除或重新入库时调用，移除其chunk节点及关联边"""
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return 0
+
+        query = """
+        MATCH (c:Chunk)
+        WHERE c.doc_id IN $doc_ids
+        DETACH DELETE c
+        RETURN count(c) as removed
+        """
+
+        result = await self.client.execute_write(query, {"doc_ids": doc_ids})
+        return result[0]["removed"] if result else 0
+
+    async def lookup(self, chunks: List[ChunkKey], limit: int = 20) -> List[Dict[str, Any]]:
+        """批量查询命中chunk关联的实体，按被提及的chunk数降序，同数时按检索排名"""
+        if not chunks:
+            return []
+
+        query = """
+        UNWIND range(0, size($chunks) - 1) AS rank
+        WITH rank, $chunks[rank] AS chunk
+        MATCH (e:Entity)-[:MENTIONED_IN]->(:Chunk {doc_id: chunk.doc_id, chunk_id: chunk.chunk_id})
+        WITH e, count(*) AS mentions, min(rank) AS first_rank
+        RETURN e.id as id,
+               e.name as name,
+               e.type as type,
+               e.description as description
+        ORDER BY mentions DESC, first_rank ASC
+        LIMIT $limit
+        """
+
+        params = {
+            "chunks": [{"doc_id": doc_id, "chunk_id": chunk_id} for doc_id, chunk_id in chunks],
+            "limit": limit
+        }
+
+        return await self.client.execute_read(query, params)
+
+
+chunk_entity_index = ChunkEntityIndex()
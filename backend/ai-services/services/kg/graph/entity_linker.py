@@ -0,0 +1,303 @@
+import time
+import asyncio
+import logging
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+
+from config.kg_settings import kg_settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_surface(text: str) -> str:
+    """全角转半角并转小写，实体名与查询使用同一规范化"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机，构建后只读，一次扫描找出所有模式的出现位置"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self.size = 0
+        for pattern, payload in patterns:
+            self._insert(pattern, payload)
+        self._build()
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                yield i - length + 1, i + 1, payload
+
+    def _insert(self, pattern: str, payload: Any):
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            child = self._goto[node].get(ch)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][ch] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append((len(pattern), payload))
+        self.size += 1
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                state = self._fail[node]
+                while state and ch not in self._goto[state]:
+                    state = self._fail[state]
+                target = self._goto[state].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                if self._out[self._fail[child]]:
+                    self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+
+@dataclass
+class EntityMention:
+    entity_id: str
+    name: str
+    type: str
+    surface: str
+    start: int
+    end: int
+
+
+class EntityLinker:
+    """基于实体名与别名词典的查询实体链接
+
+    全量自动机从entity_repository加载；实体新增或改名时只把新名称放入小的增量自动机，
+    增量超过阈值再合并进全量自动机。删除和改名不改自动机，匹配时按当前实体表校验，
+    过期的名称自然不会命中。偏移量基于规范化后的查询文本。
+    """
+
+    def __init__(
+        self,
+        min_length: Optional[int] = None,
+        delta_limit: Optional[int] = None,
+        refresh_interval: Optional[float] = None,
+        retry_interval: Optional[float] = None
+    ):
+        self.min_length = min_length or kg_settings.ENTITY_LINKER_MIN_LENGTH
+        self.delta_limit = delta_limit or kg_settings.ENTITY_LINKER_DELTA_LIMIT
+        self.refresh_interval = (
+            kg_settings.ENTITY_LINKER_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        )
+        self.retry_interval = (
+            kg_settings.ENTITY_LINKER_RETRY_INTERVAL if retry_interval is None else retry_interval
+        )
+        self._lock = Lock()
+        self._entities: Dict[str, Dict[str, Any]] = {}
+        self._main = AhoCorasick()
+        self._delta = AhoCorasick()
+        self._pending: List[Tuple[str, str]] = []
+        self._dirty = False
+        self._loaded_at: Optional[float] = None
+        self._failed_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def load(self, repository=None, batch_size: int = 1000) -> int:
+        """分页读取全部实体名与别名并重建自动机"""
+        if repository is None:
+            from services.kg.graph.entity_repository import entity_repository
+            repository = entity_repository
+
+        entities: Dict[str, Dict[str, Any]] = {}
+        skip = 0
+        while True:
+            rows = await repository.list_entity_names(skip=skip, limit=batch_size)
+            for row in rows:
+                entry = self._entry(row)
+                if entry:
+                    entities[entry["id"]] = entry
+            if len(rows) < batch_size:
+                break
+            skip += batch_size
+
+        with self._lock:
+            self._entities = entities
+            self._rebuild()
+            self._loaded_at = time.time()
+            self._failed_at = None
+
+        logger.info(f"Entity linker loaded {len(entities)} entities, {self._main.size} surfaces")
+        return len(entities)
+
+    def upsert(self, entity: Dict[str, Any]):
+        """实体创建或更新后调用，新名称进入增量自动机"""
+        entry = self._entry(entity)
+        if entry is None:
+            return
+
+        with self._lock:
+            previous = self._entities.get(entry["id"])
+            self._entities[entry["id"]] = entry
+
+            known = set(previous["surfaces"]) if previous else set()
+            added = [(s, entry["id"]) for s in entry["surfaces"] if s not in known]
+            if not added:
+                return
+
+            self._pending.extend(added)
+            self._dirty = True
+
+    def remove(self, entity_id: str):
+        with self._lock:
+            self._entities.pop(entity_id, None)
+
+    def get(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entities.get(entity_id)
+        if entry is None:
+            return None
+        return {"id": entry["id"], "name": entry["name"], "type": entry["type"]}
+
+    def find_all(self, query: str) -> List[EntityMention]:
+        """返回查询中所有实体名的出现，允许重叠"""
+        text = normalize_surface(query)
+        if self._dirty:
+            self._apply_pending()
+        main, delta, entities = self._main, self._delta, self._entities
+
+        mentions = []
+        seen = set()
+        for automaton in (main, delta):
+            for start, end, entity_id in automaton.iter_matches(text):
+                key = (start, end, entity_id)
+                if key in seen:
+                    continue
+                entity = entities.get(entity_id)
+                surface = text[start:end]
+                if entity is None or surface not in entity["surfaces"]:
+                    continue
+                if not self._on_word_boundary(text, start, end):
+                    continue
+                seen.add(key)
+                mentions.append(EntityMention(
+                    entity_id=entity_id,
+                    name=entity["name"],
+                    type=entity["type"],
+                    surface=surface,
+                    start=start,
+                    end=end
+                ))
+        return mentions
+
+    def link(self, query: str) -> List[EntityMention]:
+        """最左最长匹配，同一片段对应多个同名实体时全部保留"""
+        mentions = sorted(self.find_all(query), key=lambda m: (m.start, -(m.end - m.start)))
+
+        linked = []
+        covered_until = -1
+        span = None
+        for mention in mentions:
+            if span == (mention.start, mention.end):
+                linked.append(mention)
+            elif mention.start >= covered_until:
+                linked.append(mention)
+                span = (mention.start, mention.end)
+                covered_until = mention.end
+        return linked
+
+    def schedule_refresh(self):
+        """距上次加载超过refresh_interval时在后台重新加载，当前查询继续使用旧自动机
+
+        从未加载成功（如启动时Neo4j不可用）时也尝试加载，失败后至少间隔retry_interval再重试。
+        """
+        now = time.time()
+        if self._failed_at is not None and now - self._failed_at < self.retry_interval:
+            return
+        if self._loaded_at is not None:
+            if self.refresh_interval <= 0 or now - self._loaded_at < self.refresh_interval:
+                return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "entities": len(self._entities),
+            "surfaces": self._main.size + self._delta.size,
+            "pending": len(self._pending)
+        }
+
+    async def _refresh(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.warning(f"Entity linker refresh failed: {e}")
+            self._failed_at = time.time()
+
+    def _apply_pending(self):
+        # 批量写入期间只记录新名称，首次查询时才重建增量自动机；
+        # 增量超过全量的一定比例后合并重建，摊还代价与实体总数成线性
+        with self._lock:
+            if not self._dirty:
+                return
+            if len(self._pending) > max(self.delta_limit, self._main.size // 4):
+                self._rebuild()
+            else:
+                self._delta = AhoCorasick(self._pending)
+                self._dirty = False
+
+    def _rebuild(self):
+        self._main = AhoCorasick(
+            (surface, entity_id)
+            for entity_id, entry in self._entities.items()
+            for surface in entry["surfaces"]
+        )
+        self._delta = AhoCorasick()
+        self._pending = []
+        self._dirty = False
+
+    def _entry(self, entity: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        entity_id = entity.get("id")
+        name = entity.get("name")
+        if not entity_id or not name:
+            return None
+
+        surfaces = [name, *(entity.get("aliases") or [])]
+        normalized = [normalize_surface(s).strip() for s in surfaces if s]
+        return {
+            "id": entity_id,
+            "name": name,
+            "type": entity.get("type", ""),
+            "surfaces": list(dict.fromkeys(s for s in normalized if len(s) >= self.min_length))
+        }
+
+    @staticmethod
+    def _on_word_boundary(text: str, start: int, end: int) -> bool:
+        # 英文与数字实体名不能是更长单词的一部分，中文不做限制
+        if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            return False
+        return True
+
+
+entity_linker = EntityLinker()
@@ -3,6 +3,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 from services.kg.graph.neo4j_client import neo4j_client
+from services.kg.graph.entity_linker import entity_linker
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +47,9 @@ class EntityRepository:
         
         result = await self.client.execute_write(query, params)
         if result:
-            return result[0].get("e", {})
+            entity = result[0].get("e", {})
+            entity_linker.upsert(entity)
+            return entity
         return {}
 
     async def update_entity(
@@ -70,7 +73,9 @@ class EntityRepository:
         
         result = await self.client.execute_write(query, params)
         if result:
-            return result[0].get("e", {})
+            entity = result[0].get("e", {})
+            entity_linker.upsert(entity)
+            return entity
         return None
 
     async def get_entity_by_id(self, entity_id: str) -> Optional[Dict[str, Any]]:
@@ -126,7 +131,10 @@ class EntityRepository:
         """
         
         result = await self.client.execute_write(query, {"entity_id": entity_id})
-        return len(result) > 0 and result[0].get("deleted", 0) > 0
+        deleted = len(result) > 0 and result[0].get("deleted", 0) > 0
+        if deleted:
+            entity_linker.remove(entity_id)
+        return deleted
 
     async def search_entities(
         self,
@@ -163,6 +171,22 @@ class EntityRepository:
         result = await self.client.execute_read(query, params)
         return [record.get("e", {}) for record in result]
 
+    async def list_entity_names(
+        self,
+        skip: int = 0,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """分页读取实体的名称、别名与类型，用于构建实体链接词典"""
+        query = """
+        MATCH (e:Entity)
+        RETURN e.id as id, e.name as name, e.type as type, e.aliases as aliases
+        ORDER BY e.id
+        SKIP $skip
+        LIMIT $limit
+        """
+        
+        return await self.client.execute_read(query, {"skip": skip, "limit": limit})
+
     async def count_entities_by_type(self, entity_type: str) -> int:
         query = """
         MATCH (e:Entity {type: $entity_type})
@@ -100,6 +100,21 @@ class IndexManager:
             logger.error(f"Failed to create relation_type_index: {e}")
             return False
 
+    async def create_chunk_index(self) -> bool:
+        query = """
+        CREATE INDEX chunk_doc_index IF NOT EXISTS
+        FOR (c:Chunk)
+        ON (c.doc_id, c.chunk_id)
+        """
+        
+        try:
+            await self.client.execute_write(query)
+            logger.info("Created chunk_doc_index")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to create chunk_doc_index: {e}")
+            return False
+
     async def ensure_indexes(self) -> Dict[str, bool]:
         results = {
             "entity_id_index": await self.create_entity_id_index(),
@@ -107,7 +122,8 @@ class IndexManager:
             "entity_type_index": await self.create_entity_type_index(),
             "entity_fulltext": await self.create_fulltext_index(),
             "relation_id_index": await self.create_relation_id_index(),
-            "relation_type_index": await self.create_relation_type_index()
+            "relation_type_index": await self.create_relation_type_index(),
+            "chunk_doc_index": await self.create_chunk_index()
         }
         
         success_count = sum(1 for v in results.values() if v)
@@ -217,6 +217,40 @@ class RelationRepository:
         result = await self.client.execute_read(query, params)
         return result
 
+    async def get_relations_among(
+        self,
+        entity_ids: List[str],
+        limit: int = 20,
+        seed_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """一次查询给定实体集合内部的关系以及种子实体的一跳关系，按置信度降序"""
+        if not entity_ids and not seed_ids:
+            return []
+
+        query = """
+        MATCH (source:Entity)-[r:RELATES]->(target:Entity)
+        WHERE (source.id IN $entity_ids AND target.id IN $entity_ids)
+           OR source.id IN $seed_ids
+           OR target.id IN $seed_ids
+        RETURN source.id as head_id,
+               source.name as head,
+               r.type as type,
+               target.id as tail_id,
+               target.name as tail,
+               r.confidence as confidence
+        ORDER BY r.confidence DESC
+        LIMIT $limit
+        """
+        
+        params = {
+            "entity_ids": entity_ids,
+            "seed_ids": seed_ids or [],
+            "limit": limit
+        }
+        
+        result = await self.client.execute_read(query, params)
+        return result
+
     async def get_relations_by_tail_entity(
         self,
         tail_entity_id: str,
@@ -13,6 +13,7 @@ from services.kg.relation.relation_processor import RelationProcessor, Processed
 from services.kg.graph.neo4j_client import neo4j_client
 from services.kg.graph.entity_repository import entity_repository
 from services.kg.graph.relation_repository import relation_repository
+from services.kg.graph.chunk_entity_index import chunk_entity_index
 from config.kg_settings import kg_settings
 
 logger = logging.getLogger(__name__)
@@ -76,6 +77,7 @@ class ExtractionResult:
     extraction_time_ms: float
     status: PipelineStatus
     errors: List[str] = field(default_factory=list)
+    chunk_entities: Dict[str, List[str]] = field(default_factory=dict)
 
 
 class KGExtractionPipeline:
@@ -366,7 +368,11 @@ class KGExtractionPipeline:
             relation_count=len(all_relations),
             extraction_time_ms=extraction_time_ms,
             status=PipelineStatus.COMPLETED if not errors else PipelineStatus.FAILED,
-            errors=errors
+            errors=errors,
+            chunk_entities={
+                chunk_id: [e.normalized_name for e in entities]
+                for chunk_id, entities in chunk_entities_map.items()
+            }
         )
 
     def _merge_processed_entities(self, entities: List[ProcessedEntity]) -> ProcessedEntity:
@@ -425,7 +431,8 @@ class KGExtractionPipeline:
             self._notify_progress(progress)
 
             try:
-                await self._store_to_graph(result, config, progress)
+                entity_id_map = await self._store_to_graph(result, config, progress)
+                await self._index_chunk_entities(result, entity_id_map)
             except Exception as e:
                 self._handle_error(e, ExtractionStage.GRAPH_STORAGE, {"doc_id": doc_id})
                 result.errors.append(str(e))
@@ -439,7 +446,7 @@ class KGExtractionPipeline:
         result: ExtractionResult,
         config: ExtractionConfig,
         progress: ExtractionProgress
-    ) -> None:
+    ) -> Dict[str, str]:
         entity_id_map: Dict[str, str] = {}
 
         for entity in result.entities:
@@ -507,6 +514,20 @@ class KGExtractionPipeline:
             progress.processed_items += 1
             self._notify_progress(progress)
 
+        return entity_id_map
+
+    async def _index_chunk_entities(
+        self,
+        result: ExtractionResult,
+        entity_id_map: Dict[str, str]
+    ) -> None:
+        """记录每个chunk抽取出的实体ID，供问答时直接查表构建图谱上下文"""
+        chunk_entities = {
+            chunk_id: [entity_id_map[name] for name in names if name in entity_id_map]
+            for chunk_id, names in result.chunk_entities.items()
+        }
+        await chunk_entity_index.add_document(result.doc_id, chunk_entities)
+
     def track_progress(self) -> Optional[ExtractionProgress]:
         return self._current_progress
 
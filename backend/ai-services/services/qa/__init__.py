@@ -1,15 +1,28 @@
 from services.qa.context_builder import ContextBuilder, context_builder
 from services.qa.stream_handler import SSEStreamHandler, sse_stream_handler
-from services.qa.reference_annotator import ReferenceAnnotator, reference_annotator
+from services.qa.sse_encoder import SSEEncoder, sse_encoder, coalesce_deltas
+from services.qa.reference_annotator import ReferenceAnnotator, IncrementalAnnotator, reference_annotator
 from services.qa.prompt_template import QAPromptTemplate, qa_prompt_template
+from services.qa.conversation_store import ConversationStore, ConversationState, conversation_store
+from services.qa.retrieval_pipeline import RetrievalPipeline, StageTimer, retrieval_pipeline
 
 __all__ = [
     "ContextBuilder",
     "context_builder",
     "SSEStreamHandler",
     "sse_stream_handler",
+    "SSEEncoder",
+    "sse_encoder",
+    "coalesce_deltas",
     "ReferenceAnnotator",
+    "IncrementalAnnotator",
     "reference_annotator",
     "QAPromptTemplate",
     "qa_prompt_template",
+    "ConversationStore",
+    "ConversationState",
+    "conversation_store",
+    "RetrievalPipeline",
+    "StageTimer",
+    "retrieval_pipeline",
 ]
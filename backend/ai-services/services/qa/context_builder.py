@@ -2,6 +2,9 @@ import logging
 from typing import List, Dict, Any, Optional
 from models.qa_models import SourceReference, GraphContext, ContextBuildResult
 from config.settings import settings
+from services.qa.context_packer import ContextPacker
+from services.qa.token_estimator import TokenEstimator, token_estimator
+from services.qa.conversation_store import ConversationState
 
 logger = logging.getLogger(__name__)
 
@@ -13,17 +16,23 @@ class ContextBuilder:
     def __init__(
         self,
         max_context_tokens: int = None,
-        max_source_length: int = 500
+        max_source_length: int = 500,
+        packing: Optional[str] = None,
+        estimator: Optional[TokenEstimator] = None
     ):
         self.max_context_tokens = max_context_tokens or self.MAX_CONTEXT_TOKENS
         self.max_source_length = max_source_length
+        self.packing = packing or settings.CONTEXT_PACKING
+        self.estimator = estimator or token_estimator
+        self.packer = ContextPacker(estimator=self.estimator)
     
     def build_context(
         self,
         query: str,
         search_results: List[Dict[str, Any]],
         graph_context: Optional[GraphContext] = None,
-        history: Optional[List[Dict[str, Any]]] = None
+        history: Optional[List[Dict[str, Any]]] = None,
+        conversation: Optional[ConversationState] = None
     ) -> ContextBuildResult:
         logger.info(f"Building context for query: {query[:50]}...")
         
@@ -32,9 +41,17 @@ class ContextBuilder:
         current_tokens = 0
         truncated = False
         
-        if history:
+        history_text = ""
+        history_tokens = 0
+        if conversation is not None and conversation.history_text:
+            # 服务端会话状态写入时已渲染好历史并计好token
+            history_text = conversation.history_text
+            history_tokens = conversation.history_tokens
+        elif history:
             history_text = self._format_history(history)
             history_tokens = self._estimate_tokens(history_text)
+        
+        if history_text:
             if history_tokens < self.max_context_tokens * 0.3:
                 context_parts.append(f"【对话历史】\n{history_text}")
                 current_tokens += history_tokens
@@ -87,6 +104,9 @@ class ContextBuilder:
         if not results:
             return "", [], 0, False
         
+        if self.packing == "knapsack":
+            return self._pack_search_results(results, remaining_tokens)
+        
         sources: List[SourceReference] = []
         formatted_parts: List[str] = []
         current_tokens = 0
@@ -99,8 +119,10 @@ class ContextBuilder:
             score = result.get("score", result.get("_score", 0.0))
             metadata = result.get("metadata", {})
             
-            if len(content) > self.max_source_length:
-                content = content[:self.max_source_length] + "..."
+            # 合并段落由多个块拼成，截断长度按块数放宽
+            max_length = self.max_source_length * result.get("merged_count", 1)
+            if len(content) > max_length:
+                content = content[:max_length] + "..."
             
             source_id = f"[{i}]"
             source = SourceReference(
@@ -136,6 +158,42 @@ class ContextBuilder:
         
         return "", sources, current_tokens, truncated
     
+    def _pack_search_results(
+        self,
+        results: List[Dict[str, Any]],
+        remaining_tokens: int
+    ) -> tuple[str, List[SourceReference], int, bool]:
+        """按分数/token挑选并在句子边界裁剪段落，只有进入上下文的段落作为来源"""
+        header = "【相关文档片段】\n"
+        header_tokens = self._estimate_tokens(header)
+        packed = self.packer.pack(
+            results,
+            budget=remaining_tokens - header_tokens,
+            max_chars=[self.max_source_length * r.get("merged_count", 1) for r in results]
+        )
+        if not packed:
+            return "", [], 0, True
+        
+        sources: List[SourceReference] = []
+        formatted_parts: List[str] = []
+        current_tokens = header_tokens
+        for i, passage in enumerate(packed, 1):
+            result = results[passage.index]
+            source_id = f"[{i}]"
+            sources.append(SourceReference(
+                source_id=source_id,
+                doc_id=result.get("doc_id", ""),
+                chunk_id=result.get("chunk_id", ""),
+                content=passage.content,
+                score=result.get("score", result.get("_score", 0.0)),
+                metadata=result.get("metadata", {})
+            ))
+            formatted_parts.append(f"{source_id} {passage.content}")
+            current_tokens += passage.tokens + self.packer.overhead_tokens
+        
+        truncated = len(packed) < len(results) or any(p.trimmed for p in packed)
+        return header + "\n".join(formatted_parts), sources, current_tokens, truncated
+    
     def _format_graph_context(self, graph_context: GraphContext) -> str:
         parts = []
         
@@ -182,7 +240,7 @@ class ContextBuilder:
         return "\n".join(lines)
     
     def _estimate_tokens(self, text: str) -> int:
-        return len(text) // self.CHARS_PER_TOKEN
+        return self.estimator.count(text)
     
     def _truncate_text(self, text: str, max_tokens: int) -> str:
         max_chars = max_tokens * self.CHARS_PER_TOKEN
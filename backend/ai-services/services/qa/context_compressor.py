@@ -0,0 +1,142 @@
+import logging
+from dataclasses import dataclass
+from threading import Lock
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from services.qa.context_packer import split_sentences
+from services.search.local_reranker import LocalReranker, local_reranker
+
+logger = logging.getLogger(__name__)
+
+GAP_MARKER = "……"
+
+
+@dataclass
+class CompressionReport:
+    original_chars: int
+    compressed_chars: int
+
+    @property
+    def ratio(self) -> float:
+        return round(self.compressed_chars / self.original_chars, 4) if self.original_chars else 1.0
+
+
+class ContextCompressor:
+    """查询相关的抽取式上下文压缩
+
+    检索结果切句后用本地词法打分器（BM25重合、二元组覆盖、邻近度）对所有句子统一打分，
+    每个来源只保留得分最高的几句并按原文顺序拼接，不相邻处用省略号连接。
+    doc_id、chunk_id和元数据保持不变，引用编号仍指向原来源；与查询无词项重合的来源保留开头几句。
+    """
+
+    def __init__(
+        self,
+        max_sentences: Optional[int] = None,
+        min_chars: Optional[int] = None,
+        min_relative_score: float = 0.3,
+        scorer: Optional[LocalReranker] = None
+    ):
+        self.max_sentences = max_sentences or settings.CONTEXT_COMPRESSION_MAX_SENTENCES
+        self.min_chars = settings.CONTEXT_COMPRESSION_MIN_CHARS if min_chars is None else min_chars
+        self.min_relative_score = min_relative_score
+        self.scorer = scorer or local_reranker
+        self._lock = Lock()
+        self._original_chars = 0
+        self._compressed_chars = 0
+        self._latency = {True: [0, 0.0], False: [0, 0.0]}
+
+    def compress(
+        self,
+        query: str,
+        results: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], CompressionReport]:
+        sentence_lists = []
+        flat: List[str] = []
+        for result in results:
+            content = result.get("content", "") or ""
+            sentences = split_sentences(content) if len(content) > self.min_chars else []
+            if len(sentences) <= self.max_sentences:
+                sentences = []
+            sentence_lists.append(sentences)
+            flat.extend(sentences)
+
+        scores = self.scorer.score(query, flat) if flat else np.zeros(0)
+
+        compressed = []
+        original_chars = compressed_chars = 0
+        offset = 0
+        for result, sentences in zip(results, sentence_lists):
+            content = result.get("content", "") or ""
+            original_chars += len(content)
+            if not sentences:
+                compressed.append(result)
+                compressed_chars += len(content)
+                continue
+
+            text = self._select(sentences, scores[offset:offset + len(sentences)])
+            offset += len(sentences)
+
+            item = dict(result)
+            item["content"] = text
+            item["original_length"] = len(content)
+            compressed.append(item)
+            compressed_chars += len(text)
+
+        report = CompressionReport(original_chars=original_chars, compressed_chars=compressed_chars)
+        with self._lock:
+            self._original_chars += original_chars
+            self._compressed_chars += compressed_chars
+
+        logger.info(f"Context compressed: {original_chars} -> {compressed_chars} chars, ratio={report.ratio}")
+        return compressed, report
+
+    def record_generation(self, compressed: bool, latency_ms: float):
+        """记录LLM生成耗时，按是否压缩分别统计，用于观察压缩对生成延迟的影响"""
+        with self._lock:
+            bucket = self._latency[compressed]
+            bucket[0] += 1
+            bucket[1] += latency_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            averages = {
+                key: round(total / count, 2) if count else None
+                for key, (count, total) in self._latency.items()
+            }
+            return {
+                "original_chars": self._original_chars,
+                "compressed_chars": self._compressed_chars,
+                "ratio": round(self._compressed_chars / self._original_chars, 4) if self._original_chars else 1.0,
+                "avg_generation_ms": {"compressed": averages[True], "uncompressed": averages[False]},
+                "generation_ms_change": (
+                    round(averages[True] - averages[False], 2)
+                    if averages[True] is not None and averages[False] is not None else None
+                )
+            }
+
+    def _select(self, sentences: List[str], scores: np.ndarray) -> str:
+        best = float(scores.max()) if len(scores) else 0.0
+        if best <= 0:
+            keep = list(range(self.max_sentences))
+        else:
+            order = np.argsort(-scores, kind="stable")[:self.max_sentences]
+            keep = sorted(int(i) for i in order if scores[i] >= best * self.min_relative_score)
+
+        # 切句时句间空白留在下一句开头，相邻的句子原样拼接才能保留英文句间的空格
+        parts = []
+        previous = None
+        for i in keep:
+            sentence = sentences[i]
+            if previous is None or i != previous + 1:
+                if previous is not None:
+                    parts.append(GAP_MARKER)
+                sentence = sentence.lstrip()
+            parts.append(sentence)
+            previous = i
+        return "".join(parts).rstrip()
+
+
+context_compressor = ContextCompressor()
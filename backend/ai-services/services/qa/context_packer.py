@@ -0,0 +1,130 @@
+import re
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from config.settings import settings
+from services.qa.token_estimator import TokenEstimator, token_estimator
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;\n])|(?<=\.)(?=\s)")
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点切句，切分后拼接还原原文"""
+    return [s for s in _SENTENCE_END.split(text) if s]
+
+
+@dataclass
+class PackedPassage:
+    index: int
+    content: str
+    tokens: int
+    trimmed: bool
+
+
+class ContextPacker:
+    """按相关度与token开销挑选并裁剪段落（分组背包）
+
+    每个段落的候选是按句子边界截取的前缀，价值为归一化分数乘以保留比例的平方根，
+    收益递减使预算更倾向覆盖更多高分段落而不是把一个段落放满；每个token再扣除token_cost，
+    低分段落和长段落的尾部即使放得下也不值得放入。
+    在token预算上做动态规划求净价值最大的组合，选中的段落保持原排名顺序。
+    """
+
+    def __init__(
+        self,
+        estimator: Optional[TokenEstimator] = None,
+        token_cost: Optional[float] = None,
+        overhead_tokens: int = 3
+    ):
+        self.estimator = estimator or token_estimator
+        self.token_cost = settings.CONTEXT_TOKEN_COST if token_cost is None else token_cost
+        self.overhead_tokens = overhead_tokens
+
+    def pack(
+        self,
+        results: List[Dict[str, Any]],
+        budget: int,
+        max_chars: Optional[List[int]] = None
+    ) -> List[PackedPassage]:
+        if not results or budget <= 0:
+            return []
+
+        values = self._normalized_scores(results)
+        options = [
+            self._options(r.get("content", ""), max_chars[i] if max_chars else None)
+            for i, r in enumerate(results)
+        ]
+
+        # dp[b]为已考虑段落在预算b内的最大价值；choice[i][b]记录段落i在预算b处选了哪个前缀（-1为不选）
+        dp = np.zeros(budget + 1)
+        choices = np.full((len(results), budget + 1), -1, dtype=np.int16)
+        for i, passage_options in enumerate(options):
+            best = dp.copy()
+            full_tokens = passage_options[-1][1] if passage_options else 0
+            for j, (_, tokens) in enumerate(passage_options):
+                if tokens <= 0:
+                    continue
+                weight = tokens + self.overhead_tokens
+                if weight > budget:
+                    break
+                gain = values[i] * np.sqrt(tokens / full_tokens) - self.token_cost * weight
+                if gain <= 0:
+                    continue
+                candidate = np.full(budget + 1, -np.inf)
+                candidate[weight:] = dp[:budget + 1 - weight] + gain
+                improved = candidate > best
+                best = np.where(improved, candidate, best)
+                choices[i][improved] = j
+            dp = best
+
+        packed = []
+        b = int(np.argmax(dp))
+        for i in range(len(results) - 1, -1, -1):
+            j = choices[i][b]
+            if j < 0:
+                continue
+            content, tokens = options[i][j]
+            packed.append(PackedPassage(
+                index=i,
+                content=content,
+                tokens=tokens,
+                trimmed=content != results[i].get("content", "").rstrip()
+            ))
+            b -= tokens + self.overhead_tokens
+
+        packed.reverse()
+        return packed
+
+    def _options(self, content: str, max_chars: Optional[int]) -> List[tuple]:
+        """逐句累积的前缀及其token数，超过max_chars的前缀不参与；首句即超长时在max_chars处硬截"""
+        options = []
+        prefix = ""
+        for sentence in split_sentences(content):
+            if max_chars and len(prefix) + len(sentence) > max_chars:
+                break
+            prefix += sentence
+            stripped = prefix.rstrip()
+            if stripped:
+                options.append((stripped, self.estimator.count(stripped)))
+
+        if not options and content.strip():
+            head = content[:max_chars] + "..." if max_chars and len(content) > max_chars else content
+            options.append((head, self.estimator.count(head)))
+        return options
+
+    @staticmethod
+    def _normalized_scores(results: List[Dict[str, Any]]) -> np.ndarray:
+        scores = np.array([float(r.get("score", r.get("_score", 0.0)) or 0.0) for r in results])
+        top = scores.max()
+        if top <= 0:
+            # 分数缺失或全为非正时按排名倒数
+            return 1.0 / np.arange(1, len(results) + 1)
+        return np.clip(scores / top, 0.0, None) + 1e-6
+
+
+context_packer = ContextPacker()
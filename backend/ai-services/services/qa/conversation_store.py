@@ -0,0 +1,188 @@
+import asyncio
+import copy
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from threading import Lock
+from typing import List, Dict, Any, Optional
+
+from config.settings import settings
+from services.cache.memory_cache import MemoryCache
+from services.cache.redis_cache import RedisCache, redis_cache
+from services.qa.context_packer import split_sentences
+from services.qa.token_estimator import TokenEstimator, token_estimator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ConversationState:
+    conversation_id: str
+    summary: List[str] = field(default_factory=list)
+    turns: List[Dict[str, str]] = field(default_factory=list)
+    folded: int = 0
+    history_text: str = ""
+    history_tokens: int = 0
+    updated_at: float = 0.0
+
+    @property
+    def message_count(self) -> int:
+        return self.folded + len(self.turns)
+
+
+class ConversationStore:
+    """服务端会话状态：进程内LRU + Redis两级，按conversation_id保存
+
+    保留最近几条消息原文，更早的消息折叠进滚动摘要（每条只留问题和回答首句，总长有上限），
+    写入时渲染好对话历史文本并计好token数，构建上下文时直接复用；渲染结果超过max_tokens时继续折叠，
+    max_tokens需小于ContextBuilder的历史预算（max_context_tokens的30%），长对话的历史不会被整段丢弃。
+    同一会话的读-改-写在进程内串行执行，流式回答与重试并发写入时不会丢失轮次。
+    """
+
+    KEY_PREFIX = "conversation:"
+    QUESTION_CHARS = 80
+    ANSWER_CHARS = 120
+
+    def __init__(
+        self,
+        memory: Optional[MemoryCache] = None,
+        redis: Optional[RedisCache] = None,
+        ttl: Optional[int] = None,
+        recent_messages: Optional[int] = None,
+        summary_max_chars: Optional[int] = None,
+        message_max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        estimator: Optional[TokenEstimator] = None
+    ):
+        self.ttl = ttl or settings.CONVERSATION_TTL
+        self.memory = memory or MemoryCache(max_size=settings.CONVERSATION_CACHE_SIZE, default_ttl=self.ttl)
+        self.redis = redis or redis_cache
+        self.recent_messages = recent_messages or settings.CONVERSATION_RECENT_MESSAGES
+        self.summary_max_chars = summary_max_chars or settings.CONVERSATION_SUMMARY_MAX_CHARS
+        self.message_max_chars = message_max_chars or settings.CONVERSATION_MESSAGE_MAX_CHARS
+        self.max_tokens = max_tokens or settings.CONVERSATION_HISTORY_MAX_TOKENS
+        self.estimator = estimator or token_estimator
+        self._lock = Lock()
+        self._conversation_locks: Dict[str, List[Any]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    async def get(self, conversation_id: str) -> Optional[ConversationState]:
+        key = f"{self.KEY_PREFIX}{conversation_id}"
+        data = self.memory.get(key)
+        if data is None and self.redis.is_connected:
+            data = await self.redis.get(key)
+            if data is not None:
+                self.memory.set(key, data, ttl=self.ttl)
+
+        with self._lock:
+            if data is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return ConversationState(**copy.deepcopy(data)) if data is not None else None
+
+    async def append(self, conversation_id: str, query: str, answer: str) -> ConversationState:
+        async with self._conversation_lock(conversation_id):
+            state = await self.get(conversation_id) or ConversationState(conversation_id=conversation_id)
+            state.turns.append({"role": "user", "content": query})
+            state.turns.append({"role": "assistant", "content": answer})
+            return await self._save(state)
+
+    async def replace(self, conversation_id: str, history: List[Dict[str, Any]]) -> ConversationState:
+        """客户端显式传入history时以它为准重建会话状态"""
+        turns = [
+            {"role": msg.get("role", "user"), "content": msg.get("content", "")}
+            for msg in history
+        ]
+        async with self._conversation_lock(conversation_id):
+            return await self._save(ConversationState(conversation_id=conversation_id, turns=turns))
+
+    async def delete(self, conversation_id: str):
+        key = f"{self.KEY_PREFIX}{conversation_id}"
+        self.memory.delete(key)
+        if self.redis.is_connected:
+            await self.redis.delete(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": self.memory.get_stats()["size"],
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0
+            }
+
+    @asynccontextmanager
+    async def _conversation_lock(self, conversation_id: str):
+        # 按会话ID加锁，最后一个等待者退出时移除，锁表大小只与并发中的会话数有关
+        entry = self._conversation_locks.get(conversation_id)
+        if entry is None:
+            entry = self._conversation_locks[conversation_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._conversation_locks[conversation_id]
+
+    async def _save(self, state: ConversationState) -> ConversationState:
+        self._fold(state, len(state.turns) - self.recent_messages)
+
+        state.history_text = self._render(state)
+        state.history_tokens = self.estimator.count(state.history_text)
+        # ContextBuilder整段丢弃超出历史预算的对话历史，这里继续折叠最早的原文、再裁掉最早的摘要，直到放得下
+        while state.history_tokens > self.max_tokens and (state.turns or state.summary):
+            if state.turns:
+                self._fold(state, 1)
+            else:
+                state.summary.pop(0)
+            state.history_text = self._render(state)
+            state.history_tokens = self.estimator.count(state.history_text)
+        state.updated_at = time.time()
+
+        key = f"{self.KEY_PREFIX}{state.conversation_id}"
+        data = asdict(state)
+        self.memory.set(key, data, ttl=self.ttl)
+        if self.redis.is_connected:
+            await self.redis.set(key, data, ttl=self.ttl)
+        return state
+
+    def _fold(self, state: ConversationState, count: int):
+        """把最早的count条原文消息折叠进摘要，摘要总长超过上限时丢弃最早的几行"""
+        if count <= 0:
+            return
+        for msg in state.turns[:count]:
+            state.summary.append(self._summarize(msg))
+        state.turns = state.turns[count:]
+        state.folded += count
+        while len(state.summary) > 1 and sum(len(line) for line in state.summary) > self.summary_max_chars:
+            state.summary.pop(0)
+
+    def _summarize(self, msg: Dict[str, str]) -> str:
+        content = " ".join(msg.get("content", "").split())
+        if msg.get("role") == "user":
+            return f"问: {_clip(content, self.QUESTION_CHARS)}"
+        sentences = split_sentences(content)
+        return f"答: {_clip(sentences[0].strip() if sentences else '', self.ANSWER_CHARS)}"
+
+    def _render(self, state: ConversationState) -> str:
+        lines = []
+        if state.summary:
+            lines.append("早前对话摘要:")
+            lines.extend(state.summary)
+        for msg in state.turns:
+            speaker = "用户" if msg.get("role") == "user" else "助手"
+            lines.append(f"{speaker}: {_clip(msg.get('content', ''), self.message_max_chars)}")
+        return "\n".join(lines)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+conversation_store = ConversationStore()
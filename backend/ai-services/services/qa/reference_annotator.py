@@ -13,7 +13,93 @@ class AnnotatedSegment:
     source_ids: List[str] = field(default_factory=list)
 
 
+class IncrementalAnnotator:
+    """流式引用标注
+
+    关键短语按末尾anchor_length个字符建哈希索引，每读入一个字符查一次索引，
+    候选短语再用endswith确认，回答只扫描一遍，与来源和短语数量无关；只保留最长短语长度的尾部窗口，
+    跨增量的短语同样能命中。每个来源的短语首次完整出现时在其后插入[n]；
+    标记紧跟的字符是"["时视为模型已自行标注而不插入，落在增量末尾的标记等下一段到达（或flush）再决定；
+    一旦出现模型自己的[n]引用，不再自动标注。
+    """
+
+    _TAIL = 8
+
+    def __init__(self, anchors: Dict[str, List[Tuple[str, int]]], anchor_length: int):
+        self.anchors = anchors
+        self.anchor_length = anchor_length
+        self.source_ids: List[str] = []
+        self._keep = max((len(p) for entries in anchors.values() for p, _ in entries), default=1) - 1
+        self._window = ""
+        self._cited = set()
+        self._pending = ""
+        self._tail = ""
+        self._disabled = not anchors
+
+    def feed(self, delta: str) -> str:
+        if not delta:
+            return ""
+        pending, self._pending = self._pending, ""
+        if pending and delta[0] != "[":
+            self._add(pending)
+        else:
+            pending = ""
+
+        if not self._disabled and ReferenceAnnotator.REFERENCE_PATTERN.search(self._tail + delta):
+            self._disabled = True
+        self._tail = (self._tail + delta)[-self._TAIL:]
+        if self._disabled:
+            return pending + delta
+
+        markers = self._match(delta)
+        if not markers:
+            return pending + delta
+
+        parts = [pending]
+        start = 0
+        for end in sorted(markers):
+            parts.append(delta[start:end])
+            if end == len(delta):
+                self._pending = markers[end]
+            elif delta[end] != "[":
+                parts.append(markers[end])
+                self._add(markers[end])
+            start = end
+        parts.append(delta[start:])
+        return "".join(parts)
+
+    def flush(self) -> str:
+        pending, self._pending = self._pending, ""
+        if pending:
+            self._add(pending)
+        return pending
+
+    def _match(self, delta: str) -> Dict[int, str]:
+        """返回{delta内的结束位置: 引用标记}"""
+        window = self._window + delta
+        base = len(self._window)
+        size = self.anchor_length
+        anchors = self.anchors
+        markers: Dict[int, str] = {}
+        for end in range(max(base + 1, size), len(window) + 1):
+            entries = anchors.get(window[end - size:end])
+            if entries is None:
+                continue
+            for phrase, index in entries:
+                if index not in self._cited and window.endswith(phrase, 0, end):
+                    self._cited.add(index)
+                    markers[end - base] = markers.get(end - base, "") + f"[{index}]"
+        self._window = window[-self._keep:] if self._keep else ""
+        return markers
+
+    def _add(self, markers: str):
+        for ref in ReferenceAnnotator.REFERENCE_PATTERN.findall(markers):
+            self.source_ids.append(f"[{ref}]")
+
+
 class ReferenceAnnotator:
+    """回答引用标注：各来源的句子和关键术语建成一个多模式索引，对回答只扫描一遍"""
+
     REFERENCE_PATTERN = re.compile(r'\[(\d+)\]')
     
     def __init__(
@@ -40,37 +126,30 @@ class ReferenceAnnotator:
         existing_refs = self._extract_existing_references(response)
         
         if existing_refs:
-            valid_refs = [ref for ref in existing_refs if int(ref) <= len(sources)]
+            valid_refs = [f"[{ref}]" for ref in existing_refs if 1 <= int(ref) <= len(sources)]
             return AnnotatedContent(
                 text=response,
                 source_ids=valid_refs
             )
         
-        annotated_text = response
-        used_sources: List[str] = []
-        
-        for i, source in enumerate(sources, 1):
-            source_id = f"[{i}]"
-            content = source.content
-            
-            key_phrases = self._extract_key_phrases(content)
-            
-            for phrase in key_phrases:
-                if len(phrase) >= self.min_match_length and phrase in annotated_text:
-                    annotated_text = annotated_text.replace(
-                        phrase,
-                        f"{phrase}{source_id}",
-                        1
-                    )
-                    if source_id not in used_sources:
-                        used_sources.append(source_id)
-                    break
+        annotator = self.stream(sources)
+        annotated_text = annotator.feed(response) + annotator.flush()
         
         return AnnotatedContent(
             text=annotated_text,
-            source_ids=used_sources
+            source_ids=annotator.source_ids
         )
     
+    def stream(self, sources: List[SourceReference]) -> "IncrementalAnnotator":
+        """为一次回答构建关键短语索引，返回逐段输入增量、即时插入引用标记的标注器"""
+        anchor_length = max(self.min_match_length, 1)
+        anchors: Dict[str, List[Tuple[str, int]]] = {}
+        for i, source in enumerate(sources, 1):
+            for phrase in self._extract_key_phrases(source.content):
+                if len(phrase) >= anchor_length:
+                    anchors.setdefault(phrase[-anchor_length:], []).append((phrase, i))
+        return IncrementalAnnotator(anchors, anchor_length)
+    
     def extract_references(
         self,
         text: str
@@ -125,7 +204,7 @@ class ReferenceAnnotator:
     
     def _extract_existing_references(self, text: str) -> List[str]:
         refs = self.REFERENCE_PATTERN.findall(text)
-        return list(set(refs))
+        return list(dict.fromkeys(refs))
     
     def _extract_key_phrases(self, content: str) -> List[str]:
         phrases = []
@@ -139,7 +218,7 @@ class ReferenceAnnotator:
         key_terms = re.findall(r'[\u4e00-\u9fa5]{2,8}(?:技术|系统|方法|功能|模块|服务|组件)', content)
         phrases.extend(key_terms)
         
-        return list(set(phrases))
+        return list(dict.fromkeys(phrases))
     
     def _calculate_similarity(self, text1: str, text2: str) -> float:
         if not text1 or not text2:
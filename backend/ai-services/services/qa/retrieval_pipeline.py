@@ -0,0 +1,263 @@
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Awaitable
+
+from config.settings import settings
+from models.qa_models import GraphContext
+from services.search.rrf_fusion import rrf_fusion
+from services.search.reranker import reranker_service
+from services.search.passage_refiner import passage_refiner
+from services.qa.context_compressor import context_compressor
+from services.cache.search_cache import search_cache, copy_results
+from services.cache.semantic_cache import semantic_cache
+from services.embedding.milvus_client import milvus_client
+from services.embedding.es_client import es_client
+from services.embedding.qwen_embedding import qwen_embedding
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """记录各阶段耗时(ms)，并发执行的阶段各自计时"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    async def run(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self._record(name, start)
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start)
+
+    def _record(self, name: str, start: float):
+        self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+@dataclass
+class RetrievalOutput:
+    results: List[Dict[str, Any]]
+    graph_context: Optional[GraphContext] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    compression_ratio: Optional[float] = None
+
+
+async def gather_or_cancel(*awaitables: Awaitable[Any]) -> List[Any]:
+    """并发执行，任一失败或外层被取消时取消其余任务"""
+    tasks = [asyncio.ensure_future(a) for a in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+class RetrievalPipeline:
+    """问答检索的阶段DAG，chat、chat_stream与simple_chat共用
+
+    关键词检索与"查询向量化→向量检索"并行，融合后重排序与图谱上下文并行
+    （图谱上下文由查询实体链接和融合结果前几条的chunk->实体索引得到，不等待重排序），
+    最后合并相邻块并做MMR。
+    端到端耗时约为最长路径，而不是各阶段之和。
+    """
+
+    GRAPH_SEED_COUNT = 5
+    GRAPH_ENTITY_LIMIT = 30
+    GRAPH_RELATION_LIMIT = 20
+
+    async def run(
+        self,
+        query: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        keyword_top_k: int = 50,
+        vector_top_k: int = 50,
+        use_rerank: bool = False,
+        rerank_mode: Optional[str] = None,
+        use_graph: bool = False,
+        compress: Optional[bool] = None,
+        timer: Optional[StageTimer] = None
+    ) -> RetrievalOutput:
+        timer = timer or StageTimer()
+        candidate_k = top_k * settings.MMR_CANDIDATE_FACTOR
+
+        fused_results = await timer.run("retrieval", self.retrieve_fused(
+            query=query,
+            keyword_top_k=keyword_top_k,
+            vector_top_k=vector_top_k,
+            filters=filters,
+            top_k=None if use_rerank else candidate_k,
+            timer=timer
+        ))
+
+        async def ranked() -> List[Dict[str, Any]]:
+            if not (use_rerank and fused_results):
+                return fused_results[:candidate_k]
+            return await timer.run("rerank", reranker_service.rerank(
+                query=query,
+                documents=fused_results,
+                top_n=candidate_k,
+                mode=rerank_mode
+            ))
+
+        async def graph() -> Optional[GraphContext]:
+            if not use_graph:
+                return None
+            try:
+                return await timer.run(
+                    "graph", self.build_graph_context(query, fused_results[:self.GRAPH_SEED_COUNT])
+                )
+            except Exception as e:
+                logger.warning(f"Graph context build failed: {e}")
+                return None
+
+        ranked_results, graph_context = await gather_or_cancel(ranked(), graph())
+
+        results = await timer.run("passages", passage_refiner.refine(ranked_results, top_k))
+
+        compression_ratio = None
+        if compress is None:
+            compress = settings.CONTEXT_COMPRESSION_ENABLED
+        if compress:
+            with timer.measure("compression"):
+                results, report = context_compressor.compress(query, results)
+            compression_ratio = report.ratio
+
+        return RetrievalOutput(
+            results=results,
+            graph_context=graph_context,
+            timings=timer.timings,
+            compression_ratio=compression_ratio
+        )
+
+    async def retrieve_fused(
+        self,
+        query: str,
+        keyword_top_k: int,
+        vector_top_k: int,
+        filters: Optional[Dict[str, Any]] = None,
+        top_k: Optional[int] = None,
+        timer: Optional[StageTimer] = None
+    ) -> List[Dict[str, Any]]:
+        timer = timer or StageTimer()
+        params = {
+            "filters": filters,
+            "keyword_top_k": keyword_top_k,
+            "vector_top_k": vector_top_k,
+            "top_k": top_k
+        }
+
+        async def retrieve_and_fuse() -> List[Dict[str, Any]]:
+            start_time = time.time()
+            # 关键词检索与查询向量化并行，语义缓存命中时直接丢弃关键词检索结果
+            keyword_task = asyncio.create_task(timer.run(
+                "keyword_search",
+                es_client.search_async(query=query, top_k=keyword_top_k, filters=filters, lean=True)
+            ))
+            try:
+                query_vector = await timer.run("embedding", qwen_embedding.embed_single(query))
+                generation = await search_cache.generation()
+
+                cached = semantic_cache.lookup("qa", query_vector, generation, **params)
+                if cached is not None:
+                    keyword_task.cancel()
+                    return cached
+
+                vector_results = await timer.run("vector_search", milvus_client.search_async(
+                    query_vector=query_vector,
+                    top_k=vector_top_k,
+                    filters=filters
+                ))
+                keyword_results = await keyword_task
+            except BaseException:
+                keyword_task.cancel()
+                raise
+
+            with timer.measure("fusion"):
+                fused_results = rrf_fusion.fuse(keyword_results, vector_results, top_k=top_k)
+            semantic_cache.store(
+                "qa",
+                query_vector,
+                fused_results,
+                generation,
+                cost_ms=(time.time() - start_time) * 1000,
+                **params
+            )
+            return fused_results
+
+        fused_results, _ = await search_cache.get_or_compute(
+            "qa",
+            query,
+            retrieve_and_fuse,
+            filters=filters,
+            keyword_top_k=keyword_top_k,
+            vector_top_k=vector_top_k,
+            top_k=top_k
+        )
+        return copy_results(fused_results)
+
+    async def build_graph_context(
+        self,
+        query: str,
+        search_results: List[Dict[str, Any]]
+    ) -> Optional[GraphContext]:
+        """查询中链接到的实体作为种子，加上命中chunk在图库中关联的实体，再一次Cypher取实体间的关系"""
+        from services.kg.graph.chunk_entity_index import chunk_entity_index
+        from services.kg.graph.entity_linker import entity_linker
+        from services.kg.graph.relation_repository import relation_repository
+
+        entity_linker.schedule_refresh()
+        seed_ids = list(dict.fromkeys(m.entity_id for m in entity_linker.link(query)))
+        chunk_entities = await chunk_entity_index.lookup(
+            [(r.get("doc_id"), r.get("chunk_id")) for r in search_results],
+            limit=self.GRAPH_ENTITY_LIMIT
+        )
+        entity_ids = list(dict.fromkeys(seed_ids + [e["id"] for e in chunk_entities]))[:self.GRAPH_ENTITY_LIMIT]
+        if not entity_ids:
+            return GraphContext()
+
+        relations = await relation_repository.get_relations_among(
+            entity_ids, limit=self.GRAPH_RELATION_LIMIT, seed_ids=seed_ids
+        )
+
+        indexed = {e["id"]: e for e in chunk_entities}
+        entities = [indexed.get(e) or entity_linker.get(e) for e in entity_ids[:10]]
+
+        return GraphContext(
+            entities=[e for e in entities if e],
+            relations=relations[:10],
+            paths=_chain_paths(relations)[:3]
+        )
+
+
+def _chain_paths(relations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """把首尾相接的两条关系连成两跳路径"""
+    outgoing: Dict[str, List[Dict[str, Any]]] = {}
+    for relation in relations:
+        outgoing.setdefault(relation.get("head_id"), []).append(relation)
+
+    paths = []
+    for first in relations:
+        for second in outgoing.get(first.get("tail_id"), []):
+            if second.get("tail_id") == first.get("head_id"):
+                continue
+            paths.append({
+                "nodes": [{"name": first.get("head")}, {"name": first.get("tail")}, {"name": second.get("tail")}],
+                "relations": [first.get("type"), second.get("type")]
+            })
+    return paths
+
+
+retrieval_pipeline = RetrievalPipeline()
@@ -0,0 +1,123 @@
+import asyncio
+import json
+from json.encoder import encode_basestring
+from typing import AsyncIterator, Any, List, Optional
+
+from models.qa_models import SourceReference
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class SSEEncoder:
+    """SSE帧编码器
+
+    文本帧是流式输出中数量最多的帧，按固定模板拼接，只对内容做一次C实现的字符串转义，
+    不再为每个增量构建pydantic对象。帧内只保留前端用到的字段。
+    """
+
+    TEXT_PREFIX = 'data: {"type":"text","content":'
+    SOURCE_PREFIX = 'data: {"type":"source","source":'
+    FRAME_SUFFIX = "}\n\n"
+    DONE = 'data: {"type":"done","done":true}\n\n'
+
+    def text(self, content: str) -> str:
+        return self.TEXT_PREFIX + encode_basestring(content) + self.FRAME_SUFFIX
+
+    def source(self, source: SourceReference) -> str:
+        return self.SOURCE_PREFIX + source.model_dump_json() + self.FRAME_SUFFIX
+
+    def error(self, message: str) -> str:
+        return self.event("error", error=message)
+
+    def event(self, event_type: str, **fields: Any) -> str:
+        return "data: " + _json_encoder.encode({"type": event_type, **fields}) + "\n\n"
+
+
+async def coalesce_deltas(
+    deltas: AsyncIterator[str],
+    window_ms: float,
+    max_chars: int
+) -> AsyncIterator[str]:
+    """合并增量文本，缓冲达到max_chars或首个增量已等待window_ms时输出一次
+
+    上游由一个后台任务持续读入缓冲区，输出端按时间窗口等待，上游停顿也能按时发出已有文本；
+    每路流只创建一个任务，不为单个增量创建任务或计时器。
+    """
+    if window_ms <= 0 or max_chars <= 1:
+        try:
+            async for delta in deltas:
+                yield delta
+        finally:
+            await _aclose(deltas)
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    buffer: List[str] = []
+    size = 0
+    deadline = 0.0
+    finished = False
+    error: Optional[BaseException] = None
+    waiter: Optional[asyncio.Future] = None
+
+    def wake():
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def read():
+        nonlocal size, deadline, finished, error
+        try:
+            async for delta in deltas:
+                if not delta:
+                    continue
+                if not buffer:
+                    deadline = loop.time() + window
+                    wake()
+                buffer.append(delta)
+                size += len(delta)
+                if size >= max_chars:
+                    wake()
+        except Exception as e:
+            error = e
+        finally:
+            finished = True
+            wake()
+
+    reader = asyncio.ensure_future(read())
+    try:
+        while True:
+            if not buffer and not finished:
+                waiter = loop.create_future()
+                await waiter
+            if size < max_chars and not finished:
+                # 等到窗口到期、缓冲写满或上游结束，由reader或定时器唤醒
+                waiter = loop.create_future()
+                timer = loop.call_at(deadline, wake)
+                await waiter
+                timer.cancel()
+
+            if buffer:
+                text = "".join(buffer)
+                buffer.clear()
+                size = 0
+                yield text
+            if finished and not buffer:
+                break
+
+        if error is not None:
+            raise error
+    finally:
+        # 下游关闭时取消读取任务并等它退出，上游随之关闭
+        if not reader.done():
+            reader.cancel()
+            await asyncio.wait((reader,))
+        await _aclose(deltas)
+
+
+async def _aclose(deltas: AsyncIterator[str]):
+    aclose = getattr(deltas, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+sse_encoder = SSEEncoder()
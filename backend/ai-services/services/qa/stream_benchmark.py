@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import time
+from typing import AsyncGenerator, List, Dict, Any, Optional
+
+from models.qa_models import SourceReference, StreamChunk
+from services.qa.stream_handler import SSEStreamHandler
+
+TOKENS = ["知识", "图谱", "是", "一种", "结构化", "的", "语义", "网络", "，", "用于", "描述", "实体", "之间", "的关系", "。", " RAG", " ", "检索"]
+
+
+def generate_sources(count: int = 5) -> List[SourceReference]:
+    return [
+        SourceReference(
+            source_id=f"[{i + 1}]",
+            doc_id=f"doc{i}",
+            chunk_id=f"chunk{i}",
+            content=f"来源片段 {i} " * 20,
+            score=1.0 - i * 0.1
+        )
+        for i in range(count)
+    ]
+
+
+async def fake_deltas(tokens: int, interval_ms: float = 0.0) -> AsyncGenerator[str, None]:
+    """模拟LLM增量输出，每个token之间让出一次事件循环"""
+    interval = interval_ms / 1000
+    for i in range(tokens):
+        await asyncio.sleep(interval)
+        yield TOKENS[i % len(TOKENS)]
+
+
+class _FakeLLMStreamHandler(SSEStreamHandler):
+
+    def __init__(self, tokens: int, interval_ms: float):
+        super().__init__()
+        self.api_key = "benchmark"
+        self.tokens = tokens
+        self.interval_ms = interval_ms
+
+    def _call_llm_stream(self, messages):
+        return fake_deltas(self.tokens, self.interval_ms)
+
+
+async def reference_stream(
+    tokens: int,
+    sources: List[SourceReference],
+    interval_ms: float = 0.0
+) -> AsyncGenerator[str, None]:
+    """改造前的实现：每个增量一个pydantic帧，来源在生成结束后发送，作为基准"""
+    async for delta in fake_deltas(tokens, interval_ms):
+        yield f"data: {StreamChunk(type='text', content=delta).model_dump_json()}\n\n"
+    for source in sources:
+        yield f"data: {StreamChunk(type='source', source=source).model_dump_json()}\n\n"
+    yield f"data: {StreamChunk(type='done', done=True).model_dump_json()}\n\n"
+
+
+async def _drain(reader: asyncio.StreamReader) -> int:
+    received = 0
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return received
+        received += len(data)
+
+
+async def _consume(stream: AsyncGenerator[str, None]) -> Dict[str, int]:
+    """像ASGI服务器一样把每帧编码后写入本地socket，对端持续读取，计入每帧的系统调用开销"""
+    server_sock, client_sock = socket.socketpair()
+    _, writer = await asyncio.open_connection(sock=server_sock)
+    reader, client_writer = await asyncio.open_connection(sock=client_sock)
+    drain = asyncio.ensure_future(_drain(reader))
+
+    frames = 0
+    try:
+        async for frame in stream:
+            frames += 1
+            writer.write(frame.encode("utf-8"))
+            await writer.drain()
+    finally:
+        writer.close()
+        received = await drain
+        client_writer.close()
+    return {"frames": frames, "bytes": received}
+
+
+async def _run_mode(make_stream, streams: int) -> Dict[str, Any]:
+    start = time.perf_counter()
+    stats = await asyncio.gather(*(_consume(make_stream()) for _ in range(streams)))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return {
+        "elapsed_ms": round(elapsed_ms, 1),
+        "frames": sum(s["frames"] for s in stats),
+        "bytes": sum(s["bytes"] for s in stats)
+    }
+
+
+async def run_benchmark(
+    streams: int = 1000,
+    tokens: int = 200,
+    interval_ms: float = 0.0,
+    source_count: int = 5
+) -> Dict[str, Any]:
+    """并发streams路流式输出，对比基准实现、快速编码和快速编码+合并三种模式"""
+    sources = generate_sources(source_count)
+    handler = _FakeLLMStreamHandler(tokens, interval_ms)
+
+    modes = {
+        "reference": lambda: reference_stream(tokens, sources, interval_ms),
+        "encoder": lambda: handler.stream_generate("q", "", sources, coalesce=False),
+        "coalesced": lambda: handler.stream_generate("q", "", sources, coalesce=True)
+    }
+
+    report: Dict[str, Any] = {
+        "streams": streams,
+        "tokens_per_stream": tokens,
+        "interval_ms": interval_ms
+    }
+    for name, make_stream in modes.items():
+        result = await _run_mode(make_stream, streams)
+        result["tokens_per_s"] = round(streams * tokens / result["elapsed_ms"] * 1000)
+        report[name] = result
+
+    reference_ms = report["reference"]["elapsed_ms"]
+    report["speedup"] = {
+        name: round(reference_ms / report[name]["elapsed_ms"], 2)
+        for name in ("encoder", "coalesced")
+    }
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="SSE流式输出并发吞吐基准")
+    parser.add_argument("--streams", type=int, default=1000)
+    parser.add_argument("--tokens", type=int, default=200, help="每路输出的增量数")
+    parser.add_argument("--interval-ms", type=float, default=0.0, help="模拟的token间隔")
+    args = parser.parse_args(argv)
+    # 每路流都会打一条开始日志，压测时关闭
+    logging.getLogger("services.qa.stream_handler").setLevel(logging.WARNING)
+
+    report = asyncio.run(run_benchmark(args.streams, args.tokens, args.interval_ms))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
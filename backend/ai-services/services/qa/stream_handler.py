@@ -1,13 +1,19 @@
+import asyncio
+import hashlib
 import httpx
 import json
 import logging
 import re
-from typing import AsyncGenerator, List, Dict, Any, Optional
+import time
+from typing import AsyncGenerator, List, Dict, Any, Optional, Tuple, Callable, Awaitable
 from dataclasses import dataclass
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from config.settings import settings
-from models.qa_models import SourceReference, StreamChunk
+from models.qa_models import SourceReference
+from services.cache.answer_cache import answer_cache
+from services.qa.sse_encoder import sse_encoder, coalesce_deltas
+from services.qa.reference_annotator import IncrementalAnnotator, reference_annotator
 
 logger = logging.getLogger(__name__)
 
@@ -21,10 +27,58 @@ class LLMConfig:
     timeout: float = 60.0
 
 
+class StreamStats:
+    """流式请求统计
+
+    客户端断开导致生成中止时，按已完成生成的平均输出长度减去已生成部分估算节省的输出token；
+    还没有完成过的生成时不做估算。
+    """
+
+    CHARS_PER_TOKEN = 2
+
+    def __init__(self):
+        self.completed = 0
+        self.cancelled = 0
+        self.disconnected = 0
+        self.replayed = 0
+        self.output_tokens = 0
+        self.cancelled_tokens = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, chars: int):
+        self.completed += 1
+        self.output_tokens += chars // self.CHARS_PER_TOKEN
+
+    def record_cancelled(self, chars: int):
+        generated = chars // self.CHARS_PER_TOKEN
+        self.cancelled += 1
+        self.cancelled_tokens += generated
+        if self.completed:
+            self.tokens_saved += max(self.output_tokens // self.completed - generated, 0)
+
+    def record_disconnect(self):
+        self.disconnected += 1
+
+    def record_replayed(self):
+        self.replayed += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "cancelled_generations": self.cancelled,
+            "disconnected_requests": self.disconnected,
+            "cached_replays": self.replayed,
+            "avg_output_tokens": self.output_tokens // self.completed if self.completed else 0,
+            "tokens_generated_before_cancel": self.cancelled_tokens,
+            "estimated_tokens_saved": self.tokens_saved
+        }
+
+
 class SSEStreamHandler:
     def __init__(self, config: Optional[LLMConfig] = None):
         self.config = config or LLMConfig()
         self.api_key = settings.QWEN_API_KEY
+        self.stats = StreamStats()
     
     async def stream_generate(
         self,
@@ -32,66 +86,169 @@ class SSEStreamHandler:
         context: str,
         sources: List[SourceReference],
         system_prompt: str = None,
-        history: List[Dict[str, str]] = None
+        history: List[Dict[str, str]] = None,
+        coalesce: Optional[bool] = None,
+        on_generated: Optional[Callable[[float], None]] = None,
+        annotate: Optional[bool] = None,
+        on_answer: Optional[Callable[[str], Awaitable[Any]]] = None
     ) -> AsyncGenerator[str, None]:
         logger.info(f"Starting stream generation for query: {query[:50]}...")
         
         if not self.api_key:
-            yield self._format_sse(StreamChunk(
-                type="error",
-                error="LLM API key not configured"
-            ))
+            yield sse_encoder.error("LLM API key not configured")
             return
         
         messages = self._build_messages(query, context, system_prompt, history)
+        if coalesce is None:
+            coalesce = settings.SSE_COALESCE_ENABLED
+        if annotate is None:
+            annotate = settings.SSE_ANNOTATE_REFERENCES
+        annotator = reference_annotator.stream(sources) if annotate and sources else None
         
+        deltas = None
+        parts: List[str] = []
+        generated = 0
+        finished = False
         try:
-            async for chunk in self._call_llm_stream(messages):
-                yield chunk
+            # 来源在检索阶段已确定，先于首个token发出，前端可以边生成边展示引用
+            for source in sources:
+                yield sse_encoder.source(source)
             
-            yield self._format_sse(StreamChunk(
-                type="source",
-                source=sources[0] if sources else None
-            ))
+            cache_key, cached, versions = await self._lookup_answer(query, context, sources, system_prompt, history)
+            if cached is not None:
+                finished = True
+                self.stats.record_replayed()
+                if on_answer is not None:
+                    await on_answer(cached)
+                async for frame in self._replay(cached, annotator):
+                    yield frame
+                return
             
-            for source in sources:
-                yield self._format_sse(StreamChunk(
-                    type="source",
-                    source=source
-                ))
+            start = time.perf_counter()
+            deltas = self._call_llm_stream(messages)
+            if coalesce:
+                deltas = coalesce_deltas(
+                    deltas,
+                    window_ms=settings.SSE_COALESCE_WINDOW_MS,
+                    max_chars=settings.SSE_COALESCE_MAX_CHARS
+                )
+            
+            async for text in deltas:
+                generated += len(text)
+                parts.append(text)
+                # 缓存保存未标注的原文，非流式接口与回放各自标注
+                if annotator is not None:
+                    text = annotator.feed(text)
+                yield sse_encoder.text(text)
             
-            yield self._format_sse(StreamChunk(
-                type="done",
-                done=True
-            ))
+            if annotator is not None:
+                tail = annotator.flush()
+                if tail:
+                    yield sse_encoder.text(tail)
+            
+            finished = True
+            self.stats.record_completed(generated)
+            if on_generated is not None:
+                on_generated((time.perf_counter() - start) * 1000)
+            answer = "".join(parts)
+            if cache_key is not None:
+                await answer_cache.set(cache_key, answer, versions)
+            if on_answer is not None:
+                await on_answer(answer)
+            yield sse_encoder.DONE
             
         except Exception as e:
+            finished = True
             logger.error(f"Stream generation error: {e}")
-            yield self._format_sse(StreamChunk(
-                type="error",
-                error=str(e)
-            ))
+            yield sse_encoder.error(str(e))
+        finally:
+            # 被取消或提前关闭时主动关闭上游，断开到DashScope的HTTP流，不再为无人读取的token付费
+            if deltas is not None:
+                await deltas.aclose()
+            if not finished:
+                self.stats.record_cancelled(generated)
+                logger.info(f"Stream generation cancelled after {generated} chars")
     
     async def generate(
         self,
         query: str,
         context: str,
         system_prompt: str = None,
-        history: List[Dict[str, str]] = None
+        history: List[Dict[str, str]] = None,
+        sources: Optional[List[SourceReference]] = None,
+        on_generated: Optional[Callable[[float], None]] = None
     ) -> str:
+        """非流式生成；on_generated在实际调用LLM后以生成耗时(ms)回调，命中回答缓存时不回调"""
         logger.info(f"Starting non-stream generation for query: {query[:50]}...")
         
         if not self.api_key:
             raise ValueError("LLM API key not configured")
         
+        cache_key, cached, versions = await self._lookup_answer(query, context, sources, system_prompt, history)
+        if cached is not None:
+            return cached
+        
         messages = self._build_messages(query, context, system_prompt, history)
         
+        start = time.perf_counter()
         try:
             response_text = await self._call_llm(messages)
-            return response_text
         except Exception as e:
             logger.error(f"Generation error: {e}")
             raise
+        if on_generated is not None:
+            on_generated((time.perf_counter() - start) * 1000)
+        
+        if cache_key is not None:
+            await answer_cache.set(cache_key, response_text, versions)
+        return response_text
+    
+    async def _lookup_answer(
+        self,
+        query: str,
+        context: str,
+        sources: Optional[List[SourceReference]],
+        system_prompt: Optional[str],
+        history: Optional[List[Dict[str, str]]]
+    ) -> Tuple[Optional[str], Optional[str], Dict[str, int]]:
+        """返回(缓存键, 缓存回答, 贡献文档版本)；没有来源的回答不缓存，新文档入库后它可能不再成立
+
+        对话历史和图谱上下文经context进入提示，同一组chunk可能对应不同提示，键中同时包含上下文文本的摘要。
+        """
+        if not sources or not answer_cache.enabled:
+            return None, None, {}
+        
+        cache_key = answer_cache.make_key(
+            query,
+            [(s.doc_id, s.chunk_id) for s in sources],
+            context=hashlib.sha1(context.encode("utf-8")).hexdigest(),
+            model=self.config.model,
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+            system_prompt=system_prompt or "",
+            history=history[-6:] if history else []
+        )
+        cached = await answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Answer cache hit for query: {query[:50]}...")
+            return cache_key, cached, {}
+        return cache_key, None, await answer_cache.versions(s.doc_id for s in sources)
+    
+    async def _replay(
+        self,
+        answer: str,
+        annotator: Optional[IncrementalAnnotator] = None
+    ) -> AsyncGenerator[str, None]:
+        """把缓存的回答按合并后的帧大小切分，模拟流式输出"""
+        step = max(settings.SSE_COALESCE_MAX_CHARS, 1)
+        for start in range(0, len(answer), step):
+            text = answer[start:start + step]
+            yield sse_encoder.text(annotator.feed(text) if annotator is not None else text)
+            await asyncio.sleep(0)
+        tail = annotator.flush() if annotator is not None else ""
+        if tail:
+            yield sse_encoder.text(tail)
+        yield sse_encoder.DONE
     
     def _build_messages(
         self,
@@ -144,8 +301,10 @@ class SSEStreamHandler:
         self,
         messages: List[Dict[str, str]]
     ) -> AsyncGenerator[str, None]:
+        # 使用client.stream逐行读取，退出上下文即关闭连接；client.post会先读完整个响应体
         async with httpx.AsyncClient(timeout=self.config.timeout) as client:
-            response = await client.post(
+            async with client.stream(
+                "POST",
                 self.config.api_url,
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
@@ -160,34 +319,30 @@ class SSEStreamHandler:
                     "stream": True,
                     "incremental_output": True
                 }
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"LLM API error: {response.status_code} - {response.text}")
-            
-            buffer = ""
-            async for line in response.aiter_lines():
-                if not line:
-                    continue
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise Exception(f"LLM API error: {response.status_code} - {response.text}")
                 
-                if line.startswith("data:"):
-                    data_str = line[5:].strip()
-                    if data_str == "[DONE]":
-                        break
-                    
-                    try:
-                        data = json.loads(data_str)
-                        choices = data.get("choices", [])
-                        if choices:
-                            delta = choices[0].get("message", {})
-                            content = delta.get("content", "")
-                            if content:
-                                yield self._format_sse(StreamChunk(
-                                    type="text",
-                                    content=content
-                                ))
-                    except json.JSONDecodeError:
+                async for line in response.aiter_lines():
+                    if not line:
                         continue
+                    
+                    if line.startswith("data:"):
+                        data_str = line[5:].strip()
+                        if data_str == "[DONE]":
+                            break
+                        
+                        try:
+                            data = json.loads(data_str)
+                            choices = data.get("choices", [])
+                            if choices:
+                                delta = choices[0].get("message", {})
+                                content = delta.get("content", "")
+                                if content:
+                                    yield content
+                        except json.JSONDecodeError:
+                            continue
     
     @retry(
         stop=stop_after_attempt(3),
@@ -217,9 +372,6 @@ class SSEStreamHandler:
             if choices:
                 return choices[0].get("message", {}).get("content", "")
             return ""
-    
-    def _format_sse(self, chunk: StreamChunk) -> str:
-        return f"data: {chunk.model_dump_json()}\n\n"
 
 
 sse_stream_handler = SSEStreamHandler()
@@ -0,0 +1,55 @@
+import logging
+import math
+import re
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_CJK_RANGES = r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK = re.compile(f"[{_CJK_RANGES}]")
+_WORD = re.compile(r"[A-Za-z]+")
+_DIGIT = re.compile(r"\d")
+_SYMBOL = re.compile(rf"[^\sA-Za-z\d{_CJK_RANGES}]")
+
+
+class TokenEstimator:
+    """Qwen模型的token计数
+
+    dashscope自带Qwen词表，安装tiktoken后用它精确计数；否则按字符类别估算：
+    约1.5个汉字一个token，英文单词每4个字母一个token且至少一个，数字逐位计数，标点符号各一个。
+    """
+
+    CJK_CHARS_PER_TOKEN = 1.5
+    LETTERS_PER_TOKEN = 4
+
+    def __init__(self, model: str = "qwen-max", use_tokenizer: bool = True):
+        self.model = model
+        self._tokenizer = self._load_tokenizer() if use_tokenizer else None
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text))
+
+        tokens = len(_CJK.findall(text)) / self.CJK_CHARS_PER_TOKEN
+        tokens += sum(math.ceil(len(w) / self.LETTERS_PER_TOKEN) for w in _WORD.findall(text))
+        tokens += len(_DIGIT.findall(text)) + len(_SYMBOL.findall(text))
+        return math.ceil(tokens)
+
+    def _load_tokenizer(self) -> Optional[object]:
+        try:
+            from dashscope import get_tokenizer
+            return get_tokenizer(self.model)
+        except ImportError:
+            logger.info("tiktoken not installed, using heuristic token estimation")
+        except Exception as e:
+            logger.warning(f"Failed to load Qwen tokenizer, using heuristic token estimation: {e}")
+        return None
+
+
+token_estimator = TokenEstimator()
@@ -1,9 +1,15 @@
 from services.search.rrf_fusion import RRFFusion, rrf_fusion
 from services.search.reranker import RerankerService, reranker_service
+from services.search.local_reranker import LocalReranker, local_reranker
+from services.search.passage_refiner import PassageRefiner, passage_refiner
 
 __all__ = [
     "RRFFusion",
     "rrf_fusion",
     "RerankerService",
     "reranker_service",
+    "LocalReranker",
+    "local_reranker",
+    "PassageRefiner",
+    "passage_refiner",
 ]
@@ -0,0 +1,101 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from services.search.rrf_fusion import RRFFusion
+
+
+def generate_sources(
+    source_count: int,
+    candidates: int,
+    overlap: float = 0.5,
+    seed: int = 42
+) -> Dict[str, List[Dict[str, Any]]]:
+    """生成多路排序结果，各路之间按overlap比例共享chunk"""
+    rng = np.random.default_rng(seed)
+    pool = int(candidates * source_count * (1 - overlap)) + candidates
+
+    sources = {}
+    for i in range(source_count):
+        picks = rng.choice(pool, size=candidates, replace=False)
+        sources[f"source{i}"] = [
+            {
+                "doc_id": f"doc{p // 8}",
+                "chunk_id": f"chunk{p}",
+                "content": f"content {p}",
+                "score": float(candidates - rank)
+            }
+            for rank, p in enumerate(picks)
+        ]
+    return sources
+
+
+def reference_fuse(sources: Dict[str, List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """逐条复制并全量排序的朴素实现，作为基准"""
+    scores = defaultdict(float)
+    result_map = {}
+    for results in sources.values():
+        for rank, result in enumerate(results, 1):
+            key = (result["doc_id"], result["chunk_id"])
+            scores[key] += 1.0 / (k + rank)
+            if key not in result_map:
+                result_map[key] = result.copy()
+
+    return sorted(
+        [{"rrf_score": v, **result_map[key]} for key, v in scores.items()],
+        key=lambda x: x["rrf_score"],
+        reverse=True
+    )
+
+
+def run_benchmark(
+    source_count: int = 4,
+    candidates: int = 10000,
+    top_k: int = 50,
+    repeat: int = 5,
+    k: int = 60
+) -> Dict[str, Any]:
+    sources = generate_sources(source_count, candidates)
+    fusion = RRFFusion(k=k)
+
+    def timed(func) -> float:
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            durations.append((time.perf_counter() - start) * 1000)
+        return round(float(np.median(durations)), 3)
+
+    reference_ms = timed(lambda: reference_fuse(sources, k)[:top_k])
+    fused_ms = timed(lambda: fusion.fuse_many(sources, top_k=top_k))
+
+    return {
+        "sources": source_count,
+        "candidates_per_source": candidates,
+        "top_k": top_k,
+        "reference_ms": reference_ms,
+        "fuse_many_ms": fused_ms,
+        "speedup": round(reference_ms / fused_ms, 2) if fused_ms else 0.0
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="多路RRF融合性能基准")
+    parser.add_argument("--sources", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=10000, help="每路候选数量")
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sources, args.candidates, args.top_k, args.repeat)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
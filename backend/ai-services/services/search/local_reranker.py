@@ -0,0 +1,123 @@
+import logging
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from services.embedding.bm25_store import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class LocalReranker:
+    """纯CPU的词法特征重排序器
+
+    在候选集内计算BM25词项重合、查询二元组覆盖率和相邻词项邻近度三类特征并加权，
+    作为远程重排序接口不可用时的兜底，也作为重排序延迟与效果的基线。
+    """
+
+    def __init__(
+        self,
+        bm25_weight: float = 0.5,
+        coverage_weight: float = 0.3,
+        proximity_weight: float = 0.2,
+        k1: float = 1.2,
+        b: float = 0.75,
+        window: int = 3
+    ):
+        self.bm25_weight = bm25_weight
+        self.coverage_weight = coverage_weight
+        self.proximity_weight = proximity_weight
+        self.k1 = k1
+        self.b = b
+        self.window = window
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        query_tokens = tokenize(query)
+        terms = list(dict.fromkeys(query_tokens))
+        if not texts or not terms:
+            return np.zeros(len(texts), dtype=np.float32)
+
+        term_index = {term: j for j, term in enumerate(terms)}
+        counts = np.zeros((len(texts), len(terms)), dtype=np.float32)
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        proximity = np.zeros(len(texts), dtype=np.float32)
+        pairs = list(zip(query_tokens, query_tokens[1:]))
+
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[i] = len(tokens)
+            positions = defaultdict(list)
+            for pos, token in enumerate(tokens):
+                j = term_index.get(token)
+                if j is not None:
+                    counts[i, j] += 1
+                    positions[token].append(pos)
+            if pairs:
+                proximity[i] = self._pair_proximity(pairs, positions)
+
+        present = counts > 0
+        df = present.sum(axis=0)
+        n = len(texts)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        avgdl = float(lengths.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+        bm25 = (idf * counts * (self.k1 + 1) / (counts + norm[:, None])).sum(axis=1)
+        peak = bm25.max()
+        if peak > 0:
+            bm25 = bm25 / peak
+
+        coverage = present.mean(axis=1)
+
+        return (
+            self.bm25_weight * bm25
+            + self.coverage_weight * coverage
+            + self.proximity_weight * proximity
+        ).astype(np.float32)
+
+    def rerank(
+        self,
+        query: str,
+        documents: List[Dict[str, Any]],
+        top_n: Optional[int] = None,
+        min_score: float = 0.0
+    ) -> List[Dict[str, Any]]:
+        if not documents:
+            return []
+
+        top_n = min(top_n or len(documents), len(documents))
+        scores = self.score(query, [doc.get("content", doc.get("text", "")) or "" for doc in documents])
+        order = np.argsort(-scores, kind="stable")
+
+        reranked_docs = []
+        for idx in order:
+            score = float(scores[idx])
+            if score < min_score:
+                continue
+
+            doc = documents[idx].copy()
+            doc["rerank_score"] = score
+            doc["original_index"] = int(idx)
+            doc["rerank_source"] = "local"
+            reranked_docs.append(doc)
+
+            if len(reranked_docs) >= top_n:
+                break
+
+        return reranked_docs
+
+    def _pair_proximity(self, pairs: List[tuple], positions: Dict[str, List[int]]) -> float:
+        # 查询中相邻的词项在文档中也在window内按序出现的比例，中文二元组相邻即为短语命中
+        hits = 0
+        for first, second in pairs:
+            second_positions = positions.get(second)
+            if not second_positions or first not in positions:
+                continue
+            targets = set(second_positions)
+            if any(p + d in targets for p in positions[first] for d in range(1, self.window + 1)):
+                hits += 1
+        return hits / len(pairs)
+
+
+local_reranker = LocalReranker()
@@ -0,0 +1,253 @@
+import logging
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from services.embedding.milvus_client import milvus_client
+
+logger = logging.getLogger(__name__)
+
+RELEVANCE_FIELDS = ("rerank_score", "rrf_score", "weighted_score", "score")
+
+
+def text_overlap(left: str, right: str, min_overlap: int) -> int:
+    """left的后缀与right的前缀重合的最长长度，不足min_overlap时返回0"""
+    if min_overlap <= 0 or min(len(left), len(right)) < min_overlap:
+        return 0
+
+    probe = right[:min_overlap]
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def _offsets(result: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    metadata = result.get("metadata") or {}
+    start = metadata.get("start_offset", result.get("start_offset"))
+    end = metadata.get("end_offset", result.get("end_offset"))
+    if start is None or end is None or start == "" or end == "":
+        return None, None
+    return int(start), int(end)
+
+
+class _Passage:
+    def __init__(self, result: Dict[str, Any], order: int):
+        self.result = result
+        self.order = order
+        self.content = result.get("content", "") or ""
+        self.start, self.end = _offsets(result)
+        self.keys = [(result.get("doc_id"), result.get("chunk_id"))]
+
+    def absorb(self, other: "_Passage", content: str):
+        self.content = content
+        self.keys.extend(other.keys)
+        if self.start is None or other.start is None:
+            self.start = self.end = None
+        else:
+            self.start = min(self.start, other.start)
+            self.end = max(self.end, other.end)
+
+    def to_result(self) -> Dict[str, Any]:
+        result = dict(self.result)
+        result["content"] = self.content
+        if len(self.keys) > 1:
+            result["merged_chunk_ids"] = [chunk_id for _, chunk_id in self.keys]
+            result["merged_count"] = len(self.keys)
+            if self.start is not None:
+                result["metadata"] = {
+                    **(result.get("metadata") or {}),
+                    "start_offset": self.start,
+                    "end_offset": self.end
+                }
+        return result
+
+
+class PassageRefiner:
+    """检索后的段落精炼：合并同文档相邻或重叠的块，再用MMR去除语义重复
+
+    固定大小分块带重叠，检索结果中同一文档的相邻块会重复占用上下文预算。
+    有偏移量时按区间判断相邻或重叠，否则按文本首尾重合判断；合并后的段落
+    以存储的块向量均值参与MMR，相关性取上游排序分数。
+    """
+
+    def __init__(
+        self,
+        lambda_: Optional[float] = None,
+        min_overlap: Optional[int] = None,
+        max_chars: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        vector_store=None
+    ):
+        self.lambda_ = settings.MMR_LAMBDA if lambda_ is None else lambda_
+        self.min_overlap = min_overlap or settings.PASSAGE_MERGE_MIN_OVERLAP
+        self.max_chars = max_chars or settings.PASSAGE_MERGE_MAX_CHARS
+        self.enabled = settings.PASSAGE_MERGE_ENABLED if enabled is None else enabled
+        self.vector_store = vector_store or milvus_client
+
+    def merge(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """合并同文档中相邻或重叠的块，段落继承其中排名最高的块的位置和字段"""
+        return [passage.to_result() for passage in self._merge(results)]
+
+    def mmr(
+        self,
+        passages: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """最大边际相关性选择，相似度矩阵一次算出，每轮只更新与已选集合的最大相似度"""
+        count = len(passages)
+        if count == 0:
+            return []
+
+        top_k = min(top_k or count, count)
+        relevance = _relevance(passages)
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(count, -1))
+        similarity = vectors @ vectors.T
+
+        max_similarity = np.zeros(count, dtype=np.float32)
+        available = np.ones(count, dtype=bool)
+        selected = []
+
+        for _ in range(top_k):
+            scores = self.lambda_ * relevance - (1 - self.lambda_) * max_similarity
+            scores[~available] = -np.inf
+            index = int(np.argmax(scores))
+            selected.append((index, float(scores[index])))
+            available[index] = False
+            np.maximum(max_similarity, similarity[index], out=max_similarity)
+
+        diversified = []
+        for index, score in selected:
+            passage = dict(passages[index])
+            passage["mmr_score"] = score
+            diversified.append(passage)
+        return diversified
+
+    async def refine(self, results: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """合并相邻块后做MMR多样化，取回向量失败时只做合并"""
+        if not self.enabled or not results:
+            return results[:top_k]
+
+        merged = self._merge(results)
+        passages = [passage.to_result() for passage in merged]
+
+        try:
+            stored = await self.vector_store.fetch_embeddings_async(
+                [key for passage in merged for key in passage.keys]
+            )
+        except Exception as e:
+            logger.warning(f"Fetching passage embeddings failed, skipping MMR: {e}")
+            return passages[:top_k]
+
+        embeddings = _passage_embeddings(merged, stored)
+        if embeddings is None:
+            return passages[:top_k]
+
+        selected = self.mmr(passages, embeddings, top_k)
+        logger.info(
+            f"Passage refinement: {len(results)} chunks -> {len(passages)} passages "
+            f"-> {len(selected)} selected"
+        )
+        return selected
+
+    def _merge(self, results: List[Dict[str, Any]]) -> List[_Passage]:
+        by_doc: Dict[Any, List[_Passage]] = defaultdict(list)
+
+        for order, result in enumerate(results):
+            current = _Passage(result, order)
+            doc_passages = by_doc[result.get("doc_id")]
+            doc_passages.append(current)
+
+            # 新块可能把同文档的两个已有段落连成一段，合并到不能再合并为止
+            while True:
+                for other in doc_passages:
+                    if other is current:
+                        continue
+                    content = self._join(other, current)
+                    if content is None:
+                        continue
+                    keep, drop = (other, current) if other.order < current.order else (current, other)
+                    keep.absorb(drop, content)
+                    doc_passages.remove(drop)
+                    current = keep
+                    break
+                else:
+                    break
+
+        return sorted(
+            (passage for doc_passages in by_doc.values() for passage in doc_passages),
+            key=lambda p: p.order
+        )
+
+    def _join(self, first: _Passage, second: _Passage) -> Optional[str]:
+        # 空串是任何文本的子串，不能据此把不相邻的块并在一起
+        if not first.content.strip() or not second.content.strip():
+            return None
+
+        if first.start is not None and second.start is not None:
+            # 有偏移时只按偏移判断相邻，重叠部分按偏移切掉，不依赖文本匹配
+            left, right = (first, second) if first.start <= second.start else (second, first)
+            if right.start > left.end:
+                return None
+            if right.end <= left.end:
+                return left.content
+            content = left.content + right.content[left.end - right.start:]
+        elif second.content in first.content:
+            return first.content
+        elif first.content in second.content:
+            return second.content
+        else:
+            overlap = text_overlap(first.content, second.content, self.min_overlap)
+            if overlap:
+                content = first.content + second.content[overlap:]
+            else:
+                overlap = text_overlap(second.content, first.content, self.min_overlap)
+                if not overlap:
+                    return None
+                content = second.content + first.content[overlap:]
+
+        if len(content) > self.max_chars:
+            return None
+        return content
+
+
+def _relevance(passages: List[Dict[str, Any]]) -> np.ndarray:
+    field = next((f for f in RELEVANCE_FIELDS if passages[0].get(f) is not None), None)
+    if field is None:
+        return np.ones(len(passages), dtype=np.float32)
+
+    scores = np.asarray([p.get(field) or 0.0 for p in passages], dtype=np.float32)
+    spread = scores.max() - scores.min()
+    if spread <= 0:
+        return np.ones(len(passages), dtype=np.float32)
+    return (scores - scores.min()) / spread
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _passage_embeddings(
+    passages: List[_Passage],
+    stored: Dict[Tuple[str, str], List[float]]
+) -> Optional[np.ndarray]:
+    if not stored:
+        return None
+
+    dimension = len(next(iter(stored.values())))
+    embeddings = np.zeros((len(passages), dimension), dtype=np.float32)
+    for i, passage in enumerate(passages):
+        vectors = [stored[key] for key in passage.keys if key in stored]
+        if vectors:
+            embeddings[i] = _normalize(np.asarray(vectors, dtype=np.float32)).mean(axis=0)
+    return embeddings
+
+
+passage_refiner = PassageRefiner()
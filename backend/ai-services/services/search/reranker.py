@@ -1,10 +1,14 @@
 import httpx
+import asyncio
+import hashlib
 import logging
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from config.settings import settings
+from services.cache.memory_cache import MemoryCache
+from services.search.local_reranker import local_reranker
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +28,35 @@ class RerankerService:
         api_key: str = None,
         model: str = "gte-rerank",
         top_n: int = 10,
-        timeout: float = 30.0
+        timeout: float = 30.0,
+        depth: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        budget_ms: Optional[float] = None,
+        fallback: Optional[str] = None
     ):
         self.api_key = api_key or settings.QWEN_API_KEY
         self.model = model
         self.default_top_n = top_n
         self.timeout = timeout
+        self.depth = depth or settings.RERANK_DEPTH
+        self.batch_size = batch_size or settings.RERANK_BATCH_SIZE
+        self.max_concurrency = max_concurrency or settings.RERANK_MAX_CONCURRENCY
+        self.budget_ms = settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        self.fallback = fallback or settings.RERANK_FALLBACK
+        self.cache_ttl = settings.RERANK_CACHE_TTL
+        self.score_cache = MemoryCache(max_size=settings.RERANK_CACHE_SIZE, default_ttl=self.cache_ttl)
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+    
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def rerank(
         self,
@@ -37,53 +64,129 @@ class RerankerService:
         documents: List[Dict[str, Any]],
         top_n: int = None,
         return_documents: bool = True,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        depth: Optional[int] = None,
+        budget_ms: Optional[float] = None,
+        mode: Optional[str] = None
     ) -> List[Dict[str, Any]]:
+        """对融合结果的前depth条重排序
+
+        mode为"local"时使用本地词法重排序器，默认调用远程接口。
+        已打过分的(查询, chunk)直接取缓存，其余按批并发调用重排序接口；
+        接口不可用、失败或超出延迟预算时按RERANK_FALLBACK兜底：
+        "local"（默认）返回本地词法重排序结果，"fused"按融合顺序返回前top_n条。
+        """
         if not documents:
             return []
         
-        if not self.api_key:
-            logger.warning("Reranker API key not configured, returning original order")
-            return documents[:top_n or self.default_top_n]
+        top_n = min(top_n or self.default_top_n, len(documents))
+        candidates = documents[:max(depth or self.depth, top_n)]
         
-        top_n = top_n or self.default_top_n
-        top_n = min(top_n, len(documents))
+        if mode == "local":
+            return local_reranker.rerank(query, candidates, top_n=top_n, min_score=min_score)
         
-        doc_texts = []
-        for doc in documents:
-            text = doc.get("content", doc.get("text", ""))
-            if text:
-                doc_texts.append(text)
+        if not self.api_key:
+            logger.warning("Reranker API key not configured, using fallback")
+            return self._fallback(query, candidates, top_n, min_score)
         
-        if not doc_texts:
-            return documents[:top_n]
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        scores = await self._score_candidates(query, candidates, budget_ms)
+        if scores is None:
+            return self._fallback(query, candidates, top_n, min_score)
         
-        try:
-            results = await self._call_reranker_api(query, doc_texts, top_n)
-            
-            reranked_docs = []
-            for result in results:
-                idx = result.index
-                score = result.relevance_score
-                
-                if score < min_score:
-                    continue
-                
-                doc = documents[idx].copy()
-                doc["rerank_score"] = score
-                doc["original_index"] = idx
-                reranked_docs.append(doc)
-            
-            logger.info(
-                f"Reranked {len(documents)} documents, "
-                f"returned {len(reranked_docs)} with min_score={min_score}"
-            )
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        
+        reranked_docs = []
+        for idx in order:
+            if scores[idx] < min_score:
+                continue
             
-            return reranked_docs
+            doc = candidates[idx].copy()
+            doc["rerank_score"] = scores[idx]
+            doc["original_index"] = idx
+            reranked_docs.append(doc)
             
-        except Exception as e:
-            logger.error(f"Rerank failed: {e}, returning original order")
-            return documents[:top_n]
+            if len(reranked_docs) >= top_n:
+                break
+        
+        logger.info(
+            f"Reranked {len(candidates)} of {len(documents)} documents, "
+            f"returned {len(reranked_docs)} with min_score={min_score}"
+        )
+        
+        return reranked_docs
+    
+    async def _score_candidates(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        budget_ms: float
+    ) -> Optional[List[float]]:
+        query_hash = hashlib.md5(query.encode()).hexdigest()
+        keys = [self._score_key(query_hash, doc) for doc in candidates]
+        
+        scores: List[Optional[float]] = [
+            self.score_cache.get(key) if self._doc_text(doc) else 0.0
+            for key, doc in zip(keys, candidates)
+        ]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if not missing:
+            return scores
+        
+        batches = [
+            missing[start:start + self.batch_size]
+            for start in range(0, len(missing), self.batch_size)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def score_batch(indices: List[int]):
+            async with semaphore:
+                results = await self._post_rerank(
+                    query, [self._doc_text(candidates[i]) for i in indices], len(indices)
+                )
+            for result in results:
+                if 0 <= result.index < len(indices):
+                    i = indices[result.index]
+                    scores[i] = result.relevance_score
+                    self.score_cache.set(keys[i], result.relevance_score, self.cache_ttl)
+        
+        tasks = [asyncio.create_task(score_batch(batch)) for batch in batches]
+        done, pending = await asyncio.wait(tasks, timeout=budget_ms / 1000)
+        
+        for task in pending:
+            task.cancel()
+        
+        if pending:
+            logger.warning(f"Rerank exceeded {budget_ms:.0f}ms budget")
+            return None
+        
+        errors = [task.exception() for task in done if task.exception() is not None]
+        if errors:
+            logger.error(f"Rerank failed: {errors[0]}")
+            return None
+        
+        # 接口未返回的文档视为不相关
+        return [0.0 if score is None else score for score in scores]
+    
+    def _fallback(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_n: int,
+        min_score: float
+    ) -> List[Dict[str, Any]]:
+        if self.fallback == "local":
+            return local_reranker.rerank(query, candidates, top_n=top_n, min_score=min_score)
+        return candidates[:top_n]
+    
+    @staticmethod
+    def _doc_text(doc: Dict[str, Any]) -> str:
+        return doc.get("content", doc.get("text", "")) or ""
+    
+    def _score_key(self, query_hash: str, doc: Dict[str, Any]) -> str:
+        # chunk内容变化后旧分数失效，因此键中带上内容摘要
+        content_hash = hashlib.md5(self._doc_text(doc).encode()).hexdigest()[:12]
+        return f"rerank:{self.model}:{query_hash}:{doc.get('doc_id', '')}:{doc.get('chunk_id', '')}:{content_hash}"
     
     async def rerank_with_scores(
         self,
@@ -113,43 +216,50 @@ class RerankerService:
         documents: List[str],
         top_n: int
     ) -> List[RerankResult]:
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                self.RERANKER_API_URL,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
+        return await self._post_rerank(query, documents, top_n)
+    
+    async def _post_rerank(
+        self,
+        query: str,
+        documents: List[str],
+        top_n: int
+    ) -> List[RerankResult]:
+        response = await self._get_client().post(
+            self.RERANKER_API_URL,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": self.model,
+                "input": {
+                    "query": query,
+                    "documents": documents
                 },
-                json={
-                    "model": self.model,
-                    "input": {
-                        "query": query,
-                        "documents": documents
-                    },
-                    "parameters": {
-                        "top_n": min(top_n, len(documents)),
-                        "return_documents": False
-                    }
+                "parameters": {
+                    "top_n": min(top_n, len(documents)),
+                    "return_documents": False
                 }
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Reranker API error: {response.status_code} - {response.text}")
-            
-            data = response.json()
-            results = []
-            
-            output = data.get("output", {})
-            rerank_results = output.get("results", [])
-            
-            for item in rerank_results:
-                results.append(RerankResult(
-                    index=item.get("index", 0),
-                    relevance_score=item.get("relevance_score", 0.0),
-                    document={}
-                ))
-            
-            return results
+            }
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Reranker API error: {response.status_code} - {response.text}")
+        
+        data = response.json()
+        results = []
+        
+        output = data.get("output", {})
+        rerank_results = output.get("results", [])
+        
+        for item in rerank_results:
+            results.append(RerankResult(
+                index=item.get("index", 0),
+                relevance_score=item.get("relevance_score", 0.0),
+                document={}
+            ))
+        
+        return results
     
     async def compute_relevance_scores(
         self,
@@ -1,63 +1,76 @@
-from typing import List, Dict, Any
-from collections import defaultdict
+from typing import List, Dict, Any, Optional, Mapping, Hashable
+import heapq
 import logging
+
+import numpy as np
+
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+RankedSources = Mapping[str, List[Dict[str, Any]]]
+
+
+def result_key(result: Dict[str, Any]) -> Hashable:
+    """以(doc_id, chunk_id)标识检索结果，缺少chunk_id时退化为文档或命中ID"""
+    doc_id = result.get("doc_id") or result.get("_id") or result.get("id")
+    return doc_id, result.get("chunk_id")
+
+
+def _raw_score(result: Dict[str, Any]) -> float:
+    return result.get("score", result.get("_score", 0)) or 0
+
 
 class RRFFusion:
     def __init__(self, k: int = None):
         self.k = k or settings.RRF_K
 
+    def fuse_many(
+        self,
+        sources: RankedSources,
+        k: int = None,
+        top_k: Optional[int] = None,
+        weights: Optional[Mapping[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """对任意多路排序结果做RRF融合，如关键词、向量、图谱与多查询改写"""
+        k = k or self.k
+
+        def contributions(name: str, results: List[Dict[str, Any]]) -> np.ndarray:
+            weight = (weights or {}).get(name, 1.0)
+            return weight / (k + np.arange(1, len(results) + 1, dtype=np.float64))
+
+        fused_results = self._fuse(sources, contributions, "rrf_score", top_k)
+        logger.info(
+            f"RRF fusion completed: {len(fused_results)} results from {len(sources)} sources with k={k}"
+        )
+        return fused_results
+
     def fuse(
         self,
         keyword_results: List[Dict[str, Any]],
         vector_results: List[Dict[str, Any]],
-        k: int = None
+        k: int = None,
+        top_k: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        k = k or self.k
-        scores = defaultdict(float)
-        result_map = {}
-
-        for rank, result in enumerate(keyword_results, 1):
-            doc_id = result.get("doc_id", result.get("_id", str(rank)))
-            score = 1.0 / (k + rank)
-            scores[doc_id] += score
-            
-            if doc_id not in result_map:
-                result_map[doc_id] = result.copy()
-                result_map[doc_id]["keyword_rank"] = rank
-                result_map[doc_id]["keyword_score"] = result.get("_score", 0)
-            
-            logger.debug(f"Keyword rank {rank}: doc_id={doc_id}, score contribution={score}")
-
-        for rank, result in enumerate(vector_results, 1):
-            doc_id = result.get("doc_id", result.get("id", str(rank)))
-            score = 1.0 / (k + rank)
-            scores[doc_id] += score
-            
-            if doc_id not in result_map:
-                result_map[doc_id] = result.copy()
-            else:
-                if not result_map[doc_id].get("content") and result.get("content"):
-                    result_map[doc_id]["content"] = result.get("content")
-            
-            result_map[doc_id]["vector_rank"] = rank
-            result_map[doc_id]["vector_score"] = result.get("score", result.get("_score", 0))
-            
-            logger.debug(f"Vector rank {rank}: doc_id={doc_id}, score contribution={score}")
-
-        fused_results = sorted(
-            [{"doc_id": k, "rrf_score": v, **result_map[k]} for k, v in scores.items()],
-            key=lambda x: x["rrf_score"],
-            reverse=True
+        return self.fuse_many(
+            {"keyword": keyword_results, "vector": vector_results}, k=k, top_k=top_k
         )
 
-        for i, result in enumerate(fused_results, 1):
-            result["rank"] = i
-
-        logger.info(f"RRF fusion completed: {len(fused_results)} results fused with k={k}")
+    def weighted_fuse_many(
+        self,
+        sources: RankedSources,
+        weights: Mapping[str, float],
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """按各路最高分归一化后加权求和"""
+        def contributions(name: str, results: List[Dict[str, Any]]) -> np.ndarray:
+            raw = np.fromiter((_raw_score(r) for r in results), dtype=np.float64, count=len(results))
+            peak = raw.max() if raw.size else 0
+            normalized = raw / peak if peak > 0 else np.zeros_like(raw)
+            return normalized * weights.get(name, 0.0)
+
+        fused_results = self._fuse(sources, contributions, "weighted_score", top_k)
+        logger.info(f"Weighted fusion completed: {len(fused_results)} results")
         return fused_results
 
     def weighted_fuse(
@@ -65,51 +78,74 @@ class RRFFusion:
         keyword_results: List[Dict[str, Any]],
         vector_results: List[Dict[str, Any]],
         keyword_weight: float = 0.3,
-        vector_weight: float = 0.7
+        vector_weight: float = 0.7,
+        top_k: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        scores = defaultdict(float)
-        result_map = {}
-
-        max_keyword_score = max(
-            (r.get("_score", r.get("score", 0)) for r in keyword_results),
-            default=1.0
-        )
-        
-        max_vector_score = max(
-            (r.get("_score", r.get("score", 0)) for r in vector_results),
-            default=1.0
-        )
-
-        for result in keyword_results:
-            doc_id = result.get("doc_id", result.get("_id", ""))
-            raw_score = result.get("_score", result.get("score", 0))
-            normalized_score = raw_score / max_keyword_score if max_keyword_score > 0 else 0
-            weighted_score = normalized_score * keyword_weight
-            scores[doc_id] += weighted_score
-            
-            if doc_id not in result_map:
-                result_map[doc_id] = result.copy()
-
-        for result in vector_results:
-            doc_id = result.get("doc_id", result.get("id", ""))
-            raw_score = result.get("_score", result.get("score", 0))
-            normalized_score = raw_score / max_vector_score if max_vector_score > 0 else 0
-            weighted_score = normalized_score * vector_weight
-            scores[doc_id] += weighted_score
-            
-            if doc_id not in result_map:
-                result_map[doc_id] = result.copy()
-
-        fused_results = sorted(
-            [{"doc_id": k, "weighted_score": v, **result_map[k]} for k, v in scores.items()],
-            key=lambda x: x["weighted_score"],
-            reverse=True
+        return self.weighted_fuse_many(
+            {"keyword": keyword_results, "vector": vector_results},
+            weights={"keyword": keyword_weight, "vector": vector_weight},
+            top_k=top_k
         )
 
-        for i, result in enumerate(fused_results, 1):
-            result["rank"] = i
+    @staticmethod
+    def _fuse(
+        sources: RankedSources,
+        contributions,
+        score_field: str,
+        top_k: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        # 分数累加在预分配数组中，只为最终入选的top-k构造结果字典
+        total = sum(len(results) for results in sources.values())
+        scores = np.zeros(total, dtype=np.float64)
+        slots: Dict[Hashable, int] = {}
+        source_slots: Dict[str, List[int]] = {}
+
+        for name, results in sources.items():
+            if not results:
+                continue
+
+            indices = [slots.setdefault(result_key(result), len(slots)) for result in results]
+            np.add.at(scores, indices, contributions(name, results))
+            source_slots[name] = indices
+
+        count = len(slots)
+        if count == 0:
+            return []
+
+        score_list = scores[:count].tolist()
+        if top_k is not None and top_k < count:
+            selected = heapq.nlargest(top_k, range(count), key=score_list.__getitem__)
+        else:
+            selected = sorted(range(count), key=score_list.__getitem__, reverse=True)
+
+        wanted = {slot: rank for rank, slot in enumerate(selected, 1)}
+        fused_results: List[Optional[Dict[str, Any]]] = [None] * len(selected)
+
+        for name, indices in source_slots.items():
+            results = sources[name]
+            for position, slot in enumerate(indices, 1):
+                rank = wanted.get(slot)
+                if rank is None:
+                    continue
+
+                result = results[position - 1]
+                fused = fused_results[rank - 1]
+                if fused is None:
+                    fused = fused_results[rank - 1] = {
+                        "doc_id": result_key(result)[0],
+                        score_field: score_list[slot],
+                        **result
+                    }
+                elif not fused.get("content") and result.get("content"):
+                    fused["content"] = result["content"]
+
+                if f"{name}_rank" not in fused:
+                    fused[f"{name}_rank"] = position
+                    fused[f"{name}_score"] = _raw_score(result)
+
+        for rank, fused in enumerate(fused_results, 1):
+            fused["rank"] = rank
 
-        logger.info(f"Weighted fusion completed: {len(fused_results)} results")
         return fused_results
 
 
@@ -0,0 +1,119 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+from models.qa_models import SourceReference
+from services.cache.memory_cache import MemoryCache
+from services.cache.answer_cache import AnswerCache
+from services.qa.stream_handler import SSEStreamHandler
+
+
+def _sources(*doc_ids):
+    return [SourceReference(source_id=f"[{i}]", doc_id=d, chunk_id="0", content=d) for i, d in enumerate(doc_ids, 1)]
+
+
+@pytest.fixture
+def cache():
+    redis = MagicMock()
+    redis.is_connected = False
+    return AnswerCache(memory=MemoryCache(max_size=100), redis=redis, ttl=60, enabled=True)
+
+
+class TestAnswerCache:
+    
+    @pytest.mark.asyncio
+    async def test_hit_after_set(self, cache):
+        key = cache.make_key("What is RAG", [("d1", "0"), ("d2", "1")], model="qwen-max")
+        await cache.set(key, "answer", await cache.versions(["d1", "d2"]))
+        
+        assert await cache.get(cache.make_key("what  is rag", [("d1", "0"), ("d2", "1")], model="qwen-max")) == "answer"
+        assert cache.get_stats()["hits"] == 1
+    
+    def test_key_depends_on_chunk_order_and_config(self, cache):
+        key = cache.make_key("q", [("d1", "0"), ("d2", "1")], model="qwen-max")
+        
+        assert key != cache.make_key("q", [("d2", "1"), ("d1", "0")], model="qwen-max")
+        assert key != cache.make_key("q", [("d1", "0"), ("d2", "1")], model="qwen-plus")
+    
+    @pytest.mark.asyncio
+    async def test_invalidating_contributing_doc_drops_answer(self, cache):
+        key = cache.make_key("q", [("d1", "0"), ("d2", "0")])
+        await cache.set(key, "answer", await cache.versions(["d1", "d2"]))
+        
+        await cache.invalidate_documents(["d3"])
+        assert await cache.get(key) == "answer"
+        
+        await cache.invalidate_documents(["d2"])
+        assert await cache.get(key) is None
+        assert cache.get_stats()["stale"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_invalidation_during_generation_is_not_cached(self, cache):
+        key = cache.make_key("q", [("d1", "0")])
+        versions = await cache.versions(["d1"])
+        
+        await cache.invalidate_documents(["d1"])
+        await cache.set(key, "stale answer", versions)
+        
+        assert await cache.get(key) is None
+    
+    @pytest.mark.asyncio
+    async def test_shared_versions_from_redis(self):
+        redis = MagicMock()
+        redis.is_connected = True
+        redis.get = AsyncMock(return_value=None)
+        redis.set = AsyncMock(return_value=True)
+        redis.get_many = AsyncMock(return_value=[3, None])
+        cache = AnswerCache(memory=MemoryCache(max_size=10), redis=redis, ttl=60, enabled=True)
+        
+        assert await cache.versions(["d1", "d2"]) == {"d1": 3, "d2": 0}
+
+
+class TestStreamHandlerAnswerCache:
+    
+    @pytest.fixture
+    def handler(self, cache):
+        handler = SSEStreamHandler()
+        handler.api_key = "test_key"
+        with patch("services.qa.stream_handler.answer_cache", cache):
+            yield handler
+    
+    @pytest.mark.asyncio
+    async def test_generate_uses_cache(self, handler):
+        sources = _sources("d1")
+        
+        with patch.object(handler, "_call_llm", AsyncMock(return_value="回答")) as mock_llm:
+            first = await handler.generate("问题", "上下文", sources=sources)
+            second = await handler.generate("问题", "上下文", sources=sources)
+            await handler.generate("问题", "上下文")
+        
+        assert first == second == "回答"
+        assert mock_llm.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_generate_key_includes_context_text(self, handler):
+        sources = _sources("d1")
+        
+        with patch.object(handler, "_call_llm", AsyncMock(side_effect=["回答一", "回答二"])) as mock_llm:
+            first = await handler.generate("问题", "【对话历史】\n用户: A\n\n上下文", sources=sources)
+            second = await handler.generate("问题", "【对话历史】\n用户: B\n\n上下文", sources=sources)
+        
+        assert (first, second) == ("回答一", "回答二")
+        assert mock_llm.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_stream_replays_cached_answer(self, handler):
+        sources = _sources("d1", "d2")
+        
+        async def deltas():
+            for token in ["知识", "图谱"]:
+                yield token
+        
+        with patch.object(handler, "_call_llm_stream", return_value=deltas()) as mock_stream:
+            live = [f async for f in handler.stream_generate("问题", "上下文", sources)]
+            replayed = [f async for f in handler.stream_generate("问题", "上下文", sources)]
+        
+        assert mock_stream.call_count == 1
+        assert replayed[:2] == live[:2]
+        assert "知识图谱" in "".join(replayed)
+        assert replayed[-1] == live[-1]
+        assert handler.stats.replayed == 1
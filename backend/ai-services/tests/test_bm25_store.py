@@ -0,0 +1,153 @@
+import time
+import numpy as np
+import pytest
+
+from services.embedding.bm25_store import BM25KeywordStore, PostingList, tokenize
+
+
+def _doc(doc_id, chunk_id, content, **metadata):
+    return {
+        "doc_id": doc_id,
+        "chunk_id": chunk_id,
+        "content": content,
+        "title": "",
+        "keywords": [],
+        "metadata": metadata
+    }
+
+
+class TestTokenize:
+
+    def test_cjk_bigrams_and_latin_words(self):
+        assert tokenize("知识图谱 GraphRAG v2") == ["知识", "识图", "图谱", "graphrag", "v2"]
+
+    def test_single_cjk_char(self):
+        assert tokenize("图 test") == ["图", "test"]
+
+
+class TestPostingList:
+
+    def test_roundtrip_with_narrow_dtype(self):
+        posting = PostingList()
+        for doc_num, tf in [(0, 1), (3, 2), (300, 1)]:
+            posting.add(doc_num, tf)
+
+        docs, tfs = posting.arrays()
+
+        assert docs.tolist() == [0, 3, 300]
+        assert tfs.tolist() == [1, 2, 1]
+        assert posting._deltas.dtype == np.uint16
+
+        posting.add(301, 5)
+        docs, tfs = posting.arrays()
+        assert docs.tolist() == [0, 3, 300, 301]
+        assert tfs.tolist() == [1, 2, 1, 5]
+
+
+class TestBM25KeywordStore:
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return BM25KeywordStore(data_dir=str(tmp_path), snapshot_interval=-1)
+
+    def test_search_ranks_by_bm25(self, store):
+        store.bulk_index([
+            _doc("d1", "c1", "知识图谱构建方法"),
+            _doc("d1", "c2", "知识图谱 知识图谱 检索增强"),
+            _doc("d2", "c1", "向量检索与关键词检索")
+        ])
+
+        results = store.search("知识图谱", top_k=10)
+
+        assert [r["_id"] for r in results] == ["d1_c2", "d1_c1"]
+        assert results[0]["_score"] > results[1]["_score"] > 0
+
+    def test_filters_on_metadata(self, store):
+        store.bulk_index([
+            _doc("d1", "c1", "graph search", category="tech"),
+            _doc("d2", "c1", "graph search", category="law"),
+            _doc("d3", "c1", "graph search", category="finance")
+        ])
+
+        term = store.search("graph", filters={"metadata.category": "law"})
+        terms = store.search("graph", filters={"metadata.category": ["tech", "finance"]})
+
+        assert [r["doc_id"] for r in term] == ["d2"]
+        assert sorted(r["doc_id"] for r in terms) == ["d1", "d3"]
+
+    def test_reindex_and_delete(self, store):
+        store.index_document("d1", "c1", "old content")
+        store.index_document("d1", "c1", "new content")
+        store.index_document("d2", "c1", "other content")
+
+        assert store.search("old") == []
+        assert store.count() == 2
+
+        assert store.delete_document("d1") is True
+        assert store.search("new") == []
+        assert store.get_document("d1", "c1") is None
+        assert store.count() == 1
+
+    def test_snapshot_restart(self, store, tmp_path):
+        store.bulk_index([_doc("d1", "c1", "混合检索"), _doc("d2", "c1", "hybrid search")])
+        store.close()
+
+        restored = BM25KeywordStore(data_dir=str(tmp_path))
+
+        assert [r["_id"] for r in restored.search("检索")] == ["d1_c1"]
+        assert restored.count() == 2
+
+    @pytest.mark.asyncio
+    async def test_search_async(self, store):
+        store.index_document("d1", "c1", "async search")
+
+        results = await store.search_async("search")
+
+        assert results[0]["_id"] == "d1_c1"
+
+    def test_duplicate_ids_in_one_batch(self, store):
+        store.bulk_index([_doc("d1", "c1", "first"), _doc("d1", "c1", "second")])
+
+        assert store.count() == 1
+        assert store.search("first") == []
+        assert store.search("second")[0]["_id"] == "d1_c1"
+
+    def test_lean_msearch(self, store):
+        store.bulk_index([
+            {**_doc("d1", "c1", "graph search", category="tech", author="x"), "keywords": ["kg"]},
+            _doc("d2", "c1", "vector search")
+        ])
+
+        results = store.msearch(["graph", "vector"], top_k=5)
+
+        assert [r[0]["_id"] for r in results] == ["d1_c1", "d2_c1"]
+        assert "keywords" not in results[0][0]
+        assert results[0][0]["metadata"] == {"category": "tech"}
+
+    def test_reingest_compacts_dead_postings(self, store):
+        for _ in range(10):
+            store.bulk_index([_doc("d1", f"c{i}", f"graph chunk {i}") for i in range(20)])
+
+        inverted = store._get_index(store.index)
+        assert len(inverted.ids) < 40
+        assert len(inverted.postings["graph"]) == len(inverted.ids)
+        assert store.count() == 20
+
+        store.delete_document("d1")
+        assert len(inverted.ids) == 0
+        assert store.search("graph") == []
+
+    def test_idle_writes_are_flushed(self, tmp_path):
+        store = BM25KeywordStore(data_dir=str(tmp_path), snapshot_interval=0.05)
+        store.index_document("d1", "c1", "late write")
+
+        time.sleep(0.3)
+
+        restored = BM25KeywordStore(data_dir=str(tmp_path))
+        assert restored.count() == 1
+
+    def test_bulk_load_saves_snapshot(self, tmp_path):
+        store = BM25KeywordStore(data_dir=str(tmp_path), snapshot_interval=3600)
+        store.bulk_load([_doc("d1", f"c{i}", "bulk") for i in range(5)], chunk_size=2)
+
+        assert BM25KeywordStore(data_dir=str(tmp_path)).count() == 5
@@ -0,0 +1,74 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from services.kg.graph.chunk_entity_index import ChunkEntityIndex
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    client.execute_write = AsyncMock(return_value=[{"removed": 0}])
+    client.execute_read = AsyncMock(return_value=[])
+    return client
+
+
+@pytest.fixture
+def index(client):
+    index = ChunkEntityIndex()
+    index.client = client
+    return index
+
+
+class TestChunkEntityIndex:
+
+    @pytest.mark.asyncio
+    async def test_add_document_replaces_previous_chunks(self, index, client):
+        count = await index.add_document("doc1", {"c1": ["e1", "e2", "e1"], "c2": [], "c3": ["e3"]})
+
+        assert count == 2
+        remove_call, create_call = client.execute_write.await_args_list
+        assert "DETACH DELETE" in remove_call.args[0]
+        assert remove_call.args[1] == {"doc_ids": ["doc1"]}
+        assert "MENTIONED_IN" in create_call.args[0]
+        assert create_call.args[1] == {
+            "doc_id": "doc1",
+            "chunks": [
+                {"chunk_id": "c1", "entity_ids": ["e1", "e2"]},
+                {"chunk_id": "c3", "entity_ids": ["e3"]}
+            ]
+        }
+
+    @pytest.mark.asyncio
+    async def test_add_document_without_entities_only_removes(self, index, client):
+        assert await index.add_document("doc1", {"c1": []}) == 0
+        client.execute_write.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_remove_documents(self, index, client):
+        client.execute_write.return_value = [{"removed": 3}]
+
+        assert await index.remove_documents(["doc1", "doc2"]) == 3
+        assert client.execute_write.await_args.args[1] == {"doc_ids": ["doc1", "doc2"]}
+
+        assert await index.remove_documents([]) == 0
+        client.execute_write.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_lookup_passes_ranked_chunks(self, index, client):
+        entities = [{"id": "e2", "name": "E2", "type": "Concept", "description": ""}]
+        client.execute_read.return_value = entities
+
+        result = await index.lookup([("doc1", "c1"), ("doc1", "c2")], limit=5)
+
+        assert result == entities
+        query, params = client.execute_read.await_args.args
+        assert "ORDER BY mentions DESC, first_rank ASC" in query
+        assert params == {
+            "chunks": [{"doc_id": "doc1", "chunk_id": "c1"}, {"doc_id": "doc1", "chunk_id": "c2"}],
+            "limit": 5
+        }
+
+    @pytest.mark.asyncio
+    async def test_lookup_without_chunks_skips_query(self, index, client):
+        assert await index.lookup([]) == []
+        client.execute_read.assert_not_awaited()
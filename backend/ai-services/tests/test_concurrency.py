@@ -0,0 +1,151 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+from utils.concurrency import BlockingIOExecutor, cancel_on_disconnect
+
+
+class TestBlockingIOExecutor:
+    @pytest.fixture
+    def executor(self):
+        executor = BlockingIOExecutor(max_workers=4)
+        yield executor
+        executor.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_run_returns_result(self, executor):
+        result = await executor.run(lambda a, b=0: a + b, 1, b=2)
+        
+        assert result == 3
+    
+    @pytest.mark.asyncio
+    async def test_blocking_calls_overlap(self, executor):
+        start = time.time()
+        await asyncio.gather(
+            executor.run(time.sleep, 0.2),
+            executor.run(time.sleep, 0.2)
+        )
+        elapsed = time.time() - start
+        
+        assert elapsed < 0.35
+    
+    @pytest.mark.asyncio
+    async def test_event_loop_not_blocked(self, executor):
+        ticks = []
+        
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.time())
+                await asyncio.sleep(0.02)
+        
+        await asyncio.gather(executor.run(time.sleep, 0.2), ticker())
+        
+        assert len(ticks) == 5
+        assert ticks[-1] - ticks[0] < 0.2
+    
+    @pytest.mark.asyncio
+    async def test_exception_propagates(self, executor):
+        def fail():
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError):
+            await executor.run(fail)
+
+
+class TestAsyncStorageClients:
+    @pytest.mark.asyncio
+    async def test_milvus_search_async(self):
+        from services.embedding.milvus_client import MilvusClient
+        
+        client = MilvusClient()
+        hits = [{"id": "1", "score": 0.9, "doc_id": "doc1", "chunk_id": "c1", "content": "x"}]
+        
+        with patch.object(client, "search", return_value=hits) as mock_search:
+            results = await client.search_async([0.1, 0.2], top_k=5, doc_ids=["doc1"])
+        
+        assert results == hits
+        mock_search.assert_called_once_with(
+            [0.1, 0.2], top_k=5, doc_ids=["doc1"], search_params=None, filters=None
+        )
+    
+    @pytest.mark.asyncio
+    async def test_es_search_async(self):
+        with patch('services.embedding.es_client.Elasticsearch') as mock_es:
+            mock_instance = MagicMock()
+            mock_es.return_value = mock_instance
+            mock_instance.search.return_value = {
+                "hits": {"hits": [{"_id": "doc1_c1", "_score": 1.5, "_source": {"doc_id": "doc1"}}]}
+            }
+            
+            from services.embedding.es_client import ElasticsearchClient
+            client = ElasticsearchClient()
+            results = await client.search_async("测试", top_k=10)
+        
+        assert results[0]["doc_id"] == "doc1"
+        assert results[0]["_score"] == 1.5
+
+
+class TestCancelOnDisconnect:
+    
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_pending_upstream(self):
+        disconnect = asyncio.Event()
+        upstream_cancelled = asyncio.Event()
+        on_disconnect = MagicMock()
+        
+        async def upstream():
+            yield "start"
+            try:
+                await asyncio.sleep(10)
+                yield "never"
+            except asyncio.CancelledError:
+                upstream_cancelled.set()
+                raise
+        
+        received = []
+        
+        async def consume():
+            async for item in cancel_on_disconnect(upstream(), disconnect.wait, on_disconnect):
+                received.append(item)
+                disconnect.set()
+        
+        await asyncio.wait_for(consume(), timeout=1)
+        
+        assert received == ["start"]
+        assert upstream_cancelled.is_set()
+        on_disconnect.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_completes_without_disconnect(self):
+        on_disconnect = MagicMock()
+        
+        async def upstream():
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+        
+        never = asyncio.Event()
+        received = [i async for i in cancel_on_disconnect(upstream(), never.wait, on_disconnect)]
+        
+        assert received == [0, 1, 2]
+        on_disconnect.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_external_cancel_propagates(self):
+        async def upstream():
+            await asyncio.sleep(10)
+            yield "never"
+        
+        never = asyncio.Event()
+        
+        async def consume():
+            async for _ in cancel_on_disconnect(upstream(), never.wait):
+                pass
+        
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await task
@@ -0,0 +1,86 @@
+import pytest
+
+from services.qa.context_compressor import ContextCompressor, GAP_MARKER
+
+
+@pytest.fixture
+def compressor():
+    return ContextCompressor(max_sentences=2, min_chars=20)
+
+
+def _result(doc_id, content, **extra):
+    return {"doc_id": doc_id, "chunk_id": "0", "content": content, "score": 0.8, **extra}
+
+
+class TestContextCompressor:
+
+    def test_keeps_relevant_sentences_in_order(self, compressor):
+        content = (
+            "公司成立于2010年。"
+            "向量检索依赖Milvus存储嵌入。"
+            "员工食堂每天中午营业。"
+            "Milvus支持HNSW索引加速向量检索。"
+            "年会通常在一月举行。"
+        )
+
+        compressed, report = compressor.compress("Milvus向量检索", [_result("d1", content)])
+
+        text = compressed[0]["content"]
+        assert text == "向量检索依赖Milvus存储嵌入。" + GAP_MARKER + "Milvus支持HNSW索引加速向量检索。"
+        assert report.compressed_chars == len(text)
+        assert report.ratio < 1
+
+    def test_adjacent_sentences_joined_without_marker(self, compressor):
+        content = "无关内容在这里。RAG先检索文档。再由RAG生成回答。结尾是别的话题。"
+
+        compressed, _ = compressor.compress("RAG检索 生成回答", [_result("d1", content)])
+
+        assert compressed[0]["content"] == "RAG先检索文档。再由RAG生成回答。"
+
+    def test_latin_sentences_keep_spacing(self, compressor):
+        content = (
+            "The office opens at nine. Milvus stores the embeddings. "
+            "Milvus builds an HNSW index. Lunch is served at noon. Parking is free."
+        )
+
+        compressed, _ = compressor.compress("Milvus index embeddings", [_result("d1", content)])
+
+        assert compressed[0]["content"] == "Milvus stores the embeddings. Milvus builds an HNSW index."
+
+    def test_preserves_attribution(self, compressor):
+        content = "第一句无关。第二句提到缓存。第三句无关。第四句也无关。"
+        original = _result("d1", content, metadata={"title": "缓存设计"}, chunk_id="7")
+
+        compressed, _ = compressor.compress("缓存", [original])
+
+        item = compressed[0]
+        assert item["doc_id"] == "d1"
+        assert item["chunk_id"] == "7"
+        assert item["metadata"] == {"title": "缓存设计"}
+        assert item["original_length"] == len(content)
+        assert original["content"] == content
+
+    def test_short_passages_untouched(self, compressor):
+        results = [_result("d1", "很短的段落。"), _result("d2", "两句话。都很短但是超过二十个字符的长度限制了吧。")]
+
+        compressed, report = compressor.compress("段落", results)
+
+        assert compressed == results
+        assert report.ratio == 1.0
+
+    def test_no_overlap_keeps_lead(self, compressor):
+        content = "开头第一句。接着第二句。然后第三句。最后第四句。"
+
+        compressed, _ = compressor.compress("zebra", [_result("d1", content)])
+
+        assert compressed[0]["content"] == "开头第一句。接着第二句。"
+
+    def test_generation_stats(self, compressor):
+        compressor.record_generation(True, 800)
+        compressor.record_generation(False, 1000)
+        compressor.record_generation(False, 1200)
+
+        stats = compressor.get_stats()
+
+        assert stats["avg_generation_ms"] == {"compressed": 800.0, "uncompressed": 1100.0}
+        assert stats["generation_ms_change"] == -300.0
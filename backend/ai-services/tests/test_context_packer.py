@@ -0,0 +1,101 @@
+import pytest
+
+from services.qa.context_builder import ContextBuilder
+from services.qa.context_packer import ContextPacker, split_sentences
+from services.qa.token_estimator import TokenEstimator
+
+
+@pytest.fixture
+def estimator():
+    return TokenEstimator(use_tokenizer=False)
+
+
+@pytest.fixture
+def packer(estimator):
+    return ContextPacker(estimator=estimator)
+
+
+def _result(doc_id, content, score):
+    return {"doc_id": doc_id, "chunk_id": "0", "content": content, "score": score}
+
+
+class TestSplitSentences:
+
+    def test_round_trip(self):
+        text = "第一句。第二句！Third one. Fourth?\n最后"
+
+        sentences = split_sentences(text)
+
+        assert "".join(sentences) == text
+        assert sentences[0] == "第一句。"
+        assert len(sentences) == 6
+
+    def test_decimal_is_not_boundary(self):
+        assert split_sentences("版本2.0发布。") == ["版本2.0发布。"]
+
+
+class TestContextPacker:
+
+    def test_everything_fits(self, packer):
+        results = [_result("a", "短句一。", 0.9), _result("b", "短句二。", 0.5)]
+
+        packed = packer.pack(results, budget=100)
+
+        assert [p.index for p in packed] == [0, 1]
+        assert not any(p.trimmed for p in packed)
+
+    def test_trims_at_sentence_boundary_to_cover_more_passages(self, packer, estimator):
+        long_text = "".join(f"这是第{i}个较长的句子用于测试。" for i in range(10))
+        results = [_result("a", long_text, 1.0), _result("b", "另一个相关段落的内容。", 0.8)]
+        budget = estimator.count(long_text) // 2
+
+        packed = packer.pack(results, budget=budget)
+
+        assert [p.index for p in packed] == [0, 1]
+        assert packed[0].trimmed
+        assert packed[0].content.endswith("。")
+        assert long_text.startswith(packed[0].content)
+        assert sum(p.tokens + packer.overhead_tokens for p in packed) <= budget
+
+    def test_prefers_higher_score_when_only_one_fits(self, packer, estimator):
+        text = "单句不可再分割的段落内容"
+        results = [_result("low", text, 0.2), _result("high", text, 0.9)]
+
+        packed = packer.pack(results, budget=estimator.count(text) + packer.overhead_tokens)
+
+        assert [p.index for p in packed] == [1]
+
+    def test_hard_cut_without_sentence_boundary(self, packer):
+        packed = packer.pack([_result("a", "无" * 50, 1.0)], budget=100, max_chars=[10])
+
+        assert packed[0].content == "无" * 10 + "..."
+        assert packed[0].trimmed
+
+    def test_zero_budget(self, packer):
+        assert packer.pack([_result("a", "内容。", 1.0)], budget=0) == []
+
+
+class TestKnapsackContextBuilder:
+
+    def test_sources_match_packed_passages(self, estimator):
+        builder = ContextBuilder(max_context_tokens=60, packing="knapsack", estimator=estimator)
+        results = [
+            _result("a", "知识图谱描述实体之间的关系。它由节点和边组成。可用于问答。", 0.9),
+            _result("b", "向量检索根据语义相似度召回文档。", 0.7),
+            _result("c", "无关内容" * 30, 0.1),
+        ]
+
+        result = builder.build_context("什么是知识图谱", search_results=results)
+
+        assert [s.doc_id for s in result.sources] == ["a", "b"]
+        assert [s.source_id for s in result.sources] == ["[1]", "[2]"]
+        assert result.truncated
+        assert result.token_count <= 60
+        assert "[2] 向量检索" in result.context_text
+
+    def test_greedy_strategy_kept(self, estimator):
+        builder = ContextBuilder(max_context_tokens=1000, packing="greedy", estimator=estimator)
+
+        result = builder.build_context("q", search_results=[_result("a", "内容", 0.5)])
+
+        assert result.sources[0].content == "内容"
@@ -0,0 +1,144 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from services.cache.memory_cache import MemoryCache
+from services.qa.context_builder import ContextBuilder
+from services.qa.conversation_store import ConversationStore
+from services.qa.token_estimator import TokenEstimator
+
+
+def _store(redis=None, **kwargs):
+    if redis is None:
+        redis = MagicMock()
+        redis.is_connected = False
+    return ConversationStore(
+        memory=MemoryCache(max_size=100),
+        redis=redis,
+        ttl=60,
+        estimator=TokenEstimator(use_tokenizer=False),
+        **kwargs
+    )
+
+
+class TestConversationStore:
+
+    @pytest.mark.asyncio
+    async def test_append_keeps_recent_turns(self):
+        store = _store(recent_messages=4)
+        await store.append("c1", "什么是RAG？", "RAG是检索增强生成。它先检索再生成。")
+
+        state = await store.get("c1")
+
+        assert state.turns[0] == {"role": "user", "content": "什么是RAG？"}
+        assert state.summary == []
+        assert state.history_text == "用户: 什么是RAG？\n助手: RAG是检索增强生成。它先检索再生成。"
+        assert state.history_tokens > 0
+        assert await store.get("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_old_turns_fold_into_summary(self):
+        store = _store(recent_messages=2)
+        await store.append("c1", "第一个问题", "第一个回答的首句。后面的细节不进摘要。")
+        await store.append("c1", "第二个问题", "第二个回答。")
+
+        state = await store.get("c1")
+
+        assert state.summary == ["问: 第一个问题", "答: 第一个回答的首句。"]
+        assert [m["content"] for m in state.turns] == ["第二个问题", "第二个回答。"]
+        assert state.message_count == 4
+        assert state.history_text.startswith("早前对话摘要:\n问: 第一个问题\n答: 第一个回答的首句。\n用户: 第二个问题")
+
+    @pytest.mark.asyncio
+    async def test_history_size_is_bounded(self):
+        store = _store(recent_messages=2, summary_max_chars=60)
+        sizes = []
+        for i in range(30):
+            await store.append("c1", f"问题{i}" * 5, f"回答{i}的首句。" + "细节" * 50)
+            sizes.append((await store.get("c1")).history_tokens)
+
+        state = await store.get("c1")
+        assert state.message_count == 60
+        assert sum(len(line) for line in state.summary) <= 60
+        assert max(sizes[10:]) <= max(sizes[:10]) * 1.1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_appends_keep_all_turns(self):
+        saved = {}
+
+        async def slow_get(key):
+            await asyncio.sleep(0.01)
+            return saved.get(key)
+
+        async def set_(key, value, ttl=None):
+            saved[key] = value
+            return True
+
+        redis = MagicMock()
+        redis.is_connected = True
+        redis.get = AsyncMock(side_effect=slow_get)
+        redis.set = AsyncMock(side_effect=set_)
+        store = _store(redis=redis, recent_messages=10)
+        store.memory = MagicMock(get=MagicMock(return_value=None))
+
+        await asyncio.gather(
+            store.append("c1", "问题一", "回答一"),
+            store.append("c1", "问题二", "回答二")
+        )
+
+        state = await store.get("c1")
+        assert state.message_count == 4
+        assert store._conversation_locks == {}
+
+    @pytest.mark.asyncio
+    async def test_replace_and_delete(self):
+        store = _store()
+        await store.append("c1", "旧问题", "旧回答")
+
+        state = await store.replace("c1", [{"role": "user", "content": "客户端问题"}])
+        assert [m["content"] for m in state.turns] == ["客户端问题"]
+
+        await store.delete("c1")
+        assert await store.get("c1") is None
+
+    @pytest.mark.asyncio
+    async def test_reads_through_redis(self):
+        redis = MagicMock()
+        redis.is_connected = True
+        redis.get = AsyncMock(return_value=None)
+        redis.set = AsyncMock(return_value=True)
+        writer = _store(redis=redis)
+        await writer.append("c1", "问题", "回答")
+        saved = redis.set.call_args.args[1]
+
+        redis.get = AsyncMock(return_value=saved)
+        reader = _store(redis=redis)
+        state = await reader.get("c1")
+
+        assert state.history_text == "用户: 问题\n助手: 回答"
+        redis.get.assert_awaited_once_with("conversation:c1")
+
+    @pytest.mark.asyncio
+    async def test_context_builder_reuses_rendered_history(self):
+        store = _store()
+        state = await store.append("c1", "上一个问题", "上一个回答")
+        builder = ContextBuilder(max_context_tokens=1000)
+
+        result = builder.build_context(query="问题", search_results=[], conversation=state)
+
+        assert result.context_text == "【对话历史】\n用户: 上一个问题\n助手: 上一个回答"
+        assert result.token_count == state.history_tokens
+
+    @pytest.mark.asyncio
+    async def test_long_conversation_fits_history_budget(self):
+        store = _store()
+        builder = ContextBuilder()
+        for i in range(12):
+            state = await store.append("c1", f"第{i}个问题是什么？", f"第{i}个回答的首句。" + "详细说明" * 150)
+
+        result = builder.build_context(query="问题", search_results=[], conversation=state)
+
+        assert state.history_tokens < builder.max_context_tokens * 0.3
+        assert state.summary and state.turns
+        assert state.turns[-1]["content"].startswith("第11个回答")
+        assert result.context_text.startswith("【对话历史】\n早前对话摘要:")
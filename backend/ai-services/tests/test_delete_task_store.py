@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from services.cache.memory_cache import MemoryCache
+from services.embedding.delete_task_store import DeleteTaskStore
+
+
+def _task(task_id="t1", **fields):
+    return {"task_id": task_id, "status": "pending", "doc_count": 2, "errors": [], **fields}
+
+
+class TestDeleteTaskStore:
+
+    @pytest.mark.asyncio
+    async def test_save_and_get_returns_copy(self):
+        redis = MagicMock()
+        redis.is_connected = False
+        store = DeleteTaskStore(memory=MemoryCache(max_size=10), redis=redis, ttl=60)
+        task = _task()
+        await store.save(task)
+
+        loaded = await store.get("t1")
+        loaded["errors"].append("changed")
+
+        assert (await store.get("t1"))["errors"] == []
+        assert await store.get("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_other_worker_reads_through_redis(self):
+        redis = MagicMock()
+        redis.is_connected = True
+        redis.set = AsyncMock(return_value=True)
+        writer = DeleteTaskStore(memory=MemoryCache(max_size=10), redis=redis, ttl=60)
+        await writer.save(_task(status="completed"))
+        key, saved = redis.set.call_args.args
+        assert key == "delete_task:t1"
+        assert redis.set.call_args.kwargs == {"ttl": 60}
+
+        redis.get = AsyncMock(return_value=saved)
+        reader = DeleteTaskStore(memory=MemoryCache(max_size=10), redis=redis, ttl=60)
+
+        assert (await reader.get("t1"))["status"] == "completed"
+        redis.get.assert_awaited_once_with("delete_task:t1")
@@ -0,0 +1,117 @@
+import time
+import pytest
+from unittest.mock import AsyncMock
+
+from services.kg.graph.entity_linker import AhoCorasick, EntityLinker
+
+
+def _entity(entity_id, name, aliases=None, entity_type="Concept"):
+    return {"id": entity_id, "name": name, "type": entity_type, "aliases": aliases or []}
+
+
+class TestAhoCorasick:
+
+    def test_finds_overlapping_patterns(self):
+        automaton = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+
+        matches = sorted(automaton.iter_matches("ushers"))
+
+        assert matches == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+    def test_empty_automaton(self):
+        assert list(AhoCorasick().iter_matches("text")) == []
+
+
+class TestEntityLinker:
+
+    @pytest.fixture
+    def linker(self):
+        return EntityLinker(min_length=2, delta_limit=4, refresh_interval=0)
+
+    @pytest.fixture
+    def repository(self):
+        rows = [
+            _entity("e1", "知识图谱", aliases=["KG"]),
+            _entity("e2", "图谱"),
+            _entity("e3", "Neo4j", entity_type="Product"),
+        ]
+        repository = AsyncMock()
+        repository.list_entity_names.side_effect = lambda skip, limit: rows[skip:skip + limit]
+        return repository
+
+    @pytest.mark.asyncio
+    async def test_load_and_link_longest_match(self, linker, repository):
+        assert await linker.load(repository, batch_size=2) == 3
+
+        mentions = linker.link("如何用NEO4J构建知识图谱？")
+
+        assert [(m.entity_id, m.surface) for m in mentions] == [("e3", "neo4j"), ("e1", "知识图谱")]
+        assert {m.entity_id for m in linker.find_all("知识图谱")} == {"e1", "e2"}
+
+    @pytest.mark.asyncio
+    async def test_latin_names_respect_word_boundaries(self, linker, repository):
+        await linker.load(repository)
+
+        assert linker.link("KGs and ACKGB") == []
+        assert [m.entity_id for m in linker.link("what is a kg")] == ["e1"]
+
+    def test_incremental_upsert_and_remove(self, linker):
+        linker.upsert(_entity("e1", "向量检索"))
+        assert [m.entity_id for m in linker.link("混合向量检索")] == ["e1"]
+
+        linker.upsert(_entity("e1", "稠密检索"))
+        assert linker.link("混合向量检索") == []
+        assert [m.entity_id for m in linker.link("稠密检索")] == ["e1"]
+
+        linker.remove("e1")
+        assert linker.link("稠密检索") == []
+
+    def test_delta_merges_into_main(self, linker):
+        for i in range(6):
+            linker.upsert(_entity(f"e{i}", f"实体{i}号"))
+
+        assert linker.get_stats()["pending"] == 6
+        assert [m.entity_id for m in linker.link("实体5号和实体0号")] == ["e5", "e0"]
+        assert linker.get_stats()["pending"] == 0
+
+        linker.upsert(_entity("e6", "实体6号"))
+        assert [m.entity_id for m in linker.link("实体6号")] == ["e6"]
+        assert linker.get_stats()["pending"] == 1
+
+    def test_same_name_entities_all_linked(self, linker):
+        linker.upsert(_entity("a", "苹果", entity_type="Organization"))
+        linker.upsert(_entity("b", "苹果", entity_type="Product"))
+
+        assert {m.entity_id for m in linker.link("苹果发布会")} == {"a", "b"}
+
+    def test_linking_large_dictionary_is_fast(self, linker):
+        for i in range(5000):
+            linker.upsert(_entity(f"e{i}", f"entity{i}"))
+        query = "compare entity42 with entity4999 and unknown things " * 2
+
+        start = time.perf_counter()
+        for _ in range(100):
+            mentions = linker.link(query)
+        per_query_ms = (time.perf_counter() - start) * 10
+
+        assert {m.entity_id for m in mentions} == {"e42", "e4999"}
+        assert per_query_ms < 5
+
+    @pytest.mark.asyncio
+    async def test_refresh_retries_after_failed_startup_load(self):
+        linker = EntityLinker(min_length=2, refresh_interval=300, retry_interval=30)
+        linker.load = AsyncMock(side_effect=ConnectionError("neo4j unavailable"))
+
+        linker.schedule_refresh()
+        await linker._refresh_task
+        assert linker.load.await_count == 1
+        assert not linker.loaded
+
+        linker.schedule_refresh()
+        assert linker.load.await_count == 1
+
+        linker._failed_at -= 31
+        linker.load = AsyncMock(return_value=0)
+        linker.schedule_refresh()
+        await linker._refresh_task
+        linker.load.assert_awaited_once()
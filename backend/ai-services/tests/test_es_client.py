@@ -112,3 +112,123 @@ class TestElasticsearchClient:
                 success_count = client.bulk_index(documents)
                 
                 assert success_count == 3
+    
+    def _make_client(self):
+        from services.embedding.es_client import ElasticsearchClient
+        
+        with patch('services.embedding.es_client.settings') as mock_settings:
+            mock_settings.ES_HOST = "localhost"
+            mock_settings.ES_PORT = 9200
+            mock_settings.ES_SCHEME = "http"
+            mock_settings.ES_INDEX = "doc_index"
+            mock_settings.ES_USERNAME = None
+            mock_settings.ES_PASSWORD = None
+            return ElasticsearchClient()
+    
+    @staticmethod
+    def _fake_streaming_bulk(client, actions, **kwargs):
+        for action in actions:
+            if action["_id"].endswith("bad"):
+                yield False, {"index": {"_id": action["_id"], "status": 400}}
+            else:
+                yield True, {"index": {"_id": action["_id"], "status": 201}}
+    
+    def test_bulk_load_toggles_and_restores_settings(self, mock_es_client):
+        client = self._make_client()
+        mock_es_client.indices.get_settings.return_value = {
+            "doc_index": {"settings": {"index.number_of_replicas": "1"}}
+        }
+        documents = (
+            {"doc_id": "doc1", "chunk_id": f"chunk{i}", "content": "x"} for i in range(5)
+        )
+        
+        with patch('services.embedding.es_client.streaming_bulk', side_effect=self._fake_streaming_bulk):
+            report = client.bulk_load(documents, chunk_size=2, thread_count=1)
+        
+        assert report.indexed == 5
+        assert report.failed == 0
+        calls = mock_es_client.indices.put_settings.call_args_list
+        assert calls[0].kwargs["settings"] == {"index": {"refresh_interval": "-1", "number_of_replicas": 0}}
+        assert calls[1].kwargs["settings"] == {"index": {"refresh_interval": None, "number_of_replicas": "1"}}
+        mock_es_client.indices.refresh.assert_called_once_with(index="doc_index")
+    
+    def test_bulk_load_parallel_reports_failures(self, mock_es_client):
+        client = self._make_client()
+        mock_es_client.indices.get_settings.return_value = {}
+        documents = [{"doc_id": "doc1", "chunk_id": f"chunk{i}"} for i in range(9)]
+        documents.append({"doc_id": "doc1", "chunk_id": "bad"})
+        
+        with patch('services.embedding.es_client.streaming_bulk', side_effect=self._fake_streaming_bulk) as mock_stream:
+            report = client.bulk_load(documents, chunk_size=3, thread_count=2)
+        
+        assert mock_stream.call_count == 4
+        assert report.indexed == 9
+        assert report.failed == 1
+        assert report.errors[0]["index"]["_id"] == "doc1_bad"
+        assert report.to_dict()["docs_per_second"] >= 0
+    
+    def test_bulk_load_restores_settings_on_error(self, mock_es_client):
+        client = self._make_client()
+        mock_es_client.indices.get_settings.return_value = {}
+        
+        with patch('services.embedding.es_client.streaming_bulk', side_effect=RuntimeError("down")):
+            with pytest.raises(RuntimeError):
+                client.bulk_load([{"doc_id": "d", "chunk_id": "c"}], thread_count=1)
+        
+        assert mock_es_client.indices.put_settings.call_count == 2
+    
+    def test_lean_search_body(self, mock_es_client):
+        client = self._make_client()
+        mock_es_client.search.return_value = {"hits": {"hits": []}}
+        
+        client.search("test", top_k=20, filters={"metadata.category": ["a", "b"]}, lean=True)
+        
+        body = mock_es_client.search.call_args.kwargs["body"]
+        assert body["_source"] == {"includes": client.LEAN_SOURCE_FIELDS}
+        assert body["track_total_hits"] is False
+        assert body["query"]["bool"]["filter"] == [{"terms": {"metadata.category": ["a", "b"]}}]
+    
+    def test_msearch_pairs_headers_and_isolates_errors(self, mock_es_client):
+        client = self._make_client()
+        hit = {"_id": "doc1_c1", "_score": 1.5, "_source": {"doc_id": "doc1", "chunk_id": "c1"}}
+        mock_es_client.msearch.return_value = {
+            "responses": [
+                {"hits": {"hits": [hit]}},
+                {"error": {"type": "search_phase_execution_exception"}}
+            ]
+        }
+        
+        results = client.msearch(["first", "second"], top_k=5)
+        
+        searches = mock_es_client.msearch.call_args.kwargs["body"]
+        assert searches[0] == {"index": "doc_index"}
+        assert searches[1]["query"]["bool"]["must"][0]["multi_match"]["query"] == "first"
+        assert searches[3]["size"] == 5
+        assert results[0][0]["_id"] == "doc1_c1"
+        assert results[1] == []
+    
+    def test_delete_documents_submits_sliced_task(self, mock_es_client):
+        client = self._make_client()
+        mock_es_client.delete_by_query.return_value = {"task": "node1:42"}
+        
+        task_id = client.delete_documents(["doc1", "doc2"], slices="4")
+        
+        assert task_id == "node1:42"
+        kwargs = mock_es_client.delete_by_query.call_args.kwargs
+        assert kwargs["body"] == {"query": {"terms": {"doc_id": ["doc1", "doc2"]}}}
+        assert kwargs["slices"] == "4"
+        assert kwargs["wait_for_completion"] is False
+    
+    def test_get_task_reports_progress(self, mock_es_client):
+        client = self._make_client()
+        mock_es_client.tasks.get.return_value = {
+            "completed": True,
+            "task": {"status": {"total": 120, "deleted": 120}},
+            "response": {"failures": []}
+        }
+        
+        status = client.get_task("node1:42")
+        
+        assert status["completed"] is True
+        assert status["deleted"] == 120
+        assert status["failures"] == 0
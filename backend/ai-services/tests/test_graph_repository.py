@@ -472,6 +472,7 @@ class TestIndexManager:
         assert result["entity_fulltext"] is True
         assert result["relation_id_index"] is True
         assert result["relation_type_index"] is True
+        assert result["chunk_doc_index"] is True
 
     @pytest.mark.asyncio
     async def test_list_indexes(self, neo4j_client):
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from services.embedding.index_config import VectorIndexConfig, VectorIndexType
+from services.embedding.index_tuner import IndexTuner, TuningResult
+
+
+class FakeMilvusClient:
+    """按nprobe模拟召回：nprobe越大，返回的精确结果越多"""
+    
+    def __init__(self, base_vectors, base_ids, index_config):
+        self.base_vectors = base_vectors
+        self.base_ids = base_ids
+        self.index_config = index_config
+    
+    def search(self, query_vector, top_k=10, search_params=None):
+        truth = IndexTuner.exact_top_k(
+            self.base_vectors, self.base_ids, np.array([query_vector]), top_k
+        )[0]
+        nprobe = search_params["params"].get("nprobe", top_k)
+        keep = min(top_k, nprobe)
+        hits = truth[:keep] + ["noise"] * (top_k - keep)
+        return [{"id": hit_id, "score": 0.0} for hit_id in hits]
+
+
+class TestVectorIndexConfig:
+    
+    def test_hnsw_params(self):
+        config = VectorIndexConfig(index_type=VectorIndexType.HNSW, hnsw_m=32, ef=16)
+        
+        assert config.index_params()["params"] == {"M": 32, "efConstruction": 200}
+        assert config.search_params(top_k=50)["params"] == {"ef": 50}
+    
+    def test_ivf_pq_params(self):
+        config = VectorIndexConfig(index_type=VectorIndexType.IVF_PQ, nlist=256, pq_m=8)
+        
+        params = config.index_params()
+        assert params["index_type"] == "IVF_PQ"
+        assert params["params"] == {"nlist": 256, "m": 8, "nbits": 8}
+    
+    def test_nprobe_capped_by_nlist(self):
+        config = VectorIndexConfig(index_type=VectorIndexType.IVF_SQ8, nlist=8, nprobe=32)
+        
+        assert config.search_params()["params"] == {"nprobe": 8}
+    
+    def test_recommended_nlist(self):
+        assert VectorIndexConfig.recommended_nlist(0) == 1
+        assert VectorIndexConfig.recommended_nlist(1_000_000) == 4000
+
+
+class TestIndexTuner:
+    
+    @pytest.fixture
+    def dataset(self):
+        rng = np.random.default_rng(0)
+        base = rng.normal(size=(200, 16)).astype(np.float32)
+        ids = [f"v{i}" for i in range(200)]
+        return base, ids
+    
+    def test_exact_top_k_matches_full_sort(self, dataset):
+        base, ids = dataset
+        queries = base[:5]
+        
+        truth = IndexTuner.exact_top_k(base, ids, queries, top_k=10)
+        
+        normed = base / np.linalg.norm(base, axis=1, keepdims=True)
+        for qi, row in enumerate(truth):
+            expected = np.argsort(-(normed @ normed[qi]))[:10]
+            assert row == [ids[i] for i in expected]
+            assert row[0] == ids[qi]
+    
+    def test_candidate_params(self):
+        ivf = VectorIndexConfig(nlist=16)
+        hnsw = VectorIndexConfig(index_type=VectorIndexType.HNSW)
+        
+        assert IndexTuner.candidate_params(ivf, 10)[-1] == {"nprobe": 16}
+        assert all(p["ef"] >= 20 for p in IndexTuner.candidate_params(hnsw, 20))
+    
+    def test_recommend_prefers_lowest_p95_meeting_target(self):
+        results = [
+            TuningResult({"nprobe": 4}, recall=0.80, p50_latency_ms=1.0, p95_latency_ms=1.5),
+            TuningResult({"nprobe": 16}, recall=0.96, p50_latency_ms=2.0, p95_latency_ms=3.0),
+            TuningResult({"nprobe": 64}, recall=0.99, p50_latency_ms=5.0, p95_latency_ms=8.0),
+        ]
+        
+        best, met = IndexTuner.recommend(results, target_recall=0.95)
+        
+        assert met is True
+        assert best.search_params == {"nprobe": 16}
+    
+    def test_recommend_falls_back_to_best_recall(self):
+        results = [
+            TuningResult({"nprobe": 4}, recall=0.50, p50_latency_ms=1.0, p95_latency_ms=1.5),
+            TuningResult({"nprobe": 8}, recall=0.70, p50_latency_ms=2.0, p95_latency_ms=2.5),
+        ]
+        
+        best, met = IndexTuner.recommend(results, target_recall=0.95)
+        
+        assert met is False
+        assert best.search_params == {"nprobe": 8}
+    
+    def test_tune_end_to_end(self, dataset):
+        base, ids = dataset
+        client = FakeMilvusClient(base, ids, VectorIndexConfig(nlist=32))
+        tuner = IndexTuner(client, top_k=10)
+        
+        report = tuner.tune(base, ids, base[:10], target_recall=0.9)
+        
+        assert report.target_met is True
+        assert report.recommended.recall >= 0.9
+        assert report.recommended.search_params["nprobe"] >= 9
+        assert report.to_dict()["query_count"] == 10
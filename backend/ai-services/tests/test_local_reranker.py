@@ -0,0 +1,33 @@
+import pytest
+
+from services.search.local_reranker import LocalReranker
+
+
+class TestLocalReranker:
+    
+    @pytest.fixture
+    def reranker(self):
+        return LocalReranker()
+    
+    def test_phrase_match_ranks_first(self, reranker):
+        texts = [
+            "图谱相关的知识与构建",
+            "知识图谱构建方法综述",
+            "向量检索与混合检索",
+        ]
+        
+        scores = reranker.score("知识图谱构建", texts)
+        
+        assert scores.argmax() == 1
+        assert scores[2] == 0
+    
+    def test_rerank_keeps_fused_order_on_ties(self, reranker):
+        documents = [{"chunk_id": str(i), "content": "unrelated text"} for i in range(3)]
+        
+        result = reranker.rerank("graph", documents, top_n=2)
+        
+        assert [d["chunk_id"] for d in result] == ["0", "1"]
+        assert result[0]["rerank_source"] == "local"
+    
+    def test_empty_query(self, reranker):
+        assert reranker.score("", ["text"]).tolist() == [0.0]
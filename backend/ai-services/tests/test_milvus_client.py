@@ -0,0 +1,144 @@
+import pytest
+from unittest.mock import MagicMock
+
+
+def _make_hit(hit_id, score, doc_id, chunk_id, content=""):
+    hit = MagicMock()
+    hit.id = hit_id
+    hit.score = score
+    hit.entity.get.side_effect = {
+        "doc_id": doc_id,
+        "chunk_id": chunk_id,
+        "content": content
+    }.get
+    return hit
+
+
+class TestMilvusClient:
+    
+    @pytest.fixture
+    def mock_collection(self):
+        return MagicMock()
+    
+    @pytest.fixture
+    def client(self, mock_collection):
+        from services.embedding.milvus_client import MilvusClient
+        
+        client = MilvusClient()
+        client._collection = mock_collection
+        return client
+    
+    def test_search_many_single_round_trip(self, client, mock_collection):
+        mock_collection.search.return_value = [
+            [_make_hit("1", 0.9, "doc1", "c1"), _make_hit("2", 0.8, "doc2", "c2")],
+            [_make_hit("3", 0.7, "doc3", "c3")],
+        ]
+        
+        results = client.search_many([[0.1, 0.2], [0.3, 0.4]], top_k=2)
+        
+        mock_collection.search.assert_called_once()
+        assert mock_collection.search.call_args.kwargs["data"] == [[0.1, 0.2], [0.3, 0.4]]
+        assert len(results) == 2
+        assert [h["doc_id"] for h in results[0]] == ["doc1", "doc2"]
+        assert results[1][0]["chunk_id"] == "c3"
+    
+    def test_search_many_empty(self, client, mock_collection):
+        assert client.search_many([]) == []
+        mock_collection.search.assert_not_called()
+    
+    def test_search_wraps_search_many(self, client, mock_collection):
+        mock_collection.search.return_value = [[_make_hit("1", 0.9, "doc1", "c1", "内容")]]
+        
+        results = client.search([0.1, 0.2], top_k=1)
+        
+        assert len(results) == 1
+        assert results[0]["content"] == "内容"
+        assert mock_collection.search.call_args.kwargs["data"] == [[0.1, 0.2]]
+    
+    @pytest.mark.asyncio
+    async def test_search_many_async(self, client, mock_collection):
+        mock_collection.search.return_value = [[], [_make_hit("1", 0.5, "doc1", "c1")]]
+        
+        results = await client.search_many_async([[0.1], [0.2]], top_k=3)
+        
+        assert results[0] == []
+        assert results[1][0]["doc_id"] == "doc1"
+    
+    def test_search_pushes_down_filters(self, client, mock_collection):
+        mock_collection.search.return_value = [[]]
+        
+        client.search(
+            [0.1],
+            top_k=5,
+            doc_ids=["doc1", "doc2"],
+            filters={"metadata.category": "hr", "tags": ["ignored"]}
+        )
+        
+        kwargs = mock_collection.search.call_args.kwargs
+        assert kwargs["expr"] == "category == {category_values} and doc_id in {doc_id_values}"
+        assert kwargs["expr_params"] == {"category_values": "hr", "doc_id_values": ["doc1", "doc2"]}
+    
+    def test_search_with_empty_filter_values_skips_milvus(self, client, mock_collection):
+        results = client.search_many([[0.1], [0.2]], top_k=5, filters={"tenant": []})
+        
+        assert results == [[], []]
+        mock_collection.search.assert_not_called()
+    
+    def test_insert_writes_metadata_columns(self, client, mock_collection):
+        client.insert([{
+            "doc_id": "doc1",
+            "chunk_id": "c1",
+            "content": "内容",
+            "metadata": {"category": "hr", "tenant": "t1"},
+            "embedding": [0.1, 0.2]
+        }])
+        
+        data = mock_collection.insert.call_args.args[0]
+        assert data[4:7] == [["hr"], ["t1"], [""]]
+        assert data[7] == [[0.1, 0.2]]
+    
+    def test_delete_by_doc_ids_batches_and_flushes_once(self, client, mock_collection):
+        mock_collection.delete.return_value = MagicMock(delete_count=3)
+        
+        deleted = client.delete_by_doc_ids(["d1", "d2", "d3", "d4", "d5"], batch_size=2)
+        
+        assert deleted == 9
+        assert mock_collection.delete.call_count == 3
+        first = mock_collection.delete.call_args_list[0]
+        assert first.args[0] == "doc_id in {doc_ids}"
+        assert first.kwargs["expr_params"] == {"doc_ids": ["d1", "d2"]}
+        mock_collection.flush.assert_called_once()
+
+
+class TestVectorFilters:
+    
+    def test_normalize_filters_intersects_doc_ids(self):
+        from services.embedding.vector_filters import normalize_filters
+        
+        conditions = normalize_filters({"doc_id": ["a", "b"], "tenant": "t1"}, doc_ids=["b", "c"])
+        
+        assert conditions == {"doc_id": ["b"], "tenant": ["t1"]}
+    
+    def test_partition_key_uses_literal(self):
+        from services.embedding.vector_filters import build_milvus_expr
+        
+        expr, params = build_milvus_expr(
+            {"tenant": ["t1", "t2"], "doc_type": ["pdf"]},
+            partition_key="tenant"
+        )
+        
+        assert expr == 'tenant in ["t1", "t2"] and doc_type == {doc_type_values}'
+        assert params == {"doc_type_values": "pdf"}
+    
+    def test_no_conditions(self):
+        from services.embedding.vector_filters import build_milvus_expr
+        
+        assert build_milvus_expr({}) == (None, {})
+    
+    def test_empty_values_match_nothing(self):
+        from services.embedding.vector_filters import build_milvus_expr
+        
+        expr, params = build_milvus_expr({"tenant": [], "doc_type": []}, partition_key="tenant")
+        
+        assert expr == "tenant in [] and doc_type in []"
+        assert params == {}
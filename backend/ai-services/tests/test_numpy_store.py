@@ -0,0 +1,171 @@
+import numpy as np
+import pytest
+
+from services.embedding.numpy_store import NumpyVectorStore
+
+
+def _vectors(rng, n, dim, doc_id, **metadata):
+    return [
+        {
+            "doc_id": doc_id,
+            "chunk_id": f"{doc_id}_c{i}",
+            "content": f"{doc_id} 内容 {i}",
+            "metadata": metadata,
+            "embedding": rng.normal(size=dim).tolist()
+        }
+        for i in range(n)
+    ]
+
+
+class TestNumpyVectorStore:
+    
+    @pytest.fixture
+    def rng(self):
+        return np.random.default_rng(7)
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        return NumpyVectorStore(data_dir=str(tmp_path), collection_name="test", dimension=8)
+    
+    def test_search_matches_brute_force(self, store, rng):
+        vectors = _vectors(rng, 50, 8, "doc1")
+        store.insert(vectors)
+        query = rng.normal(size=8)
+        
+        hits = store.search(query.tolist(), top_k=5)
+        
+        matrix = np.array([v["embedding"] for v in vectors])
+        cosine = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+        expected = [vectors[i]["chunk_id"] for i in np.argsort(-cosine)[:5]]
+        assert [h["chunk_id"] for h in hits] == expected
+        assert hits[0]["score"] == pytest.approx(cosine.max(), rel=1e-5)
+    
+    def test_search_many_per_query(self, store, rng):
+        vectors = _vectors(rng, 20, 8, "doc1")
+        store.insert(vectors)
+        
+        results = store.search_many([vectors[3]["embedding"], vectors[7]["embedding"]], top_k=3)
+        
+        assert [r[0]["chunk_id"] for r in results] == ["doc1_c3", "doc1_c7"]
+    
+    def test_filters_and_doc_ids(self, store, rng):
+        store.insert(_vectors(rng, 10, 8, "doc1", category="hr", tenant="t1"))
+        store.insert(_vectors(rng, 10, 8, "doc2", category="it", tenant="t1"))
+        query = rng.normal(size=8).tolist()
+        
+        hits = store.search(query, top_k=20, filters={"metadata.category": "it"})
+        assert {h["doc_id"] for h in hits} == {"doc2"}
+        assert hits[0]["metadata"]["tenant"] == "t1"
+        
+        assert {h["doc_id"] for h in store.search(query, top_k=20, doc_ids=["doc1"])} == {"doc1"}
+        assert store.search(query, top_k=5, filters={"tenant": "t2"}) == []
+    
+    def test_delete_by_doc_id(self, store, rng):
+        store.insert(_vectors(rng, 10, 8, "doc1"))
+        store.insert(_vectors(rng, 40, 8, "doc2"))
+        
+        store.delete_by_doc_id("doc1")
+        
+        hits = store.search(rng.normal(size=8).tolist(), top_k=50)
+        assert len(hits) == 40
+        assert store.num_entities == 40
+    
+    def test_delete_by_doc_ids(self, store, rng):
+        for doc_id in ("doc1", "doc2", "doc3"):
+            store.insert(_vectors(rng, 5, 8, doc_id))
+        
+        assert store.delete_by_doc_ids(["doc1", "doc3", "missing"]) == 10
+        assert {h["doc_id"] for h in store.search(rng.normal(size=8).tolist(), top_k=15)} == {"doc2"}
+    
+    def test_fetch_embeddings(self, store, rng):
+        vectors = _vectors(rng, 3, 8, "doc1")
+        store.insert(vectors)
+        store.insert(_vectors(rng, 2, 8, "doc2"))
+        
+        fetched = store.fetch_embeddings([("doc1", "doc1_c1"), ("doc2", "doc1_c1"), ("doc1", "missing")])
+        
+        assert list(fetched) == [("doc1", "doc1_c1")]
+        expected = np.asarray(vectors[1]["embedding"])
+        assert np.allclose(fetched[("doc1", "doc1_c1")], expected / np.linalg.norm(expected), atol=1e-6)
+    
+    def test_compaction_after_large_delete(self, store, rng):
+        store.insert(_vectors(rng, 10, 8, "doc1"))
+        store.insert(_vectors(rng, 10, 8, "doc2"))
+        
+        store.delete_by_doc_id("doc1")
+        
+        assert store._count == 10
+        assert store.search(rng.normal(size=8).tolist(), top_k=3)[0]["doc_id"] == "doc2"
+    
+    def test_persistence_and_reload(self, tmp_path, rng):
+        store = NumpyVectorStore(data_dir=str(tmp_path), collection_name="persist", dimension=8)
+        vectors = _vectors(rng, 30, 8, "doc1", doc_type="pdf")
+        ids = store.insert(vectors)
+        store.delete_by_doc_id("missing")
+        
+        reloaded = NumpyVectorStore(data_dir=str(tmp_path), collection_name="persist", dimension=8)
+        hits = reloaded.search(vectors[5]["embedding"], top_k=1)
+        
+        assert hits[0]["id"] == ids[5]
+        assert hits[0]["metadata"]["doc_type"] == "pdf"
+        assert isinstance(reloaded._vectors, np.memmap)
+    
+    def test_small_batches_append_to_log(self, tmp_path, rng):
+        store = NumpyVectorStore(data_dir=str(tmp_path), collection_name="log", dimension=8)
+        store.insert(_vectors(rng, 2, 8, "doc0"))
+        snapshot = store.tables_path.read_bytes()
+        
+        vectors = []
+        for i in range(1, 20):
+            batch = _vectors(rng, 2, 8, f"doc{i}")
+            store.insert(batch)
+            vectors.extend(batch)
+        store.delete_by_doc_id("doc3")
+        
+        assert store.tables_path.read_bytes() == snapshot
+        assert len(store.log_path.read_text(encoding="utf-8").splitlines()) == 20
+        
+        with open(store.log_path, "a", encoding="utf-8") as f:
+            f.write('{"generation": 1, "op": "ins')
+        reloaded = NumpyVectorStore(data_dir=str(tmp_path), collection_name="log", dimension=8)
+        
+        assert reloaded.num_entities == 38
+        assert reloaded.search(vectors[10]["embedding"], top_k=1)[0]["chunk_id"] == vectors[10]["chunk_id"]
+        assert not reloaded.search(vectors[4]["embedding"], top_k=40, doc_ids=["doc3"])
+    
+    def test_log_folds_into_snapshot(self, tmp_path, rng):
+        store = NumpyVectorStore(data_dir=str(tmp_path), collection_name="fold", dimension=8)
+        store.LOG_COMPACT_BYTES = 0
+        
+        for i in range(10):
+            store.insert(_vectors(rng, 3, 8, f"doc{i}"))
+        
+        assert store.log_path.stat().st_size <= store.tables_path.stat().st_size
+        reloaded = NumpyVectorStore(data_dir=str(tmp_path), collection_name="fold", dimension=8)
+        assert reloaded.num_entities == 30
+        assert reloaded._ids == store._ids
+    
+    def test_grows_beyond_initial_capacity(self, tmp_path, rng):
+        store = NumpyVectorStore(data_dir=str(tmp_path), collection_name="grow", dimension=8)
+        store.INITIAL_CAPACITY = 4
+        
+        store.insert(_vectors(rng, 3, 8, "doc1"))
+        store.insert(_vectors(rng, 7, 8, "doc2"))
+        
+        assert store._vectors.shape[0] >= 10
+        assert len(store.search(rng.normal(size=8).tolist(), top_k=20)) == 10
+    
+    def test_dimension_mismatch(self, store):
+        with pytest.raises(ValueError):
+            store.insert([{"doc_id": "d", "chunk_id": "c", "content": "", "embedding": [0.1, 0.2]}])
+    
+    @pytest.mark.asyncio
+    async def test_async_interface(self, store, rng):
+        vectors = _vectors(rng, 5, 8, "doc1")
+        await store.insert_async(vectors)
+        
+        hits = await store.search_async(vectors[0]["embedding"], top_k=1)
+        assert hits[0]["chunk_id"] == "doc1_c0"
+        
+        await store.delete_by_doc_id_async("doc1")
+        assert await store.search_many_async([vectors[0]["embedding"]], top_k=1) == [[]]
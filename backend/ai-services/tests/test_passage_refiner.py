@@ -0,0 +1,196 @@
+import pytest
+import numpy as np
+
+from services.search.passage_refiner import PassageRefiner, text_overlap
+
+
+class FakeVectorStore:
+
+    def __init__(self, vectors=None, error=None):
+        self.vectors = vectors or {}
+        self.error = error
+        self.requested = None
+
+    async def fetch_embeddings_async(self, keys):
+        self.requested = keys
+        if self.error:
+            raise self.error
+        return {key: self.vectors[key] for key in keys if key in self.vectors}
+
+
+def _result(doc_id, chunk_id, content, score, start=None, end=None):
+    metadata = {"category": "tech"}
+    if start is not None:
+        metadata.update(start_offset=start, end_offset=end)
+    return {"doc_id": doc_id, "chunk_id": chunk_id, "content": content, "rrf_score": score, "metadata": metadata}
+
+
+class TestTextOverlap:
+
+    def test_longest_suffix_prefix(self):
+        assert text_overlap("abcdefgh", "efghijk", 3) == 4
+
+    def test_below_minimum(self):
+        assert text_overlap("abcdefgh", "ghijk", 3) == 0
+        assert text_overlap("abc", "xyz", 2) == 0
+
+
+class TestPassageMerge:
+
+    @pytest.fixture
+    def refiner(self):
+        return PassageRefiner(min_overlap=4, max_chars=200, enabled=True, vector_store=FakeVectorStore())
+
+    def test_merges_overlapping_offsets(self, refiner):
+        results = [
+            _result("d1", "c2", "efghijkl", 0.9, start=4, end=12),
+            _result("d2", "x", "other doc", 0.8),
+            _result("d1", "c1", "abcdefgh", 0.7, start=0, end=8),
+        ]
+
+        merged = refiner.merge(results)
+
+        assert [p["doc_id"] for p in merged] == ["d1", "d2"]
+        assert merged[0]["content"] == "abcdefghijkl"
+        assert merged[0]["chunk_id"] == "c2"
+        assert merged[0]["merged_chunk_ids"] == ["c2", "c1"]
+        assert merged[0]["metadata"]["start_offset"] == 0
+        assert merged[0]["metadata"]["end_offset"] == 12
+        assert "merged_count" not in merged[1]
+
+    def test_distant_offsets_stay_separate(self, refiner):
+        results = [
+            _result("d1", "c1", "abcdefgh", 0.9, start=0, end=8),
+            _result("d1", "c5", "efghijkl", 0.8, start=40, end=48),
+        ]
+
+        assert len(refiner.merge(results)) == 2
+
+    def test_distant_chunk_with_repeated_header_stays_separate(self, refiner):
+        results = [
+            _result("d1", "c1", "第一章 概述", 0.9, start=0, end=6),
+            _result("d1", "c9", "第一章 概述中提到的方法在本节展开说明，包括实现细节", 0.8, start=5000, end=5030),
+        ]
+
+        merged = refiner.merge(results)
+
+        assert [p["chunk_id"] for p in merged] == ["c1", "c9"]
+        assert merged[0]["metadata"]["end_offset"] == 6
+
+    def test_overlapping_offsets_slice_without_text_match(self, refiner):
+        results = [
+            _result("d1", "c1", "ABCDEFGHIJ", 0.9, start=0, end=10),
+            _result("d1", "c2", "HIJKLMNOPQ", 0.8, start=7, end=17),
+        ]
+
+        merged = refiner.merge(results)
+
+        assert len(merged) == 1
+        assert merged[0]["content"] == "ABCDEFGHIJKLMNOPQ"
+        assert merged[0]["metadata"]["end_offset"] == 17
+
+    def test_text_overlap_without_offsets_bridges_passages(self, refiner):
+        results = [
+            _result("d1", "c1", "aaaa1111bbbb", 0.9),
+            _result("d1", "c3", "cccc3333dddd", 0.8),
+            _result("d1", "c2", "bbbb2222cccc", 0.7),
+        ]
+
+        merged = refiner.merge(results)
+
+        assert len(merged) == 1
+        assert merged[0]["content"] == "aaaa1111bbbb2222cccc3333dddd"
+        assert merged[0]["merged_count"] == 3
+
+    def test_empty_content_is_not_merged(self, refiner):
+        results = [
+            _result("d1", "c1", "abcdefgh", 0.9, start=0, end=8),
+            _result("d1", "c5", "", 0.8, start=40, end=40),
+            _result("d1", "c6", "   ", 0.7),
+        ]
+
+        merged = refiner.merge(results)
+
+        assert [p["chunk_id"] for p in merged] == ["c1", "c5", "c6"]
+        assert "merged_count" not in merged[0]
+
+    def test_respects_max_chars(self):
+        refiner = PassageRefiner(min_overlap=4, max_chars=10, enabled=True, vector_store=FakeVectorStore())
+        results = [
+            _result("d1", "c1", "abcdefgh", 0.9),
+            _result("d1", "c2", "efghijkl", 0.8),
+        ]
+
+        assert len(refiner.merge(results)) == 2
+
+
+class TestMMR:
+
+    def test_penalizes_near_duplicates(self):
+        refiner = PassageRefiner(lambda_=0.5, enabled=True, vector_store=FakeVectorStore())
+        passages = [
+            {"chunk_id": "a", "rrf_score": 1.0},
+            {"chunk_id": "a2", "rrf_score": 0.9},
+            {"chunk_id": "b", "rrf_score": 0.8},
+        ]
+        embeddings = np.array([[1, 0], [1, 0.01], [0, 1]], dtype=np.float32)
+
+        selected = refiner.mmr(passages, embeddings, top_k=2)
+
+        assert [p["chunk_id"] for p in selected] == ["a", "b"]
+        assert "mmr_score" in selected[0]
+
+    def test_lambda_one_keeps_relevance_order(self):
+        refiner = PassageRefiner(lambda_=1.0, enabled=True, vector_store=FakeVectorStore())
+        passages = [{"chunk_id": str(i), "rrf_score": 1.0 - i * 0.1} for i in range(3)]
+
+        selected = refiner.mmr(passages, np.ones((3, 4), dtype=np.float32))
+
+        assert [p["chunk_id"] for p in selected] == ["0", "1", "2"]
+
+
+class TestRefine:
+
+    @pytest.mark.asyncio
+    async def test_refine_merges_then_diversifies(self):
+        store = FakeVectorStore({
+            ("d1", "c1"): [1.0, 0.0],
+            ("d1", "c2"): [1.0, 0.0],
+            ("d2", "c1"): [0.99, 0.1],
+            ("d3", "c1"): [0.0, 1.0],
+        })
+        refiner = PassageRefiner(lambda_=0.5, min_overlap=4, enabled=True, vector_store=store)
+        results = [
+            _result("d1", "c1", "abcdefgh", 1.0),
+            _result("d1", "c2", "efghijkl", 0.9),
+            _result("d2", "c1", "same topic", 0.8),
+            _result("d3", "c1", "different", 0.7),
+        ]
+
+        refined = await refiner.refine(results, top_k=2)
+
+        assert [p["doc_id"] for p in refined] == ["d1", "d3"]
+        assert refined[0]["content"] == "abcdefghijkl"
+        assert ("d1", "c2") in store.requested
+
+    @pytest.mark.asyncio
+    async def test_refine_falls_back_to_merge_on_store_error(self):
+        refiner = PassageRefiner(
+            min_overlap=4, enabled=True, vector_store=FakeVectorStore(error=RuntimeError("down"))
+        )
+        results = [
+            _result("d1", "c1", "abcdefgh", 1.0),
+            _result("d1", "c2", "efghijkl", 0.9),
+            _result("d2", "c1", "other", 0.8),
+        ]
+
+        refined = await refiner.refine(results, top_k=5)
+
+        assert [p["doc_id"] for p in refined] == ["d1", "d2"]
+
+    @pytest.mark.asyncio
+    async def test_disabled_truncates(self):
+        refiner = PassageRefiner(enabled=False, vector_store=FakeVectorStore())
+        results = [_result("d1", str(i), "text", 1.0) for i in range(5)]
+
+        assert len(await refiner.refine(results, top_k=3)) == 3
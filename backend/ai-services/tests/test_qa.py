@@ -1,10 +1,14 @@
+import asyncio
+import json
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from services.qa.context_builder import ContextBuilder
+from services.qa.token_estimator import TokenEstimator
 from services.qa.stream_handler import SSEStreamHandler
+from services.qa.sse_encoder import sse_encoder, coalesce_deltas
 from services.qa.reference_annotator import ReferenceAnnotator
 from services.qa.prompt_template import QAPromptTemplate
-from services.search.reranker import RerankerService
+from services.search.reranker import RerankerService, RerankResult
 from models.qa_models import SourceReference, GraphContext
 
 
@@ -47,10 +51,11 @@ class TestContextBuilder:
         
         assert "相关实体" in result.context_text
     
-    def test_estimate_tokens(self, context_builder):
-        text = "这是一段测试文本"
-        tokens = context_builder._estimate_tokens(text)
-        assert tokens == len(text) // 2
+    def test_estimate_tokens(self):
+        context_builder = ContextBuilder(max_context_tokens=1000, estimator=TokenEstimator(use_tokenizer=False))
+        
+        assert context_builder._estimate_tokens("这是一段测试文本") == 6
+        assert context_builder._estimate_tokens("RAG 2.0 pipeline") == 6
     
     def test_truncate_text(self, context_builder):
         text = "这是一段很长的测试文本内容"
@@ -95,6 +100,44 @@ class TestReferenceAnnotator:
         
         assert "参考来源" in formatted
         assert "doc1" in formatted
+    
+    @staticmethod
+    def _rag_sources():
+        return [
+            SourceReference(source_id="[1]", doc_id="doc1", content="检索增强生成结合了检索与生成两个阶段。其余无关内容。"),
+            SourceReference(source_id="[2]", doc_id="doc2", content="向量数据库负责存储文档的嵌入表示。"),
+        ]
+    
+    def test_annotate_response_with_key_phrases(self, annotator):
+        response = "简单来说，检索增强生成结合了检索与生成两个阶段，而向量数据库负责存储文档的嵌入表示。"
+        
+        result = annotator.annotate_response(response, self._rag_sources())
+        
+        assert result.text == (
+            "简单来说，检索增强生成结合了检索与生成两个阶段[1]，而向量数据库负责存储文档的嵌入表示[2]。"
+        )
+        assert result.source_ids == ["[1]", "[2]"]
+    
+    def test_incremental_matches_across_deltas(self, annotator):
+        response = "简单来说，检索增强生成结合了检索与生成两个阶段，而向量数据库负责存储文档的嵌入表示。"
+        expected = annotator.annotate_response(response, self._rag_sources()).text
+        
+        stream = annotator.stream(self._rag_sources())
+        streamed = "".join(stream.feed(response[i:i + 3]) for i in range(0, len(response), 3)) + stream.flush()
+        
+        assert streamed == expected
+        assert stream.source_ids == ["[1]", "[2]"]
+    
+    def test_incremental_defers_to_model_citations(self, annotator):
+        stream = annotator.stream(self._rag_sources())
+        
+        first = stream.feed("检索增强生成结合了检索与生成两个阶段")
+        second = stream.feed("[1]，向量数据库负责存储文档的嵌入表示。")
+        
+        assert first + second + stream.flush() == (
+            "检索增强生成结合了检索与生成两个阶段[1]，向量数据库负责存储文档的嵌入表示。"
+        )
+        assert stream.source_ids == []
 
 
 class TestQAPromptTemplate:
@@ -154,6 +197,96 @@ class TestRerankerService:
         result = await reranker.rerank("测试查询", [])
         
         assert result == []
+    
+    @staticmethod
+    def _fake_scores(query, texts, top_n):
+        return [RerankResult(index=i, relevance_score=float(len(t)), document={}) for i, t in enumerate(texts)]
+    
+    @pytest.mark.asyncio
+    async def test_rerank_prunes_batches_and_caches(self):
+        reranker = RerankerService(api_key="test_key", depth=5, batch_size=2)
+        documents = [{"doc_id": "d", "chunk_id": str(i), "content": "x" * (i + 1)} for i in range(8)]
+        
+        with patch.object(reranker, "_post_rerank", side_effect=self._fake_scores) as mock_post:
+            result = await reranker.rerank("查询", documents, top_n=3)
+            assert mock_post.call_count == 3
+            assert [d["chunk_id"] for d in result] == ["4", "3", "2"]
+            
+            await reranker.rerank("查询", documents, top_n=3)
+            assert mock_post.call_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_rerank_budget_falls_back_to_fused_order(self):
+        reranker = RerankerService(api_key="test_key", budget_ms=10, fallback="fused")
+        documents = [{"chunk_id": str(i), "content": f"文档{i}"} for i in range(4)]
+        
+        async def slow(*args):
+            await asyncio.sleep(1)
+            return []
+        
+        with patch.object(reranker, "_post_rerank", side_effect=slow):
+            result = await reranker.rerank("查询", documents, top_n=2)
+        
+        assert [d["chunk_id"] for d in result] == ["0", "1"]
+    
+    @pytest.mark.asyncio
+    async def test_rerank_budget_falls_back_to_local_rerank(self):
+        reranker = RerankerService(api_key="test_key", budget_ms=10, fallback="local")
+        documents = [
+            {"chunk_id": "0", "content": "向量检索"},
+            {"chunk_id": "1", "content": "关键词检索"},
+            {"chunk_id": "2", "content": "知识图谱构建"},
+        ]
+        
+        async def slow(*args):
+            await asyncio.sleep(1)
+            return []
+        
+        with patch.object(reranker, "_post_rerank", side_effect=slow):
+            result = await reranker.rerank("知识图谱", documents, top_n=2)
+        
+        assert result[0]["chunk_id"] == "2"
+        assert result[0]["rerank_source"] == "local"
+    
+    @pytest.mark.asyncio
+    async def test_rerank_zero_budget_is_respected(self):
+        reranker = RerankerService(api_key="test_key", budget_ms=1000, fallback="fused")
+        documents = [{"chunk_id": str(i), "content": f"文档{i}"} for i in range(3)]
+        
+        async def delayed(query, texts, top_n):
+            await asyncio.sleep(0.05)
+            return self._fake_scores(query, texts, top_n)
+        
+        with patch.object(reranker, "_post_rerank", side_effect=delayed):
+            result = await reranker.rerank("查询", documents, top_n=2, budget_ms=0)
+        
+        assert [d["chunk_id"] for d in result] == ["0", "1"]
+        assert "rerank_score" not in result[0]
+        assert RerankerService(api_key="test_key", budget_ms=0).budget_ms == 0
+    
+    @pytest.mark.asyncio
+    async def test_rerank_falls_back_to_local_on_failure(self):
+        reranker = RerankerService(api_key="test_key", fallback="local")
+        documents = [
+            {"chunk_id": "0", "content": "向量检索"},
+            {"chunk_id": "1", "content": "知识图谱构建"},
+        ]
+        
+        with patch.object(reranker, "_post_rerank", side_effect=RuntimeError("down")):
+            result = await reranker.rerank("知识图谱", documents, top_n=2)
+        
+        assert result[0]["chunk_id"] == "1"
+        assert result[0]["rerank_source"] == "local"
+    
+    @pytest.mark.asyncio
+    async def test_rerank_local_mode_skips_api(self):
+        reranker = RerankerService(api_key="test_key")
+        
+        with patch.object(reranker, "_post_rerank") as mock_post:
+            result = await reranker.rerank("图谱", [{"content": "知识图谱"}], mode="local")
+        
+        mock_post.assert_not_called()
+        assert result[0]["rerank_source"] == "local"
 
 
 class TestStreamHandler:
@@ -187,3 +320,129 @@ class TestStreamHandler:
         assert len(messages) == 4
         assert messages[1]["role"] == "user"
         assert messages[1]["content"] == "历史问题"
+    
+    @pytest.mark.asyncio
+    async def test_stream_generate_sends_sources_first(self, handler):
+        async def deltas():
+            for token in ["知识", "图谱", "。"]:
+                yield token
+        
+        sources = [
+            SourceReference(source_id="[1]", doc_id="doc1", content="内容1"),
+            SourceReference(source_id="[2]", doc_id="doc2", content="内容2")
+        ]
+        handler.api_key = "test_key"
+        
+        with patch.object(handler, "_call_llm_stream", return_value=deltas()):
+            frames = [f async for f in handler.stream_generate("问题", "上下文", sources, coalesce=False)]
+        
+        chunks = [json.loads(f[len("data: "):]) for f in frames]
+        assert [c["type"] for c in chunks] == ["source", "source", "text", "text", "text", "done"]
+        assert [c["source"]["doc_id"] for c in chunks[:2]] == ["doc1", "doc2"]
+        assert "".join(c["content"] for c in chunks if c["type"] == "text") == "知识图谱。"
+    
+    @pytest.mark.asyncio
+    async def test_stream_generate_annotates_references(self, handler):
+        async def deltas():
+            for token in ["知识图谱", "由实体和关系", "构成。"]:
+                yield token
+        
+        sources = [SourceReference(source_id="[1]", doc_id="doc1", content="知识图谱由实体和关系构成。")]
+        handler.api_key = "test_key"
+        
+        with patch.object(handler, "_call_llm_stream", return_value=deltas()), \
+                patch("services.qa.stream_handler.answer_cache.enabled", False):
+            frames = [f async for f in handler.stream_generate("问题", "上下文", sources, coalesce=False)]
+        
+        chunks = [json.loads(f[len("data: "):]) for f in frames]
+        assert "".join(c["content"] for c in chunks if c["type"] == "text") == "知识图谱由实体和关系构成[1]。"
+        assert chunks[-1]["type"] == "done"
+    
+    @pytest.mark.asyncio
+    async def test_closing_stream_closes_upstream_and_counts_saved_tokens(self, handler):
+        upstream_closed = asyncio.Event()
+        
+        async def deltas(count):
+            try:
+                for _ in range(count):
+                    await asyncio.sleep(0)
+                    yield "知识图谱"
+            finally:
+                upstream_closed.set()
+        
+        handler.api_key = "test_key"
+        with patch.object(handler, "_call_llm_stream", return_value=deltas(50)):
+            frames = [f async for f in handler.stream_generate("问题", "上下文", [], coalesce=False)]
+        assert len(frames) == 51
+        
+        upstream_closed.clear()
+        with patch.object(handler, "_call_llm_stream", return_value=deltas(50)):
+            stream = handler.stream_generate("问题", "上下文", [], coalesce=True)
+            await stream.__anext__()
+            await stream.aclose()
+        
+        assert upstream_closed.is_set()
+        stats = handler.stats.to_dict()
+        assert stats["completed"] == 1
+        assert stats["cancelled_generations"] == 1
+        assert stats["avg_output_tokens"] == 100
+        assert 0 < stats["estimated_tokens_saved"] < 100
+    
+    def test_encoder_frames_are_valid_json(self):
+        frame = sse_encoder.text('引号"与\n换行\\')
+        
+        assert frame.startswith("data: ") and frame.endswith("\n\n")
+        assert json.loads(frame[len("data: "):]) == {"type": "text", "content": '引号"与\n换行\\'}
+        assert json.loads(sse_encoder.event("start", conversation_id="c1")[len("data: "):]) == {
+            "type": "start", "conversation_id": "c1"
+        }
+
+
+class TestCoalesceDeltas:
+    
+    @staticmethod
+    async def _deltas(tokens, pauses=None):
+        for i, token in enumerate(tokens):
+            yield token
+            await asyncio.sleep((pauses or {}).get(i, 0.01))
+    
+    @pytest.mark.asyncio
+    async def test_flushes_by_size(self):
+        chunks = [c async for c in coalesce_deltas(self._deltas(["ab", "cd", "ef", "g"]), window_ms=1000, max_chars=4)]
+        
+        assert chunks == ["abcd", "efg"]
+    
+    @pytest.mark.asyncio
+    async def test_flushes_by_window_when_upstream_stalls(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        received = []
+        
+        async for chunk in coalesce_deltas(self._deltas(["a", "b", "c"], pauses={0: 0.5}), window_ms=100, max_chars=100):
+            received.append((chunk, loop.time() - start))
+        
+        assert [c for c, _ in received] == ["a", "bc"]
+        assert received[0][1] < 0.3
+    
+    @pytest.mark.asyncio
+    async def test_propagates_upstream_error_after_flush(self):
+        async def failing():
+            yield "partial"
+            raise RuntimeError("upstream closed")
+        
+        received = []
+        with pytest.raises(RuntimeError):
+            async for chunk in coalesce_deltas(failing(), window_ms=1000, max_chars=100):
+                received.append(chunk)
+        
+        assert received == ["partial"]
+    
+    @pytest.mark.asyncio
+    async def test_benchmark_reduces_frames(self):
+        from services.qa.stream_benchmark import run_benchmark
+        
+        report = await run_benchmark(streams=20, tokens=30)
+        
+        assert report["reference"]["frames"] == 20 * (30 + 5 + 1)
+        assert report["encoder"]["frames"] == report["reference"]["frames"]
+        assert report["coalesced"]["frames"] < report["encoder"]["frames"]
@@ -0,0 +1,153 @@
+import asyncio
+import importlib
+import time
+import pytest
+from unittest.mock import patch
+
+from models.qa_models import GraphContext
+from services.qa.retrieval_pipeline import RetrievalPipeline, StageTimer, gather_or_cancel
+
+# services.qa导出的同名单例会遮蔽子模块属性，按模块路径取模块本身
+rp = importlib.import_module("services.qa.retrieval_pipeline")
+
+
+def _hits(prefix, n):
+    return [{"doc_id": f"{prefix}{i}", "chunk_id": "0", "content": f"{prefix} {i}", "score": 1.0 - i * 0.1} for i in range(n)]
+
+
+class TestStageTimer:
+
+    @pytest.mark.asyncio
+    async def test_records_async_and_sync_stages(self):
+        timer = StageTimer()
+
+        result = await timer.run("sleep", asyncio.sleep(0.01, result="ok"))
+        with timer.measure("sync"):
+            pass
+
+        assert result == "ok"
+        assert timer.timings["sleep"] >= 10
+        assert "sync" in timer.timings
+
+    @pytest.mark.asyncio
+    async def test_records_failed_stage(self):
+        timer = StageTimer()
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            await timer.run("fail", fail())
+        assert "fail" in timer.timings
+
+
+class TestGatherOrCancel:
+
+    @pytest.mark.asyncio
+    async def test_cancels_siblings_on_failure(self):
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad")
+
+        with pytest.raises(ValueError):
+            await gather_or_cancel(slow(), fail())
+        await asyncio.sleep(0)
+        assert cancelled.is_set()
+
+
+class TestRetrievalPipeline:
+
+    DELAY = 0.05
+
+    @pytest.fixture
+    def stages(self):
+        delay = self.DELAY
+
+        async def keyword_search(**kwargs):
+            await asyncio.sleep(delay)
+            return _hits("kw", 5)
+
+        async def embed_single(query):
+            await asyncio.sleep(delay)
+            return [0.1, 0.2]
+
+        async def vector_search(**kwargs):
+            await asyncio.sleep(delay)
+            return _hits("vec", 5)
+
+        async def rerank(query, documents, top_n, mode=None):
+            await asyncio.sleep(delay)
+            return list(reversed(documents))[:top_n]
+
+        async def graph_context(query, results):
+            await asyncio.sleep(delay)
+            return GraphContext(entities=[{"name": "n"}])
+
+        with patch.object(rp.es_client, "search_async", side_effect=keyword_search), \
+             patch.object(rp.qwen_embedding, "embed_single", side_effect=embed_single), \
+             patch.object(rp.milvus_client, "search_async", side_effect=vector_search), \
+             patch.object(rp.reranker_service, "rerank", side_effect=rerank), \
+             patch.object(rp.search_cache, "enabled", False), \
+             patch.object(rp.semantic_cache, "enabled", False), \
+             patch.object(rp.passage_refiner, "enabled", False), \
+             patch.object(RetrievalPipeline, "build_graph_context", side_effect=graph_context):
+            yield
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_overlap(self, stages):
+        pipeline = RetrievalPipeline()
+
+        start = time.perf_counter()
+        output = await pipeline.run("query", top_k=3, use_rerank=True, use_graph=True)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        # 最长路径为 embedding -> vector_search -> rerank，共三个阶段
+        assert elapsed < self.DELAY * 1000 * 4.5
+        assert len(output.results) == 3
+        assert output.graph_context.entities == [{"name": "n"}]
+        for stage in ("retrieval", "keyword_search", "embedding", "vector_search", "fusion", "rerank", "graph", "passages"):
+            assert stage in output.timings
+
+    @pytest.mark.asyncio
+    async def test_skips_optional_stages(self, stages):
+        output = await RetrievalPipeline().run("query", top_k=2)
+
+        assert output.graph_context is None
+        assert len(output.results) == 2
+        assert "rerank" not in output.timings
+        assert "graph" not in output.timings
+
+    @pytest.mark.asyncio
+    async def test_graph_failure_is_tolerated(self, stages):
+        with patch.object(RetrievalPipeline, "build_graph_context", side_effect=RuntimeError("kg down")):
+            output = await RetrievalPipeline().run("query", top_k=2, use_graph=True)
+
+        assert output.graph_context is None
+        assert len(output.results) == 2
+
+
+class TestChainPaths:
+
+    def test_joins_consecutive_relations(self):
+        relations = [
+            {"head_id": "a", "head": "A", "type": "R1", "tail_id": "b", "tail": "B"},
+            {"head_id": "b", "head": "B", "type": "R2", "tail_id": "c", "tail": "C"},
+            {"head_id": "b", "head": "B", "type": "R3", "tail_id": "a", "tail": "A"},
+        ]
+
+        paths = rp._chain_paths(relations)
+
+        assert paths[0] == {
+            "nodes": [{"name": "A"}, {"name": "B"}, {"name": "C"}],
+            "relations": ["R1", "R2"]
+        }
+        assert all(p["nodes"][0] != p["nodes"][2] for p in paths)
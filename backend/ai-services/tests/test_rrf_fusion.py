@@ -111,3 +111,41 @@ class TestRRFFusion:
         
         for i in range(len(fused_results) - 1):
             assert fused_results[i]["rrf_score"] >= fused_results[i + 1]["rrf_score"]
+    
+    def test_fuse_keys_on_chunk_identity(self, rrf_fusion):
+        keyword_results = [
+            {"doc_id": "doc1", "chunk_id": "c1", "_score": 2.0},
+            {"doc_id": "doc1", "chunk_id": "c2", "_score": 1.0},
+        ]
+        vector_results = [{"doc_id": "doc1", "chunk_id": "c2", "score": 0.9}]
+        
+        fused_results = rrf_fusion.fuse(keyword_results, vector_results)
+        
+        assert [r["chunk_id"] for r in fused_results] == ["c2", "c1"]
+        assert fused_results[0]["keyword_rank"] == 2
+        assert fused_results[0]["vector_score"] == 0.9
+    
+    def test_fuse_many_n_sources(self, rrf_fusion):
+        sources = {
+            "keyword": [{"doc_id": "a", "chunk_id": "1"}, {"doc_id": "b", "chunk_id": "1"}],
+            "vector": [{"doc_id": "b", "chunk_id": "1"}],
+            "graph": [{"doc_id": "c", "chunk_id": "1"}, {"doc_id": "b", "chunk_id": "1"}],
+        }
+        
+        fused_results = rrf_fusion.fuse_many(sources, top_k=2)
+        
+        assert [r["doc_id"] for r in fused_results] == ["b", "a"]
+        assert fused_results[0]["rrf_score"] == pytest.approx(1 / 62 + 1 / 61 + 1 / 62)
+        assert fused_results[0]["graph_rank"] == 2
+        assert [r["rank"] for r in fused_results] == [1, 2]
+    
+    def test_fuse_many_matches_reference_at_scale(self, rrf_fusion):
+        from services.search.fusion_benchmark import generate_sources, reference_fuse
+        
+        sources = generate_sources(source_count=3, candidates=10000, seed=1)
+        
+        fused_results = rrf_fusion.fuse_many(sources, top_k=100)
+        expected = reference_fuse(sources, k=60)[:100]
+        
+        assert [r["rrf_score"] for r in fused_results] == pytest.approx([r["rrf_score"] for r in expected])
+        assert {r["chunk_id"] for r in fused_results} == {r["chunk_id"] for r in expected}
@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+
+from services.cache.memory_cache import MemoryCache
+from services.cache.search_cache import SearchResultCache, normalize_query
+
+
+class TestSearchResultCache:
+    
+    @pytest.fixture
+    def cache(self):
+        redis = MagicMock()
+        redis.is_connected = False
+        redis.incr = AsyncMock(return_value=None)
+        return SearchResultCache(memory=MemoryCache(max_size=100), redis=redis, ttl=60, enabled=True)
+    
+    def test_normalize_query(self):
+        assert normalize_query("  知识图谱　ＧraphRAG\n ") == "知识图谱 graphrag"
+    
+    @pytest.mark.asyncio
+    async def test_hit_skips_compute(self, cache):
+        compute = AsyncMock(return_value=[{"doc_id": "d1"}])
+        
+        first, first_hit = await cache.get_or_compute("qa", "What is RAG", compute, top_k=5)
+        second, second_hit = await cache.get_or_compute("qa", "what  is rag", compute, top_k=5)
+        
+        assert compute.await_count == 1
+        assert (first_hit, second_hit) == (False, True)
+        assert second == first
+        assert cache.get_stats()["hit_rate"] == 0.5
+    
+    @pytest.mark.asyncio
+    async def test_key_includes_filters_and_params(self, cache):
+        compute = AsyncMock(return_value=[])
+        
+        await cache.get_or_compute("qa", "q", compute, top_k=5)
+        await cache.get_or_compute("qa", "q", compute, top_k=10)
+        await cache.get_or_compute("qa", "q", compute, filters={"tenant": "t1"}, top_k=5)
+        
+        assert compute.await_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_bumps_generation(self, cache):
+        compute = AsyncMock(return_value=[{"doc_id": "d1"}])
+        
+        await cache.get_or_compute("qa", "q", compute)
+        await cache.invalidate()
+        _, hit = await cache.get_or_compute("qa", "q", compute)
+        
+        assert hit is False
+        assert compute.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_degraded_results_not_cached(self, cache):
+        compute = AsyncMock(return_value={"degraded": True})
+        
+        await cache.get_or_compute("hybrid", "q", compute, should_cache=lambda o: not o["degraded"])
+        await cache.get_or_compute("hybrid", "q", compute, should_cache=lambda o: not o["degraded"])
+        
+        assert compute.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_disabled_always_computes(self, cache):
+        cache.enabled = False
+        compute = AsyncMock(return_value=[])
+        
+        await cache.get_or_compute("qa", "q", compute)
+        await cache.get_or_compute("qa", "q", compute)
+        
+        assert compute.await_count == 2
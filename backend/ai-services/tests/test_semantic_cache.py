@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from services.cache.semantic_cache import SemanticCache
+
+
+class TestSemanticCache:
+    
+    @pytest.fixture
+    def cache(self):
+        return SemanticCache(capacity=4, threshold=0.9, ttl=60, enabled=True)
+    
+    def test_similar_query_hits(self, cache):
+        cache.store("qa", [1.0, 0.0, 0.0], ["result"], generation=1, cost_ms=120.0, top_k=5)
+        
+        assert cache.lookup("qa", [0.98, 0.1, 0.0], generation=1, top_k=5) == ["result"]
+        assert cache.lookup("qa", [0.0, 1.0, 0.0], generation=1, top_k=5) is None
+        
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["latency_saved_ms"] == 120.0
+    
+    def test_requires_same_generation_and_params(self, cache):
+        cache.store("qa", [1.0, 0.0], "value", generation=1, top_k=5)
+        
+        assert cache.lookup("qa", [1.0, 0.0], generation=2, top_k=5) is None
+        assert cache.lookup("qa", [1.0, 0.0], generation=1, top_k=10) is None
+        assert cache.lookup("other", [1.0, 0.0], generation=1, top_k=5) is None
+    
+    def test_best_match_wins(self, cache):
+        cache.store("qa", [1.0, 0.2], "near", generation=1)
+        cache.store("qa", [1.0, 0.0], "exact", generation=1)
+        
+        assert cache.lookup("qa", [1.0, 0.0], generation=1) == "exact"
+    
+    def test_evicts_least_recently_used(self, cache):
+        vectors = [np.eye(8)[i].tolist() for i in range(5)]
+        for i, vector in enumerate(vectors[:4]):
+            cache.store("qa", vector, i, generation=1)
+        cache.lookup("qa", vectors[0], generation=1)
+        
+        cache.store("qa", vectors[4], 4, generation=1)
+        
+        assert cache.lookup("qa", vectors[0], generation=1) == 0
+        assert cache.lookup("qa", vectors[1], generation=1) is None
+        assert cache.get_stats()["size"] == 4
+    
+    def test_disabled(self, cache):
+        cache.enabled = False
+        cache.store("qa", [1.0], "value", generation=1)
+        
+        assert cache.lookup("qa", [1.0], generation=1) is None
@@ -11,6 +11,7 @@ from utils.response import (
     forbidden,
     paged,
 )
+from utils.concurrency import BlockingIOExecutor, io_executor
 
 __all__ = [
     "ApiResponse",
@@ -24,4 +25,6 @@ __all__ = [
     "unauthorized",
     "forbidden",
     "paged",
+    "BlockingIOExecutor",
+    "io_executor",
 ]
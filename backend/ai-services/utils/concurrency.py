@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class BlockingIOExecutor:
+    """同步存储客户端（Milvus/Elasticsearch）专用的有界线程池"""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        thread_name_prefix: str = "storage-io"
+    ):
+        self.max_workers = max_workers or settings.IO_THREAD_POOL_SIZE
+        self.thread_name_prefix = thread_name_prefix
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.thread_name_prefix
+                )
+                logger.info(f"Storage IO thread pool started: max_workers={self.max_workers}")
+            return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在线程池中执行阻塞调用，不占用事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+                logger.info("Storage IO thread pool stopped")
+
+
+async def cancel_on_disconnect(
+    stream: AsyncIterator[T],
+    wait_disconnect: Callable[[], Awaitable[Any]],
+    on_disconnect: Optional[Callable[[], None]] = None
+) -> AsyncIterator[T]:
+    """包装流式响应，客户端断开时取消正在等待的上游并关闭整条生成链
+
+    后台任务等待wait_disconnect返回；若此时正在等待上游的下一帧（检索、重排序或LLM流），
+    直接取消当前任务，取消沿await链传到各阶段；若正停在向客户端写出的位置，则在恢复后结束。
+    """
+    task = asyncio.current_task()
+    iterator = stream.__aiter__()
+    disconnected = False
+    awaiting = False
+
+    async def watch():
+        nonlocal disconnected
+        await wait_disconnect()
+        disconnected = True
+        if awaiting:
+            task.cancel()
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        while not disconnected:
+            awaiting = True
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            except asyncio.CancelledError:
+                # 只吞掉由断开触发的取消，外部取消照常传播
+                if disconnected and task.uncancel() == 0:
+                    break
+                raise
+            finally:
+                awaiting = False
+            if disconnected:
+                break
+            yield item
+    finally:
+        watcher.cancel()
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        if disconnected:
+            logger.info("Client disconnected, stream cancelled")
+            if on_disconnect is not None:
+                on_disconnect()
+
+
+io_executor = BlockingIOExecutor()